@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import time
+
+import numpy as np
+
+from metrics import registry
+from snapshot import DISTRICT_IDS, LOTTERY, SIZE_NAMES
+
+log = logging.getLogger(__name__)
+
+STATS_SECONDS = registry.histogram('housing_stats_seconds', 'Tempo para recalcular as estatísticas de um mundo')
+
+# Distritos na ordem de DISTRICT_IDS (linhas das matrizes de contagem)
+DISTRICT_ORDER = np.array(sorted(DISTRICT_IDS), dtype=np.int32)
+
+
+# Colunas de um snapshot como arrays (uma posição por casa). Distrito vira o
+# índice em DISTRICT_ORDER e inscrições desconhecidas ficam como -1.
+def snapshot_arrays(plots):
+    plots = list(plots)
+    count = len(plots)
+    district_ids = np.fromiter((plot.district_id for plot in plots), dtype=np.int32, count=count)
+    district = np.searchsorted(DISTRICT_ORDER, district_ids)
+    known = (district < len(DISTRICT_ORDER)) & (DISTRICT_ORDER[np.minimum(district, len(DISTRICT_ORDER) - 1)] == district_ids)
+    arrays = {
+        'district': district,
+        'size': np.fromiter((plot.size_code for plot in plots), dtype=np.int32, count=count),
+        'price': np.fromiter((plot.price for plot in plots), dtype=np.int64, count=count),
+        'entries': np.fromiter((-1 if plot.lotto_entries is None else plot.lotto_entries for plot in plots),
+                               dtype=np.int64, count=count),
+        'lottery': np.fromiter((plot.purchase_system == LOTTERY for plot in plots), dtype=bool, count=count),
+    }
+    # Distritos ou tamanhos fora das tabelas não entram nas contagens
+    known &= (arrays['size'] >= 0) & (arrays['size'] < len(SIZE_NAMES))
+    return {name: column[known] for name, column in arrays.items()}
+
+
+# Matriz distrito x tamanho com a quantidade de casas abertas
+def count_matrix(arrays):
+    flat = arrays['district'] * len(SIZE_NAMES) + arrays['size']
+    return np.bincount(flat, minlength=len(DISTRICT_ORDER) * len(SIZE_NAMES)).reshape(len(DISTRICT_ORDER), len(SIZE_NAMES))
+
+
+# Inscrições das casas em loteria com valor conhecido
+def lottery_entries(arrays):
+    mask = arrays['lottery'] & (arrays['entries'] >= 0)
+    return arrays['entries'][mask], arrays['size'][mask]
+
+
+def median_or_none(values):
+    return float(np.median(values)) if len(values) else None
+
+
+# Inscrições ganhas por hora num mundo, pelas linhas do histórico da janela:
+# soma dos aumentos entre registros seguidos da mesma casa (uma queda é o
+# sorteio recomeçando e não conta)
+def entry_growth(history, world, since, until):
+    chunks = [columns for _, columns in history.scan(world, since, until)]
+    if not chunks:
+        return None
+    t = np.concatenate([np.asarray(columns['t']) for columns in chunks])
+    if len(t) < 2:
+        return None
+    key = np.concatenate([
+        np.asarray(columns['district'], dtype=np.int64) << 16 | np.asarray(columns['ward'], dtype=np.int64) << 8
+        | np.asarray(columns['plot'], dtype=np.int64)
+        for columns in chunks
+    ])
+    entries = np.concatenate([np.asarray(columns['entries'], dtype=np.int64) for columns in chunks])
+    order = np.lexsort((t, key))
+    key, entries = key[order], entries[order]
+    delta = np.diff(entries)
+    valid = (key[1:] == key[:-1]) & (entries[1:] >= 0) & (entries[:-1] >= 0) & (delta > 0)
+    return float(delta[valid].sum()) / ((until - since) / 3600)
+
+
+# Estatísticas das casas de todos os mundos com snapshot, calculadas com numpy.
+# Cada mundo é recalculado só quando o detector publica uma mudança nele
+# (update_world); os resumos por data center são montados uma vez por ciclo
+# (refresh) ou na primeira consulta depois de uma mudança, então o comando só
+# lê o que já está pronto. Com um HistoryStore, refresh também calcula o
+# crescimento das inscrições na janela `growth_window` (em segundos).
+class HousingStats:
+    def __init__(self, data_centers, history=None, growth_window=24 * 3600, clock=time.time):
+        self.data_centers = data_centers
+        self.history = history
+        self.growth_window = growth_window
+        self._clock = clock
+        self._data_center_of = {world: dc for dc, worlds in data_centers.items() for world in worlds}
+        self._worlds = {}
+        self._growth = {}
+        self._summaries = {}
+        self._dirty = set(data_centers)
+        self._growth_dirty = set()
+        self.updates = 0
+        self.refreshes = 0
+        self.updated_at = None
+
+    def __contains__(self, world):
+        return world in self._worlds
+
+    # Recalcula as colunas e agregados de um mundo a partir do snapshot atual
+    def update_world(self, world, plots):
+        data_center = self._data_center_of.get(world)
+        if data_center is None:
+            return
+        with STATS_SECONDS.time():
+            arrays = snapshot_arrays(plots)
+            entries, _ = lottery_entries(arrays)
+            self._worlds[world] = {
+                'arrays': arrays,
+                'counts': count_matrix(arrays),
+                'lottery_plots': len(entries),
+                'mean_entries': float(entries.mean()) if len(entries) else None,
+                'median_entries': median_or_none(entries),
+            }
+        self._dirty.add(data_center)
+        self._growth_dirty.add(world)
+        self.updates += 1
+        self.updated_at = self._clock()
+
+    def _summarize(self, data_center):
+        worlds = [world for world in self.data_centers[data_center] if world in self._worlds]
+        counts = np.zeros((len(DISTRICT_ORDER), len(SIZE_NAMES)), dtype=np.int64)
+        for world in worlds:
+            counts += self._worlds[world]['counts']
+        columns = [self._worlds[world]['arrays'] for world in worlds]
+        if columns:
+            merged = {name: np.concatenate([arrays[name] for arrays in columns]) for name in columns[0]}
+            entries, sizes = lottery_entries(merged)
+        else:
+            entries = sizes = np.zeros(0, dtype=np.int64)
+        # Mais concorrido primeiro: média de inscrições por casa em loteria
+        ranking = sorted(
+            (world for world in worlds if self._worlds[world]['mean_entries'] is not None),
+            key=lambda world: -self._worlds[world]['mean_entries'],
+        )
+        return {
+            'worlds': worlds,
+            'missing': [world for world in self.data_centers[data_center] if world not in self._worlds],
+            'counts': counts,
+            'by_world': {world: int(self._worlds[world]['counts'].sum()) for world in worlds},
+            'lottery_plots': len(entries),
+            'median_entries': median_or_none(entries),
+            'median_by_size': [median_or_none(entries[sizes == code]) for code in range(len(SIZE_NAMES))],
+            'ranking': [
+                (world, self._worlds[world]['mean_entries'], self._worlds[world]['lottery_plots'],
+                 self._growth.get(world))
+                for world in ranking
+            ],
+            'growth': {world: self._growth[world] for world in worlds if self._growth.get(world) is not None},
+            'updated_at': self.updated_at,
+        }
+
+    # Resumo pronto de um data center (remonta só se algum mundo dele mudou)
+    def data_center(self, data_center):
+        if data_center in self._dirty or data_center not in self._summaries:
+            self._summaries[data_center] = self._summarize(data_center)
+            self._dirty.discard(data_center)
+        return self._summaries[data_center]
+
+    def _compute_growth(self, worlds, now):
+        return {world: entry_growth(self.history, world, now - self.growth_window, now) for world in worlds}
+
+    # Uma vez por ciclo: crescimento dos mundos alterados (lendo o histórico
+    # fora do event loop) e os resumos dos data centers com mudança
+    async def refresh(self):
+        if self.history is not None and self._growth_dirty:
+            worlds, self._growth_dirty = self._growth_dirty, set()
+            try:
+                growth = await asyncio.to_thread(self._compute_growth, worlds, self._clock())
+            except OSError as e:
+                log.error("erro ao ler o histórico para as estatísticas: %s", e)
+            else:
+                self._growth.update(growth)
+                self._dirty.update(self._data_center_of[world] for world in worlds)
+        for data_center in list(self._dirty):
+            self.data_center(data_center)
+        self.refreshes += 1
+
+    # Uma linha por data center: mundos com dados, casas abertas, mediana e média das inscrições
+    def overview(self):
+        rows = []
+        for data_center in self.data_centers:
+            summary = self.data_center(data_center)
+            means = [mean for _, mean, _, _ in summary['ranking']]
+            rows.append((data_center, summary, float(np.mean(means)) if means else None))
+        return rows
+
+    def stats(self):
+        return {
+            'worlds': len(self._worlds),
+            'updates': self.updates,
+            'refreshes': self.refreshes,
+            'dirty_data_centers': len(self._dirty),
+        }
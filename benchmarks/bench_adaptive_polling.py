@@ -0,0 +1,123 @@
+# Simula alguns dias de viradas de fase da loteria em vários mundos, com relógio
+# virtual, e compara o loop fixo de 30 minutos com o AdaptivePollScheduler:
+# requisições ao PaissaDB e atraso entre uma mudança ficar visível no PaissaDB
+# e o bot detectá-la. Mundos sem inscritos nem canais não são buscados.
+#
+# Uso: python -m benchmarks.bench_adaptive_polling [--worlds 40] [--watched 10] [--days 10]
+import argparse
+import asyncio
+import bisect
+import random
+import statistics
+
+from scheduler import AdaptivePollScheduler, phase_aware_delay
+
+ENTRY_PHASE = 5 * 86400
+RESULTS_PHASE = 4 * 86400
+FIXED_INTERVAL = 1800
+
+
+# Um mundo com casas cujas fases viram em horários próximos (mesmo ciclo com
+# alguns minutos de diferença). Cada virada só aparece no PaissaDB alguns
+# minutos depois, quando algum jogador passa pelo distrito.
+class SimWorld:
+    def __init__(self, rng, plots, days):
+        offset = rng.uniform(0, ENTRY_PHASE + RESULTS_PHASE)
+        self.plots = []
+        for _ in range(plots):
+            boundaries, visible_at = [], []
+            t = offset - (ENTRY_PHASE + RESULTS_PHASE) + rng.uniform(0, 3600)
+            entry = True
+            while t < days * 86400 + ENTRY_PHASE:
+                boundaries.append(t)
+                visible_at.append(t + rng.uniform(60, 1800))
+                t += ENTRY_PHASE if entry else RESULTS_PHASE
+                entry = not entry
+            self.plots.append((boundaries, visible_at))
+
+    # Casas como o PaissaDB mostra no instante `now`
+    def houses(self, now):
+        houses = []
+        for boundaries, visible_at in self.plots:
+            seen = bisect.bisect_right(visible_at, now)
+            houses.append({'lotto_phase_until': boundaries[seen] if seen < len(boundaries) else None})
+        return houses
+
+    def changes(self, start, end):
+        return [t for _, visible_at in self.plots for t in visible_at if start <= t < end]
+
+
+class Detector:
+    def __init__(self, worlds):
+        self.worlds = worlds
+        self.last_poll = {}
+        self.requests = 0
+        self.latencies = []
+
+    def poll(self, name, now):
+        self.requests += 1
+        since = self.last_poll.get(name, 0.0)
+        for visible in self.worlds[name].changes(since, now):
+            self.latencies.append(now - visible)
+        self.last_poll[name] = now
+        return self.worlds[name].houses(now)
+
+
+def run_fixed(worlds, polled, duration):
+    detector = Detector(worlds)
+    now = 0.0
+    while now < duration:
+        for name in polled:
+            detector.poll(name, now)
+        now += FIXED_INTERVAL
+    return detector
+
+
+def run_adaptive(worlds, watched, duration):
+    detector = Detector(worlds)
+    clock = {'now': 0.0}
+
+    async def sleep(seconds):
+        clock['now'] += seconds
+
+    async def poll(name):
+        houses = detector.poll(name, clock['now'])
+        return phase_aware_delay(houses, clock['now'])
+
+    scheduler = AdaptivePollScheduler(poll, lambda: watched, clock=lambda: clock['now'], sleep=sleep)
+
+    async def main():
+        while clock['now'] < duration:
+            await scheduler.run_once()
+
+    asyncio.run(main())
+    return detector
+
+
+def report(name, detector):
+    latencies = sorted(detector.latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{name:<24} {detector.requests:>10} {len(latencies):>9} "
+          f"{statistics.mean(latencies) / 60:>9.1f}min {p95 / 60:>8.1f}min {latencies[-1] / 60:>8.1f}min")
+
+
+def main(args):
+    rng = random.Random(7)
+    duration = args.days * 86400
+    worlds = {f"world{i}": SimWorld(rng, args.plots, args.days) for i in range(args.worlds)}
+    watched = set(list(worlds)[:args.watched])
+
+    print(f"{args.worlds} mundos ({args.watched} monitorados), {args.plots} casas cada, {args.days} dias")
+    print(f"{'modo':<24} {'requisições':>10} {'mudanças':>9} {'atraso méd':>12} {'p95':>11} {'máx':>11}")
+    report("fixo 30min (todos)", run_fixed(worlds, list(worlds), duration))
+    report("fixo 30min (monitorados)", run_fixed(worlds, watched, duration))
+    report("adaptativo", run_adaptive(worlds, watched, duration))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--worlds', type=int, default=40)
+    parser.add_argument('--watched', type=int, default=10)
+    parser.add_argument('--plots', type=int, default=50)
+    parser.add_argument('--days', type=int, default=10)
+    main(parser.parse_args())
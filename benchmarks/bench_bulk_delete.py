@@ -0,0 +1,111 @@
+# Limpeza de um canal grande: o modo antigo (fetch_message + delete para cada
+# mensagem) x o MessageDeleter (bulk delete de 100 em 100 para as mensagens com
+# menos de 14 dias e exclusões individuais concorrentes só para as antigas).
+# O canal falso responde com latência fixa e o rate limit é um token bucket
+# global como o do bot.
+#
+# Uso: python -m benchmarks.bench_bulk_delete [--messages 1000] [--old 0.2] [--latency 0.03]
+import argparse
+import asyncio
+import random
+import time
+
+from cleanup import BULK_DELETE_MAX, DISCORD_EPOCH, MessageDeleter
+from scheduler import KeyedRateLimiter
+
+
+def make_snowflake(created):
+    return (int(created * 1000) - DISCORD_EPOCH) << 22 | random.getrandbits(22)
+
+
+class FakeMessage:
+    def __init__(self, channel, message_id):
+        self.channel = channel
+        self.id = message_id
+
+    async def delete(self):
+        await self.channel.call()
+        self.channel.messages.discard(self.id)
+
+
+class FakeChannel:
+    def __init__(self, message_ids, latency):
+        self.id = 1
+        self.messages = set(message_ids)
+        self.latency = latency
+        self.calls = 0
+
+    async def call(self):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+
+    async def fetch_message(self, message_id):
+        await self.call()
+        return FakeMessage(self, message_id)
+
+    def get_partial_message(self, message_id):
+        return FakeMessage(self, message_id)
+
+    async def delete_messages(self, messages):
+        ids = [message.id for message in messages]
+        assert 2 <= len(ids) <= BULK_DELETE_MAX
+        await self.call()
+        self.messages.difference_update(ids)
+
+
+def make_ids(messages, old_fraction):
+    now = time.time()
+    ids = []
+    for _ in range(messages):
+        if random.random() < old_fraction:
+            created = now - random.uniform(15, 300) * 86400
+        else:
+            created = now - random.uniform(0, 13) * 86400
+        ids.append(make_snowflake(created))
+    return ids
+
+
+async def legacy(channel, ids, limiter):
+    for message_id in ids:
+        try:
+            await limiter.acquire()
+            message = await channel.fetch_message(message_id)
+            await limiter.acquire()
+            await message.delete()
+        except Exception:
+            pass
+
+
+async def engine(channel, ids, limiter):
+    async def rate_limit(channel_id):
+        await limiter.acquire()
+
+    return await MessageDeleter(rate_limit).delete(channel, ids)
+
+
+async def run(name, strategy, ids, latency):
+    channel = FakeChannel(ids, latency)
+    limiter = KeyedRateLimiter(rate=50, per=1)
+    start = time.perf_counter()
+    await strategy(channel, ids, limiter)
+    elapsed = time.perf_counter() - start
+    left = len(channel.messages)
+    print(f"{name:<14} {channel.calls:>8} {elapsed:>9.1f}s {len(ids) / elapsed:>9.1f} msg/s {left:>7}")
+
+
+async def main(messages, old_fraction, latency):
+    random.seed(19)
+    ids = make_ids(messages, old_fraction)
+    print(f"{messages} mensagens, {old_fraction:.0%} com mais de 14 dias, latência {latency * 1000:.0f}ms")
+    print(f"{'modo':<14} {'chamadas':>8} {'tempo':>10} {'vazão':>15} {'restam':>7}")
+    await run('fetch+delete', legacy, ids, latency)
+    await run('MessageDeleter', engine, ids, latency)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=1000)
+    parser.add_argument('--old', type=float, default=0.2)
+    parser.add_argument('--latency', type=float, default=0.03)
+    args = parser.parse_args()
+    asyncio.run(main(args.messages, args.old, args.latency))
@@ -0,0 +1,82 @@
+# Mede ciclos de polling em que só alguns mundos mudam: busca completa (baixa,
+# decodifica, converte e compara tudo) x busca condicional (304 com ETag ou
+# hash do corpo igual, pulando a conversão e a comparação).
+#
+# Uso: python -m benchmarks.bench_conditional_fetch [--worlds 40] [--cycles 10] [--changed 0.1]
+import argparse
+import asyncio
+import random
+import time
+
+from benchmarks.fake_paissa import FakePaissaServer, make_plot_events
+from changes import ChangeDetector
+from paissa import PaissaClient
+
+
+# Mesma conversão feita pelo bot: um dict por casa aberta
+def parse(data):
+    return [
+        {
+            'district': district['id'],
+            'ward': plot['ward_number'] + 1,
+            'plot': plot['plot_number'] + 1,
+            'size': plot['size'],
+            'price': plot['price'],
+            'lotto_entries': plot['lotto_entries'],
+            'purchase_system': plot['purchase_system'],
+            'lotto_phase': plot['lotto_phase'],
+            'lotto_phase_until': plot['lotto_phase_until'],
+        }
+        for district in data['districts']
+        for plot in district['open_plots']
+    ]
+
+
+async def run(mode, args):
+    rng = random.Random(1)
+    async with FakePaissaServer(plots_per_district=args.plots, etag=(mode == 'etag')) as server:
+        client = PaissaClient(base_url=server.base_url, max_concurrency=8)
+        detector = ChangeDetector()
+        snapshots = {}
+        world_ids = list(range(1, args.worlds + 1))
+        elapsed = 0.0
+        for cycle in range(args.cycles):
+            # Alguns mundos recebem atualizações entre um ciclo e outro
+            if cycle:
+                for world_id in rng.sample(world_ids, max(1, int(len(world_ids) * args.changed))):
+                    for event in make_plot_events(server._payload(world_id), 3, seed=cycle * 1000 + world_id):
+                        await server.publish(event)
+
+            started = time.perf_counter()
+
+            async def poll(world_id):
+                conditional = mode != 'completa' and world_id in snapshots
+                data = await client.get_world(world_id, if_changed=conditional)
+                if data is not None:
+                    snapshots[world_id] = parse(data)
+                await detector.process(str(world_id), snapshots[world_id])
+
+            await asyncio.gather(*(poll(world_id) for world_id in world_ids))
+            elapsed += time.perf_counter() - started
+
+        await client.close()
+        skipped = sum(stats['skipped'] for stats in detector.cycle_stats.values())
+        processed = sum(stats['processed'] for stats in detector.cycle_stats.values())
+        print(f"{mode:<10} {elapsed / args.cycles * 1000:>9.1f}ms {processed:>11} {skipped:>8} "
+              f"{server.not_modified:>5} {client.unchanged:>11}")
+
+
+async def main(args):
+    print(f"{args.worlds} mundos x {args.cycles} ciclos, {args.changed:.0%} dos mundos mudam por ciclo")
+    print(f"{'modo':<10} {'por ciclo':>11} {'processados':>11} {'pulados':>8} {'304':>5} {'mesmo hash':>11}")
+    for mode in ('completa', 'hash', 'etag'):
+        await run(mode, args)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--worlds', type=int, default=40)
+    parser.add_argument('--cycles', type=int, default=10)
+    parser.add_argument('--plots', type=int, default=60)
+    parser.add_argument('--changed', type=float, default=0.1)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,73 @@
+# Latência de cauda da consulta de um data center inteiro contra o PaissaDB
+# falso com atraso próprio por mundo (e um mundo lento): mundo a mundo em
+# série x todos ao mesmo tempo x ao mesmo tempo com orçamento de tempo e
+# resultados parciais. Cada consulta começa com o cache vazio.
+#
+# Uso: python -m benchmarks.bench_dc_query [--queries 20] [--budget 1.0]
+import argparse
+import asyncio
+import random
+import time
+
+from benchmarks.fake_paissa import FakePaissaServer
+from paissa import PaissaClient, WorldSnapshotCache, gather_within
+from snapshot import WorldSnapshot
+
+WORLDS = list(range(1, 9))
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def main(args):
+    rng = random.Random(3)
+
+    # Cada mundo tem sua latência base com variação; o último às vezes trava
+    def delay(base, stall=0.0):
+        return lambda: base * rng.lognormvariate(0, 0.5) + (stall if rng.random() < 0.3 else 0.0)
+
+    world_latency = {world_id: delay(0.05 + 0.02 * world_id) for world_id in WORLDS}
+    world_latency[WORLDS[-1]] = delay(0.2, stall=3.0)
+
+    async with FakePaissaServer(plots_per_district=30, world_latency=world_latency) as server:
+        client = PaissaClient(base_url=server.base_url, max_concurrency=8)
+
+        async def load(world_id):
+            return WorldSnapshot.from_paissa(await client.get_world(world_id))
+
+        async def serial():
+            cache = WorldSnapshotCache(load, ttl=0)
+            return len([await cache.get(world_id) for world_id in WORLDS])
+
+        async def concurrent():
+            cache = WorldSnapshotCache(load, ttl=0)
+            return len(await asyncio.gather(*(cache.get(world_id) for world_id in WORLDS)))
+
+        async def budgeted():
+            cache = WorldSnapshotCache(load, ttl=0)
+            results, _, _ = await gather_within({w: cache.get(w) for w in WORLDS}, args.budget)
+            return len(results)
+
+        print(f"{len(WORLDS)} mundos, {args.queries} consultas, orçamento {args.budget:g}s")
+        print(f"{'modo':<18} {'p50':>8} {'p95':>8} {'p99':>8} {'máx':>8} {'mundos':>7}")
+        for name, query in (('série', serial), ('simultâneo', concurrent), ('com orçamento', budgeted)):
+            latencies, worlds = [], []
+            for _ in range(args.queries):
+                started = time.perf_counter()
+                worlds.append(await query())
+                latencies.append(time.perf_counter() - started)
+            print(f"{name:<18} {percentile(latencies, 0.5):>7.2f}s {percentile(latencies, 0.95):>7.2f}s "
+                  f"{percentile(latencies, 0.99):>7.2f}s {max(latencies):>7.2f}s {sum(worlds) / len(worlds):>7.1f}")
+
+        # Espera as buscas atrasadas terminarem antes de fechar o servidor
+        await asyncio.sleep(4)
+        await client.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--queries', type=int, default=20)
+    parser.add_argument('--budget', type=float, default=1.0)
+    asyncio.run(main(parser.parse_args()))
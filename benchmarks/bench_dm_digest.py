@@ -0,0 +1,101 @@
+# Compara a entrega de notificações por DM de um ciclo em que várias casas
+# monitoradas mudam juntas: fetch_user + uma DM por casa e inscrito (modo antigo)
+# x um resumo por usuário com cache de usuários e fila com novas tentativas.
+# O Discord falso conta as chamadas REST e responde 429 quando um usuário recebe
+# mais DMs do que o limite dentro da janela.
+#
+# Uso: python -m benchmarks.bench_dm_digest [--users 500] [--plots 10]
+import argparse
+import asyncio
+import time
+
+from notifications import DigestDispatcher, LRUCache
+
+
+class RateLimited(Exception):
+    retry_after = 0.05
+
+
+class FakeDiscord:
+    def __init__(self, latency=0.002, dm_limit=5, window=1.0):
+        self.latency = latency
+        self.dm_limit = dm_limit
+        self.window = window
+        self.fetches = 0
+        self.sends = 0
+        self.rate_limited = 0
+        self._dm_times = {}
+
+    async def fetch_user(self, user_id):
+        self.fetches += 1
+        await asyncio.sleep(self.latency)
+        return user_id
+
+    async def send(self, user_id):
+        await asyncio.sleep(self.latency)
+        now = time.perf_counter()
+        times = [t for t in self._dm_times.get(user_id, []) if now - t < self.window]
+        if len(times) >= self.dm_limit:
+            self.rate_limited += 1
+            raise RateLimited()
+        times.append(now)
+        self._dm_times[user_id] = times
+        self.sends += 1
+
+
+async def legacy(discord, subscriptions):
+    delivered = 0
+    for user_id, plots in subscriptions.items():
+        for _ in plots:
+            try:
+                user = await discord.fetch_user(user_id)
+                await discord.send(user)
+                delivered += 1
+            except RateLimited:
+                pass
+    return delivered
+
+
+async def digest(discord, subscriptions):
+    cache = LRUCache()
+
+    async def deliver(user_id, events):
+        user = cache.get(user_id)
+        if user is None:
+            user = await discord.fetch_user(user_id)
+            cache.put(user_id, user)
+        await discord.send(user)
+
+    def retry_delay(exc, attempt):
+        return exc.retry_after if isinstance(exc, RateLimited) else None
+
+    dispatcher = DigestDispatcher(deliver, workers=8, retry_delay=retry_delay)
+    dispatcher.start()
+    for user_id, plots in subscriptions.items():
+        for plot in plots:
+            dispatcher.add(user_id, plot, plot)
+    await dispatcher.flush()
+    await dispatcher.join()
+    await dispatcher.close()
+    return dispatcher.delivered
+
+
+async def main(users, plots):
+    subscriptions = {user_id: list(range(plots)) for user_id in range(users)}
+    print(f"{users} usuários x {plots} casas que mudaram no ciclo")
+    print(f"{'modo':<10} {'tempo':>8} {'fetch_user':>11} {'DMs':>6} {'429':>6} {'entregues':>10}")
+    for name, run in (('antigo', legacy), ('resumo', digest)):
+        discord = FakeDiscord()
+        started = time.perf_counter()
+        delivered = await run(discord, subscriptions)
+        elapsed = time.perf_counter() - started
+        print(f"{name:<10} {elapsed:>7.2f}s {discord.fetches:>11} {discord.sends:>6} "
+              f"{discord.rate_limited:>6} {delivered:>10}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--plots', type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.plots))
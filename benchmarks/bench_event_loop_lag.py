@@ -0,0 +1,57 @@
+# Compara o atraso do event loop durante vários /housing_check simultâneos:
+# cliente bloqueante (como o antigo requests.get) x PaissaClient assíncrono.
+#
+# Uso: python -m benchmarks.bench_event_loop_lag [--calls 20] [--latency 0.2]
+import argparse
+import asyncio
+import json
+import time
+import urllib.request
+
+from benchmarks.fake_paissa import ThreadedFakePaissaServer
+from benchmarks.loop_lag import LoopLagMonitor
+from paissa import PaissaClient
+
+WORLD_IDS = [78, 93, 55, 64, 77]
+
+
+async def run_blocking(base_url, calls):
+    async def housing_check(world_id):
+        with urllib.request.urlopen(f"{base_url}/worlds/{world_id}") as response:
+            return json.loads(response.read())
+
+    await asyncio.gather(*(housing_check(WORLD_IDS[i % len(WORLD_IDS)]) for i in range(calls)))
+
+
+async def run_async(base_url, calls):
+    client = PaissaClient(base_url=base_url)
+    try:
+        await asyncio.gather(*(client.get_world(WORLD_IDS[i % len(WORLD_IDS)]) for i in range(calls)))
+    finally:
+        await client.close()
+
+
+async def measure(name, runner, base_url, calls):
+    monitor = await LoopLagMonitor().start()
+    start = time.perf_counter()
+    await runner(base_url, calls)
+    elapsed = time.perf_counter() - start
+    await monitor.stop()
+    lag = monitor.summary()
+    print(f"{name:<10} total={elapsed:6.2f}s  lag max={lag['max_ms']:8.1f}ms  "
+          f"p99={lag['p99_ms']:8.1f}ms  mean={lag['mean_ms']:6.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.2)
+    args = parser.parse_args()
+
+    with ThreadedFakePaissaServer(latency=args.latency) as server:
+        asyncio.run(measure('bloqueante', run_blocking, server.base_url, args.calls))
+        asyncio.run(measure('async', run_async, server.base_url, args.calls))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+# Custo de manter milhares de mensagens temporárias pendentes: uma coroutine
+# dormindo por mensagem (modo antigo) x o ExpiryScheduler com uma única task e
+# remoção em lotes de até 100 por canal. Mede tasks vivas, memória retida e
+# chamadas de remoção (uma por mensagem x uma por lote).
+#
+# Uso: python -m benchmarks.bench_expiry [--messages 10000] [--channels 20]
+import argparse
+import asyncio
+import gc
+import random
+import time
+import tracemalloc
+
+from layout import chunked
+from scheduler import ExpiryScheduler
+
+
+async def legacy(messages, ttl):
+    calls = 0
+
+    async def expire_later(channel_id, message_id, delay):
+        nonlocal calls
+        await asyncio.sleep(delay)
+        calls += 1
+
+    gc.collect()
+    tracemalloc.start()
+    tasks = [asyncio.create_task(expire_later(c, m, ttl * random.random())) for c, m in messages]
+    await asyncio.sleep(0)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    alive = len(asyncio.all_tasks()) - 1
+    await asyncio.gather(*tasks)
+    return alive, memory, calls
+
+
+async def central(messages, ttl):
+    calls = 0
+
+    async def expire(entries):
+        nonlocal calls
+        by_channel = {}
+        for channel_id, message_id in entries:
+            by_channel.setdefault(channel_id, []).append(message_id)
+        for message_ids in by_channel.values():
+            calls += len(chunked(message_ids, 100))
+
+    scheduler = ExpiryScheduler(expire, grace=0.05)
+    gc.collect()
+    tracemalloc.start()
+    now = time.time()
+    for channel_id, message_id in messages:
+        scheduler.schedule(channel_id, message_id, now + ttl * random.random())
+    scheduler.start()
+    await asyncio.sleep(0)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    alive = len(asyncio.all_tasks()) - 1
+    while len(scheduler):
+        await asyncio.sleep(0.05)
+    await scheduler.close()
+    return alive, memory, calls
+
+
+async def main(args):
+    random.seed(1)
+    messages = [(random.randrange(args.channels), message_id) for message_id in range(args.messages)]
+    print(f"{args.messages} mensagens pendentes em {args.channels} canais, vencendo ao longo de {args.ttl:g}s")
+    print(f"{'modo':<16} {'tasks':>7} {'memória':>10} {'chamadas':>9}")
+    for name, run in (('uma por mensagem', legacy), ('ExpiryScheduler', central)):
+        alive, memory, calls = await run(messages, args.ttl)
+        print(f"{name:<16} {alive:>7} {memory / 1024:>8.0f}KiB {calls:>9}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=10000)
+    parser.add_argument('--channels', type=int, default=20)
+    parser.add_argument('--ttl', type=float, default=2.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,134 @@
+# Histórico das casas: o HistoryStore (colunas binárias por mundo e dia, lidas
+# por mmap) x um log JSON por linha com os mesmos registros. Gera `--days` dias
+# de mudanças sintéticas de um mundo (uma comparação a cada 5 minutos) e mede
+# os bytes por registro, o tempo de gravação, uma varredura das últimas semanas
+# (média de inscrições das casas grandes de Mist) e a compactação dos dias
+# antigos.
+#
+# Uso: python -m benchmarks.bench_history [--days 28] [--changes 40] [--scan-days 21]
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from history import HistoryStore
+from snapshot import Plot
+
+DAY = 86400
+STEP = 300
+MIST = 339
+
+
+def make_rows(days, changes, start):
+    rng = random.Random(23)
+    plots = [
+        Plot(district_id, ward, plot, rng.randrange(3), rng.randrange(3, 50) * 100000, 0, 7, 1, 0)
+        for district_id in (339, 340, 341, 641, 979)
+        for ward in range(1, 31)
+        for plot in range(1, 61, 6)
+    ]
+    for step in range(days * DAY // STEP):
+        at = start + step * STEP
+        for plot in rng.sample(plots, changes):
+            plot.lotto_entries += rng.randrange(1, 4)
+            yield at, 4, plot
+
+
+def write_columnar(root, rows):
+    store = HistoryStore(root)
+    start = time.perf_counter()
+    count = 0
+    for at, kind, plot in rows:
+        store.append('behemoth', at, kind, plot)
+        count += 1
+        if count % 10000 == 0:
+            store._write(store._pending)
+            store._pending = {}
+    store._write(store._pending)
+    store._pending = {}
+    return store, count, time.perf_counter() - start
+
+
+def write_jsonl(path, rows):
+    start = time.perf_counter()
+    with open(path, 'w') as f:
+        for at, kind, plot in rows:
+            f.write(json.dumps({
+                't': at, 'world': 'behemoth', 'kind': kind, 'district': plot.district_id, 'ward': plot.ward,
+                'plot': plot.plot, 'size': plot.size_code, 'price': plot.price,
+                'entries': plot.lotto_entries, 'phase': plot.lotto_phase,
+            }) + '\n')
+    return time.perf_counter() - start
+
+
+def scan_columnar(store, since):
+    total = count = 0
+    for _, columns in store.scan('behemoth', since):
+        districts, sizes, entries = columns['district'], columns['size'], columns['entries']
+        for index in range(len(entries)):
+            if districts[index] == MIST and sizes[index] == 2:
+                total += entries[index]
+                count += 1
+    return total / count if count else 0.0
+
+
+def scan_jsonl(path, since):
+    total = count = 0
+    with open(path) as f:
+        for line in f:
+            row = json.loads(line)
+            if row['t'] >= since and row['district'] == MIST and row['size'] == 2:
+                total += row['entries']
+                count += 1
+    return total / count if count else 0.0
+
+
+def directory_size(root):
+    return sum(os.path.getsize(os.path.join(path, name)) for path, _, names in os.walk(root) for name in names)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--days', type=int, default=28)
+    parser.add_argument('--changes', type=int, default=40, help="casas alteradas por comparação")
+    parser.add_argument('--scan-days', type=int, default=21)
+    args = parser.parse_args()
+
+    now = int(time.time())
+    start = now - args.days * DAY
+    since = now - args.scan_days * DAY
+    with tempfile.TemporaryDirectory() as directory:
+        root = os.path.join(directory, 'history')
+        jsonl_path = os.path.join(directory, 'history.jsonl')
+        store, rows, columnar_write = write_columnar(root, make_rows(args.days, args.changes, start))
+        jsonl_write = write_jsonl(jsonl_path, make_rows(args.days, args.changes, start))
+        columnar_bytes = directory_size(root)
+        jsonl_bytes = os.path.getsize(jsonl_path)
+
+        started = time.perf_counter()
+        columnar_mean = scan_columnar(store, since)
+        columnar_scan = time.perf_counter() - started
+        started = time.perf_counter()
+        jsonl_mean = scan_jsonl(jsonl_path, since)
+        jsonl_scan = time.perf_counter() - started
+        assert abs(columnar_mean - jsonl_mean) < 1e-9
+
+        started = time.perf_counter()
+        removed, downsampled = store.compact(now)
+        compaction = time.perf_counter() - started
+        compacted_bytes = directory_size(root)
+
+    print(f"{rows} registros em {args.days} dias ({args.changes} mudanças a cada {STEP // 60} minutos)")
+    print(f"{'':<10} {'bytes/reg':>10} {'total MiB':>10} {'gravação':>10} {f'varredura {args.scan_days}d':>14}")
+    print(f"{'JSONL':<10} {jsonl_bytes / rows:>10.1f} {jsonl_bytes / 2**20:>10.1f} {jsonl_write:>9.2f}s {jsonl_scan:>13.3f}s")
+    print(f"{'colunar':<10} {columnar_bytes / rows:>10.1f} {columnar_bytes / 2**20:>10.1f} "
+          f"{columnar_write:>9.2f}s {columnar_scan:>13.3f}s")
+    print(f"média de inscrições (Mist, Large): {columnar_mean:.1f}")
+    print(f"compactação: {downsampled} dias reduzidos, {removed} removidos em {compaction:.2f}s, "
+          f"{columnar_bytes / 2**20:.1f} -> {compacted_bytes / 2**20:.1f} MiB")
+
+
+if __name__ == '__main__':
+    main()
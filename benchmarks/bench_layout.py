@@ -0,0 +1,35 @@
+# Conta quantas mensagens uma atualização de canal envia no layout antigo
+# (cabeçalho + um embed por distrito + uma mensagem por casa) x pack_sections.
+#
+# Uso: python -m benchmarks.bench_layout
+import discord
+
+from benchmarks.fake_paissa import make_world_payload
+from layout import pack_sections
+
+FIELD_VALUE = (
+    "🏠 **Medium**\n💰 16.0M gil\n📍 🎫 Loteria (Inscrições: 123)\n"
+    "📌 Status: ✅ Disponível\n⏰ Até: 01/01/2026 12:00 (Brasília)"
+)
+
+
+def main():
+    print(f"{'casas':>6} {'antigo':>7} {'empacotado':>11}")
+    for plots_per_district in (2, 10, 30, 60):
+        payload = make_world_payload(78, plots_per_district)
+        sections = [(discord.Embed(title="🏰 Behemoth", description="Casas disponíveis"), [])]
+        plots = 0
+        for district in payload['districts']:
+            fields = [("📊 Distribuição", "🏠 1 • 🏡 2 • 🏰 3", None)]
+            for plot in district['open_plots']:
+                fields.append((f"Ward {plot['ward_number'] + 1} • Plot {plot['plot_number'] + 1}", FIELD_VALUE, plot))
+                plots += 1
+            sections.append((discord.Embed(title=str(district['id']), description="Mundo: **Behemoth**"), fields))
+
+        legacy = 1 + len(payload['districts']) + plots
+        packed = len(pack_sections(sections))
+        print(f"{plots:>6} {legacy:>7} {packed:>11}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+# Mede a amplificação de escrita ao salvar last_known_status: gravação completa
+# com indent=4 a cada mudança (modo antigo) x JsonPersistence em lote.
+#
+# Uso: python -m benchmarks.bench_persistence [--subscriptions 10000] [--changes 500]
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+
+log = logging.getLogger(__name__)
+
+
+# Grava o arquivo de forma atômica: escreve em um temporário no mesmo diretório
+# e troca pelo original com os.replace, assim um crash nunca deixa o JSON pela metade
+def atomic_write(path, payload):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+# Serialização compacta (sem indentação nem espaços)
+def dump_compact(data):
+    return json.dumps(data, separators=(',', ':')).encode()
+
+
+# Persistência em lote dos arquivos JSON (modo usado antes do SQLite). As
+# alterações só marcam o documento como sujo; flush() grava de uma vez os
+# documentos sujos, com a escrita em disco fora do event loop.
+class JsonPersistence:
+    def __init__(self):
+        self._documents = {}
+        self._dirty = set()
+        self.marks = 0
+        self.writes = 0
+        self.bytes_written = 0
+
+    def register(self, name, path, getter):
+        self._documents[name] = (path, getter)
+
+    def mark_dirty(self, name):
+        self.marks += 1
+        self._dirty.add(name)
+
+    async def flush(self):
+        dirty, self._dirty = self._dirty, set()
+        for name in dirty:
+            path, getter = self._documents[name]
+            # Serializa no event loop para gravar um retrato consistente dos dados
+            payload = dump_compact(getter())
+            try:
+                await asyncio.to_thread(atomic_write, path, payload)
+            except OSError as e:
+                log.error("erro ao salvar %s: %s", path, e)
+                self._dirty.add(name)
+                continue
+            self.writes += 1
+            self.bytes_written += len(payload)
+
+
+def make_status(subscriptions):
+    return {
+        f"behemoth_Mist_{i // 60 + 1}_{i % 60 + 1}_{i}": {
+            "lotto_phase": 1, "lotto_entries": i % 50, "lotto_phase_until": 1700000000 + i
+        }
+        for i in range(subscriptions)
+    }
+
+
+def run_legacy(path, status, changes):
+    written = 0
+    start = time.perf_counter()
+    keys = list(status)
+    for i in range(changes):
+        status[keys[i]]["lotto_entries"] += 1
+        with open(path, 'w') as f:
+            json.dump(status, f, indent=4)
+        written += os.path.getsize(path)
+    return written, time.perf_counter() - start
+
+
+async def run_batched(path, status, changes):
+    persistence = JsonPersistence()
+    persistence.register('last_known_status', path, lambda: status)
+    start = time.perf_counter()
+    keys = list(status)
+    for i in range(changes):
+        status[keys[i]]["lotto_entries"] += 1
+        persistence.mark_dirty('last_known_status')
+    await persistence.flush()
+    return persistence.bytes_written, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--subscriptions', type=int, default=10000)
+    parser.add_argument('--changes', type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'last_known_status.json')
+        changed_bytes = args.changes * len(json.dumps({"lotto_entries": 0}))
+
+        legacy_bytes, legacy_time = run_legacy(path, make_status(args.subscriptions), args.changes)
+        batched_bytes, batched_time = asyncio.run(run_batched(path, make_status(args.subscriptions), args.changes))
+
+    print(f"{args.subscriptions} inscrições, {args.changes} mudanças em um ciclo")
+    print(f"antigo:   {legacy_bytes / 1e6:10.1f} MB gravados em {legacy_time:6.2f}s "
+          f"(amplificação ~{legacy_bytes / changed_bytes:,.0f}x)")
+    print(f"em lote:  {batched_bytes / 1e6:10.1f} MB gravados em {batched_time:6.2f}s "
+          f"(amplificação ~{batched_bytes / changed_bytes:,.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
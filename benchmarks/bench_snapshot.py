@@ -0,0 +1,98 @@
+# Mede memória e tempo de consulta com todos os mundos carregados ao mesmo
+# tempo: lista de dicts filtrada por strings, agrupada e ordenada a cada
+# consulta (modo antigo) x WorldSnapshot com Plot em __slots__ e índices prontos.
+#
+# Uso: python -m benchmarks.bench_snapshot [--worlds 80] [--plots 60]
+import argparse
+import gc
+import time
+import tracemalloc
+
+from benchmarks.fake_paissa import make_world_payload
+from snapshot import DISTRICT_IDS, SIZE_CODES, SIZE_NAMES, WorldSnapshot, match_districts
+
+SIZES = [None, 'small', 'medium', 'large']
+DISTRICTS = [None, 'shirogane', 'lavender beds', 'mist', 'goblet', 'empyreum']
+
+
+def legacy_parse(data):
+    houses = []
+    for district_data in data.get('districts', []):
+        district_name = DISTRICT_IDS.get(district_data.get('id'), "Unknown")
+        for plot in district_data.get('open_plots', []):
+            houses.append({
+                'district': district_name,
+                'ward': plot.get('ward_number', 0) + 1,
+                'plot': plot.get('plot_number', 0) + 1,
+                'size': SIZE_NAMES.get(plot.get('size', 0), 'Unknown'),
+                'price': plot.get('price', 0),
+                'lotto_entries': plot.get('lotto_entries', None),
+                'purchase_system': plot.get('purchase_system', 0),
+                'lotto_phase': plot.get('lotto_phase', None),
+                'lotto_phase_until': plot.get('lotto_phase_until', None),
+            })
+    return houses
+
+
+def legacy_query(houses, size, district):
+    if size:
+        size_map = {"small": "Small", "medium": "Medium", "large": "Large"}
+        houses = [h for h in houses if h['size'] == size_map.get(size.lower())]
+    if district:
+        houses = [h for h in houses if district.lower() in h['district'].lower()]
+    by_district = {}
+    for house in houses:
+        if house['purchase_system'] != 7:
+            continue
+        by_district.setdefault(house['district'], []).append(house)
+    for district_houses in by_district.values():
+        district_houses.sort(key=lambda x: (["Small", "Medium", "Large"].index(x['size']), x['price']))
+    return list(by_district.items())
+
+
+def snapshot_query(snapshot, size, district):
+    size_code = SIZE_CODES.get(size) if size else None
+    district_ids = match_districts(district) if district else None
+    return snapshot.by_district(district_ids, size_code, lottery=True)
+
+
+def measure_memory(payloads, parse):
+    gc.collect()
+    tracemalloc.start()
+    worlds = [parse(payload) for payload in payloads]
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, worlds
+
+
+def measure_queries(worlds, query, rounds):
+    started = time.perf_counter()
+    queries = 0
+    for _ in range(rounds):
+        for world in worlds:
+            for size in SIZES:
+                for district in DISTRICTS:
+                    query(world, size, district)
+                    queries += 1
+    return (time.perf_counter() - started) / queries
+
+
+def main(args):
+    payloads = [make_world_payload(world_id, args.plots) for world_id in range(1, args.worlds + 1)]
+    plots = sum(len(d['open_plots']) for payload in payloads for d in payload['districts'])
+    print(f"{args.worlds} mundos, {plots} casas; {len(SIZES) * len(DISTRICTS)} combinações de filtro por mundo")
+    print(f"{'modo':<14} {'memória':>10} {'por casa':>9} {'consulta':>10}")
+    for name, parse, query in (('dicts', legacy_parse, legacy_query),
+                               ('WorldSnapshot', WorldSnapshot.from_paissa, snapshot_query)):
+        memory, worlds = measure_memory(payloads, parse)
+        per_query = measure_queries(worlds, query, args.rounds)
+        print(f"{name:<14} {memory / 1024 / 1024:>8.1f}MiB {memory / plots:>8.0f}B {per_query * 1e6:>8.1f}µs")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--worlds', type=int, default=80)
+    parser.add_argument('--plots', type=int, default=60)
+    parser.add_argument('--rounds', type=int, default=3)
+    main(parser.parse_args())
@@ -0,0 +1,77 @@
+# Compara o estado em JSON com o SqliteStateStore: tempo de inicialização
+# (carregar tudo) e custo de gravar uma única mudança de status.
+#
+# Uso: python -m benchmarks.bench_state_store [--subscriptions 100000] [--updates 200]
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.bench_persistence import atomic_write, dump_compact
+from storage import SqliteStateStore
+
+
+def make_state(subscriptions, per_user=5):
+    user_notifications = {}
+    last_known_status = {}
+    for i in range(subscriptions):
+        house_key = f"behemoth_Mist_{i // 60 + 1}_{i % 60 + 1}"
+        user = user_notifications.setdefault(str(i // per_user), {"notifications": [], "username": f"user{i // per_user}"})
+        user["notifications"].append(f"{house_key}_{i}")
+        last_known_status[f"{house_key}_{i}"] = {"lotto_phase": 1, "lotto_entries": i % 50, "lotto_phase_until": 1700000000}
+    return user_notifications, last_known_status
+
+
+async def main(subscriptions, updates):
+    user_notifications, last_known_status = make_state(subscriptions)
+    keys = list(last_known_status)
+
+    with tempfile.TemporaryDirectory() as directory:
+        notifications_path = os.path.join(directory, 'user_notifications.json')
+        status_path = os.path.join(directory, 'last_known_status.json')
+        atomic_write(notifications_path, dump_compact(user_notifications))
+        atomic_write(status_path, dump_compact(last_known_status))
+
+        start = time.perf_counter()
+        with open(notifications_path) as f:
+            json.load(f)
+        with open(status_path) as f:
+            json.load(f)
+        json_load = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for i in range(updates):
+            last_known_status[keys[i]]["lotto_entries"] += 1
+            atomic_write(status_path, dump_compact(last_known_status))
+        json_update = (time.perf_counter() - start) / updates
+
+        store = SqliteStateStore(os.path.join(directory, 'housing.db'))
+        store.migrate_from_json(os.path.join(directory, 'missing.json'), notifications_path, status_path)
+
+        start = time.perf_counter()
+        store.load_user_notifications()
+        store.load_last_known_status()
+        sqlite_load = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for i in range(updates):
+            last_known_status[keys[i]]["lotto_entries"] += 1
+            store.save_status(keys[i], last_known_status[keys[i]])
+            await store.flush()
+        sqlite_update = (time.perf_counter() - start) / updates
+
+        await store.close()
+
+    print(f"{subscriptions} inscrições")
+    print(f"inicialização:  JSON {json_load * 1000:8.1f}ms   SQLite {sqlite_load * 1000:8.1f}ms")
+    print(f"por mudança:    JSON {json_update * 1000:8.2f}ms   SQLite {sqlite_update * 1000:8.2f}ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--subscriptions', type=int, default=100000)
+    parser.add_argument('--updates', type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.subscriptions, args.updates))
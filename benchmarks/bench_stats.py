@@ -0,0 +1,99 @@
+# Estatísticas de todos os data centers: recalcular tudo em Python puro a cada
+# consulta (contagens por distrito e tamanho com list comprehensions, como o
+# "📊 Distribuição" dos canais, e statistics.median) x o HousingStats, que
+# recalcula com numpy só os mundos alterados e deixa os resumos prontos.
+# Mede a consulta de cada data center e o custo da atualização incremental de
+# um ciclo com `--changed` mundos alterados.
+#
+# Uso: python -m benchmarks.bench_stats [--data-centers 10] [--worlds 8] [--plots 300] [--changed 5]
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from analytics import HousingStats
+from snapshot import DISTRICT_IDS, LOTTERY, SIZE_NAMES, Plot, WorldSnapshot
+
+
+def make_snapshot(rng, plots):
+    return WorldSnapshot(
+        Plot(rng.choice(list(DISTRICT_IDS)), rng.randrange(1, 31), rng.randrange(1, 61), rng.randrange(3),
+             rng.randrange(3, 50) * 100000, rng.randrange(200), LOTTERY, 1, 0)
+        for _ in range(plots)
+    )
+
+
+# Resumo de um data center recalculado do zero a cada consulta
+def python_summary(snapshots):
+    counts = {
+        (district_id, size_code): len([
+            plot for snapshot in snapshots for plot in snapshot
+            if plot.district_id == district_id and plot.size_code == size_code
+        ])
+        for district_id in DISTRICT_IDS
+        for size_code in SIZE_NAMES
+    }
+    entries = [plot.lotto_entries for snapshot in snapshots for plot in snapshot if plot.purchase_system == LOTTERY]
+    medians = [
+        statistics.median(values) if values else None
+        for values in ([plot.lotto_entries for snapshot in snapshots for plot in snapshot
+                        if plot.purchase_system == LOTTERY and plot.size_code == size_code]
+                       for size_code in SIZE_NAMES)
+    ]
+    ranking = sorted(
+        ((statistics.mean(plot.lotto_entries for plot in snapshot), index) for index, snapshot in enumerate(snapshots)),
+        reverse=True,
+    )
+    return counts, statistics.median(entries), medians, ranking
+
+
+def timed(run, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        run()
+    return (time.perf_counter() - started) / repeat
+
+
+async def main(args):
+    rng = random.Random(24)
+    data_centers = {
+        f"dc{dc}": [f"dc{dc}-world{world}" for world in range(args.worlds)] for dc in range(args.data_centers)
+    }
+    snapshots = {world: make_snapshot(rng, args.plots) for worlds in data_centers.values() for world in worlds}
+    all_worlds = list(snapshots)
+    print(f"{len(data_centers)} data centers, {len(snapshots)} mundos, {args.plots} casas por mundo")
+
+    python_query = timed(lambda: [python_summary([snapshots[w] for w in worlds]) for worlds in data_centers.values()], 3)
+
+    stats = HousingStats(data_centers)
+    started = time.perf_counter()
+    for world, snapshot in snapshots.items():
+        stats.update_world(world, snapshot)
+    await stats.refresh()
+    initial = time.perf_counter() - started
+    cached_query = timed(lambda: [stats.data_center(dc) for dc in data_centers], 100)
+
+    def cycle():
+        for world in rng.sample(all_worlds, args.changed):
+            stats.update_world(world, snapshots[world])
+        # Só os data centers com mundos alterados são remontados
+        for dc in data_centers:
+            stats.data_center(dc)
+
+    incremental = timed(cycle, 20)
+
+    print(f"{'':<34} {'tempo':>10}")
+    print(f"{'Python puro, todos os DCs':<34} {python_query * 1000:>8.1f}ms")
+    print(f"{'HousingStats, carga inicial':<34} {initial * 1000:>8.1f}ms")
+    print(f"{'HousingStats, consulta (todos)':<34} {cached_query * 1000:>8.3f}ms")
+    print(f"{f'HousingStats, ciclo ({args.changed} mundos)':<34} {incremental * 1000:>8.1f}ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data-centers', type=int, default=10)
+    parser.add_argument('--worlds', type=int, default=8)
+    parser.add_argument('--plots', type=int, default=300)
+    parser.add_argument('--changed', type=int, default=5, help="mundos alterados por ciclo")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,161 @@
+# Compara a ingestão por websocket (com queda e ressincronização no meio) com
+# o polling periódico, contra o PaissaDB falso reproduzindo eventos gravados:
+# requisições REST, atraso de detecção de cada mudança e se o espelho local
+# termina igual ao estado do servidor.
+#
+# Uso: python -m benchmarks.bench_stream [--worlds 8] [--events 400] [--poll 2.0]
+#      python -m benchmarks.bench_stream --events-file eventos.jsonl
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks.fake_paissa import FakePaissaServer, load_events, make_plot_events, make_world_payload
+from paissa import PLOT_SOLD, PLOT_UPDATE, PaissaClient, PaissaStream
+
+
+def plot_key(world_id, plot):
+    return (world_id, plot['district_id'], plot['ward_number'], plot['plot_number'])
+
+
+def index_payload(world_id, payload):
+    return {plot_key(world_id, plot): plot for district in payload['districts'] for plot in district['open_plots']}
+
+
+def state_of(plot):
+    return (plot.get('lotto_entries'), plot.get('lotto_phase'), plot.get('price'))
+
+
+# Espelho local dos mundos; registra o atraso de cada mudança detectada
+class Mirror:
+    def __init__(self, server, client, world_ids):
+        self.server = server
+        self.client = client
+        self.world_ids = world_ids
+        self.worlds = {}
+        self.latencies = []
+
+    def _record(self, key):
+        published = self.server.published_at.get(key)
+        if published is not None:
+            self.latencies.append(time.perf_counter() - published)
+
+    async def sync(self):
+        payloads = await asyncio.gather(*(self.client.get_world(world_id) for world_id in self.world_ids))
+        for world_id, payload in zip(self.world_ids, payloads):
+            current = index_payload(world_id, payload)
+            previous = self.worlds.get(world_id)
+            if previous is not None:
+                for key in current.keys() | previous.keys():
+                    old, new = previous.get(key), current.get(key)
+                    if (old is None) != (new is None) or (old and new and state_of(old) != state_of(new)):
+                        self._record(key)
+            self.worlds[world_id] = current
+
+    async def apply(self, kind, data):
+        key = plot_key(data['world_id'], data)
+        world = self.worlds.get(data['world_id'])
+        if world is None:
+            return
+        if kind == PLOT_SOLD:
+            world.pop(key, None)
+        elif kind == PLOT_UPDATE:
+            # plot_update só traz os dados da loteria
+            if key not in world:
+                return
+            world[key] = {**world[key], **data}
+        else:
+            world[key] = data
+        self._record(key)
+
+    def consistent(self):
+        for world_id in self.world_ids:
+            expected = {key: state_of(plot) for key, plot in index_payload(world_id, self.server.payloads[world_id]).items()}
+            actual = {key: state_of(plot) for key, plot in self.worlds.get(world_id, {}).items()}
+            if expected != actual:
+                return False
+        return True
+
+
+def summarize(name, mirror, requests, extra=""):
+    latencies = sorted(mirror.latencies) or [0.0]
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) > 1 else latencies[0]
+    print(f"{name:<10} {requests:>9} {len(mirror.latencies):>9} {statistics.mean(latencies) * 1000:>10.1f}ms "
+          f"{p95 * 1000:>9.1f}ms {max(latencies) * 1000:>9.1f}ms {'sim' if mirror.consistent() else 'NÃO':>11}  {extra}")
+
+
+async def run_stream(events, world_ids, interval):
+    async with FakePaissaServer() as server:
+        for world_id in world_ids:
+            server.payloads[world_id] = make_world_payload(world_id, 30)
+        client = PaissaClient(base_url=server.base_url)
+        mirror = Mirror(server, client, world_ids)
+        stream = PaissaStream(server.ws_url, mirror.apply, on_connect=mirror.sync)
+        stream.start()
+        while server.connected_clients == 0 or stream.connections == 0:
+            await asyncio.sleep(0.01)
+
+        half = len(events) // 2
+        await server.replay(events[:half], interval)
+        # Queda no meio: os eventos publicados até a reconexão são perdidos pelo stream
+        await server.drop_connections()
+        await server.replay(events[half:half + half // 4], interval)
+        while stream.connections < 2:
+            await asyncio.sleep(0.01)
+        await server.replay(events[half + half // 4:], interval)
+        await asyncio.sleep(0.2)
+
+        summarize('websocket', mirror, server.request_count,
+                  f"(conexões {stream.connections}, eventos {stream.events})")
+        await stream.close()
+        await client.close()
+
+
+async def run_polling(events, world_ids, interval, poll):
+    async with FakePaissaServer() as server:
+        for world_id in world_ids:
+            server.payloads[world_id] = make_world_payload(world_id, 30)
+        client = PaissaClient(base_url=server.base_url)
+        mirror = Mirror(server, client, world_ids)
+        await mirror.sync()
+
+        async def poller():
+            while True:
+                await asyncio.sleep(poll)
+                await mirror.sync()
+
+        task = asyncio.create_task(poller())
+        await server.replay(events, interval)
+        await asyncio.sleep(poll + 0.2)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        summarize(f"poll {poll:g}s", mirror, server.request_count)
+        await client.close()
+
+
+async def main(args):
+    world_ids = list(range(1, args.worlds + 1))
+    if args.events_file:
+        events = load_events(args.events_file)
+    else:
+        events = []
+        per_world = args.events // len(world_ids)
+        for world_id in world_ids:
+            events.extend(make_plot_events(make_world_payload(world_id, 30), per_world, seed=world_id))
+        events.sort(key=lambda event: event['data']['last_updated_time'])
+
+    print(f"{len(events)} eventos em {len(world_ids)} mundos, um a cada {args.interval * 1000:.0f}ms")
+    print(f"{'modo':<10} {'REST':>9} {'mudanças':>9} {'atraso méd':>12} {'p95':>11} {'máx':>11} {'consistente':>11}")
+    await run_stream(events, world_ids, args.interval)
+    await run_polling(events, world_ids, args.interval, args.poll)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--worlds', type=int, default=8)
+    parser.add_argument('--events', type=int, default=400)
+    parser.add_argument('--interval', type=float, default=0.01)
+    parser.add_argument('--poll', type=float, default=2.0)
+    parser.add_argument('--events-file')
+    args = parser.parse_args()
+    asyncio.run(main(args))
@@ -0,0 +1,66 @@
+# Compara a busca de inscritos por casa: varredura de todos os usuários
+# (modo antigo) x índice reverso SubscriptionIndex.
+#
+# Uso: python -m benchmarks.bench_subscription_index [--users 10000] [--plots 5000]
+import argparse
+import random
+import time
+
+from notifications import SubscriptionIndex
+
+
+def make_dataset(users, plots, per_user, seed=42):
+    rng = random.Random(seed)
+    house_keys = [f"behemoth_Mist_{i // 60 + 1}_{i % 60 + 1}" for i in range(plots)]
+    user_notifications = {
+        str(user_id): {"notifications": rng.sample(house_keys, per_user), "username": f"user{user_id}"}
+        for user_id in range(users)
+    }
+    return house_keys, user_notifications
+
+
+def scan(house_keys, user_notifications):
+    matches = 0
+    for house_key in house_keys:
+        for user_id, user_data in user_notifications.items():
+            if house_key in user_data["notifications"]:
+                matches += 1
+    return matches
+
+
+def indexed(house_keys, index):
+    matches = 0
+    for house_key in house_keys:
+        matches += len(index.subscribers(house_key))
+    return matches
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--plots', type=int, default=5000)
+    parser.add_argument('--per-user', type=int, default=5)
+    args = parser.parse_args()
+
+    house_keys, user_notifications = make_dataset(args.users, args.plots, args.per_user)
+
+    start = time.perf_counter()
+    index = SubscriptionIndex.from_user_notifications(user_notifications)
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scan_matches = scan(house_keys, user_notifications)
+    scan_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index_matches = indexed(house_keys, index)
+    index_time = time.perf_counter() - start
+
+    assert scan_matches == index_matches
+    print(f"{args.users} usuários, {args.plots} casas, {scan_matches} inscrições")
+    print(f"varredura: {scan_time * 1000:10.1f}ms")
+    print(f"índice:    {index_time * 1000:10.1f}ms (construção {build * 1000:.1f}ms)")
+
+
+if __name__ == '__main__':
+    main()
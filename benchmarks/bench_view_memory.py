@@ -0,0 +1,90 @@
+# Mede a memória retida pelas views de inscrição com alguns milhares de casas
+# postadas: uma View viva por casa (modo antigo, guardada pelo discord.py até o
+# timeout) x uma única view persistente com os menus desenhados e descartados.
+#
+# Uso: python -m benchmarks.bench_view_memory [--plots 5000]
+import argparse
+import asyncio
+import gc
+import tracemalloc
+
+import discord
+
+from benchmarks.fake_paissa import make_world_payload
+from layout import MESSAGE_MAX_SELECTS, SELECT_MAX_OPTIONS, chunked
+
+
+class LegacyNotificationButton(discord.ui.View):
+    def __init__(self, house_data, world, timeout=1800):
+        super().__init__(timeout=timeout)
+        self.house_data = house_data
+        self.world = world
+
+    @discord.ui.button(label="🔔 Ativar Notificações", style=discord.ButtonStyle.primary)
+    async def notify_button(self, interaction, button):
+        pass
+
+
+def stateless_view(houses, world):
+    view = discord.ui.View(timeout=None)
+    for index, chunk in enumerate(chunked(houses, SELECT_MAX_OPTIONS)[:MESSAGE_MAX_SELECTS]):
+        view.add_item(discord.ui.Select(
+            custom_id=f"housing:subscribe:{index}",
+            options=[
+                discord.SelectOption(label=f"Ward {h['ward_number'] + 1} • Plot {h['plot_number'] + 1}",
+                                     value=f"{world}_{h['district_id']}_{h['ward_number']}_{h['plot_number']}")
+                for h in chunk
+            ],
+        ))
+    view.stop()
+    return view
+
+
+def make_houses(plots):
+    houses = []
+    world_id = 1
+    while len(houses) < plots:
+        for district in make_world_payload(world_id, 30)['districts']:
+            houses.extend(district['open_plots'])
+        world_id += 1
+    return [dict(h) for h in houses[:plots]]
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    retained = build()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, retained
+
+
+async def main(plots):
+    houses = make_houses(plots)
+
+    def legacy():
+        # O ViewStore do discord.py mantém cada view viva até o timeout
+        return [LegacyNotificationButton(house, 'behemoth') for house in houses]
+
+    def stateless():
+        persistent = stateless_view([], 'behemoth')
+        for page in chunked(houses, SELECT_MAX_OPTIONS * MESSAGE_MAX_SELECTS):
+            stateless_view(page, 'behemoth')
+        return [persistent]
+
+    legacy_bytes, legacy_views = measure(legacy)
+    for view in legacy_views:
+        view.stop()
+    stateless_bytes, _ = measure(stateless)
+
+    print(f"{plots} casas postadas")
+    print(f"uma view por casa:   {legacy_bytes / 1024:10.1f} KiB retidos")
+    print(f"view persistente:    {stateless_bytes / 1024:10.1f} KiB retidos")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--plots', type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(main(args.plots))
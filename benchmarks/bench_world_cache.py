@@ -0,0 +1,40 @@
+# Mostra quantas chamadas ao PaissaDB um ciclo de atualização faz com e sem o
+# cache de snapshots, conforme o número de canais cresce.
+#
+# Uso: python -m benchmarks.bench_world_cache [--worlds 8] [--latency 0.05]
+import argparse
+import asyncio
+
+from benchmarks.fake_paissa import FakePaissaServer
+from paissa import PaissaClient, WorldSnapshotCache
+
+
+async def run_cycle(channels, worlds, base_url, use_cache):
+    client = PaissaClient(base_url=base_url)
+    cache = WorldSnapshotCache(client.get_world, ttl=300)
+    fetch = cache.get if use_cache else client.get_world
+    try:
+        await asyncio.gather(*(fetch(78 + i % worlds) for i in range(channels)))
+    finally:
+        await client.close()
+    return cache.stats()
+
+
+async def main(worlds, latency):
+    print(f"{'canais':>7} {'sem cache':>10} {'com cache':>10}")
+    for channels in (10, 100, 1000):
+        async with FakePaissaServer(latency=latency, plots_per_district=5) as server:
+            await run_cycle(channels, worlds, server.base_url, use_cache=False)
+            uncached = server.request_count
+            server.request_count = 0
+            await run_cycle(channels, worlds, server.base_url, use_cache=True)
+            cached = server.request_count
+        print(f"{channels:>7} {uncached:>10} {cached:>10}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--worlds', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.05)
+    args = parser.parse_args()
+    asyncio.run(main(args.worlds, args.latency))
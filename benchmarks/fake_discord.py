@@ -0,0 +1,238 @@
+import asyncio
+import itertools
+import logging
+import time
+from collections import Counter
+
+from cleanup import DISCORD_EPOCH
+
+# Mesmo logger usado pelo discord.py: os avisos de 429 simulados aparecem no
+# log e no contador de 429 do bot como os de verdade
+http_log = logging.getLogger('discord.http')
+
+
+# Token bucket de uma rota do Discord. Sem tokens, a chamada "recebe" um 429 e
+# espera o Retry-After antes de tentar de novo, como o discord.py faz sozinho.
+class RateBucket:
+    def __init__(self, rate, per):
+        self.rate = rate
+        self.per = per
+        self._tokens = rate
+        self._last = time.monotonic()
+
+    def retry_after(self):
+        now = time.monotonic()
+        self._tokens = min(self.rate, self._tokens + (now - self._last) * self.rate / self.per)
+        self._last = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) * self.per / self.rate
+
+
+# Camada falsa do Discord para os benchmarks: registra cada chamada por
+# operação, aplica latência e os buckets globais, por canal e por usuário
+class FakeDiscord:
+    def __init__(self, latency=0.02, global_rate=50, channel_rate=5, channel_per=5.0, dm_rate=5, dm_per=5.0):
+        self.latency = latency
+        self.calls = Counter()
+        self.rate_limited = 0
+        self.guilds = {}
+        self.channels = {}
+        self.users = {}
+        self._global = RateBucket(global_rate, 1.0)
+        self._channel_limits = (channel_rate, channel_per)
+        self._dm_limits = (dm_rate, dm_per)
+        self._buckets = {}
+        self._ids = itertools.count()
+
+    def snowflake(self):
+        return (int(time.time() * 1000) - DISCORD_EPOCH) << 22 | (next(self._ids) & 0x3FFFFF)
+
+    # Respostas de interação não contam no limite global do Discord
+    async def request(self, op, bucket_key=None, limits=None, global_limit=True):
+        while True:
+            delay = self._global.retry_after() if global_limit else 0.0
+            scope = 'global'
+            if not delay and bucket_key is not None:
+                bucket = self._buckets.get(bucket_key)
+                if bucket is None:
+                    bucket = self._buckets[bucket_key] = RateBucket(*limits)
+                delay = bucket.retry_after()
+                scope = op
+            if not delay:
+                break
+            self.rate_limited += 1
+            if scope == 'global':
+                http_log.warning('Global rate limit has been hit. Retrying in %.2f seconds.', delay)
+            else:
+                http_log.warning('We are being rate limited. %s %s responded with 429. Retrying in %.2f seconds.',
+                                 'POST', op, delay)
+            await asyncio.sleep(delay)
+        self.calls[op] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def channel_request(self, op, channel_id):
+        await self.request(op, ('channel', channel_id), self._channel_limits)
+
+    def add_guild(self, name=None):
+        guild = FakeGuild(self, self.snowflake(), name)
+        self.guilds[guild.id] = guild
+        return guild
+
+    def add_user(self):
+        user = FakeUser(self, self.snowflake())
+        self.users[user.id] = user
+        return user
+
+    def get_guild(self, guild_id):
+        return self.guilds.get(guild_id)
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+    def get_user(self, user_id):
+        return self.users.get(user_id)
+
+    def get_partial_messageable(self, channel_id):
+        return self.channels.get(channel_id) or FakeChannel(self, channel_id)
+
+    async def wait_until_ready(self):
+        pass
+
+    async def fetch_user(self, user_id):
+        await self.request('fetch_user')
+        return self.users[user_id]
+
+    # Liga o bot à camada falsa no lugar do cache e das chamadas REST do discord.py
+    def install(self, bot):
+        bot.get_guild = self.get_guild
+        bot.get_channel = self.get_channel
+        bot.get_user = self.get_user
+        bot.fetch_user = self.fetch_user
+        bot.get_partial_messageable = self.get_partial_messageable
+        bot.wait_until_ready = self.wait_until_ready
+
+    def stats(self):
+        return {'calls': dict(self.calls), 'total': sum(self.calls.values()), 'rate_limited': self.rate_limited}
+
+
+class FakeGuild:
+    def __init__(self, discord, guild_id, name=None):
+        self.discord = discord
+        self.id = guild_id
+        self.name = name or f"guild-{guild_id}"
+        self.channels = {}
+
+    def add_channel(self, name=None):
+        channel = FakeChannel(self.discord, self.discord.snowflake(), self, name)
+        self.channels[channel.id] = channel
+        self.discord.channels[channel.id] = channel
+        return channel
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+
+class FakeMessage:
+    def __init__(self, channel, message_id, embeds=None, view=None):
+        self.channel = channel
+        self.id = message_id
+        self.embeds = embeds or []
+        self.view = view
+
+    async def edit(self, embeds=None, embed=None, view=None, **kwargs):
+        await self.channel.discord.channel_request('edit', self.channel.id)
+        self.channel.messages[self.id] = self.embeds = embeds or ([embed] if embed else [])
+
+    async def delete(self):
+        await self.channel.discord.channel_request('delete', self.channel.id)
+        self.channel.messages.pop(self.id, None)
+
+
+class FakeChannel:
+    def __init__(self, discord, channel_id, guild=None, name=None):
+        self.discord = discord
+        self.id = channel_id
+        self.guild = guild
+        self.name = name or f"channel-{channel_id}"
+        self.mention = f"<#{channel_id}>"
+        self.messages = {}
+
+    async def send(self, content=None, embed=None, embeds=None, view=None, **kwargs):
+        await self.discord.channel_request('send', self.id)
+        message = FakeMessage(self, self.discord.snowflake(), embeds or ([embed] if embed else []), view)
+        self.messages[message.id] = message.embeds
+        return message
+
+    def get_partial_message(self, message_id):
+        return FakeMessage(self, message_id)
+
+    async def delete_messages(self, messages):
+        await self.discord.channel_request('bulk_delete', self.id)
+        for message in messages:
+            self.messages.pop(message.id, None)
+
+    async def history(self, limit=None):
+        for message_id in sorted(self.messages, reverse=True)[:limit]:
+            yield FakeMessage(self, message_id)
+
+
+class FakeUser:
+    def __init__(self, discord, user_id):
+        self.discord = discord
+        self.id = user_id
+        self.dms = 0
+
+    async def send(self, content=None, embed=None, **kwargs):
+        await self.discord.request('dm', ('dm', self.id), self.discord._dm_limits)
+        self.dms += 1
+
+    def __str__(self):
+        return f"user{self.id}"
+
+
+class FakePermissions:
+    administrator = True
+    manage_channels = True
+
+
+class FakeMember(FakeUser):
+    guild_permissions = FakePermissions()
+
+
+class FakeResponse:
+    def __init__(self, interaction):
+        self._interaction = interaction
+
+    async def defer(self, **kwargs):
+        await self._interaction.discord.request('interaction_response', global_limit=False)
+
+    async def send_message(self, content=None, **kwargs):
+        await self._interaction.discord.request('interaction_response', global_limit=False)
+
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self._interaction = interaction
+
+    async def send(self, content=None, embed=None, view=None, wait=False, **kwargs):
+        await self._interaction.discord.request('followup', global_limit=False)
+        return FakeMessage(self._interaction.channel, self._interaction.discord.snowflake(),
+                           [embed] if embed else [], view)
+
+
+# Interação de slash command: responde pelo response/followup e registra as chamadas
+class FakeInteraction:
+    def __init__(self, discord, channel, user=None):
+        self.discord = discord
+        self.channel = channel
+        self.guild = channel.guild
+        self.guild_id = channel.guild.id if channel.guild else None
+        self.user = user or FakeMember(discord, discord.snowflake())
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+
+    async def edit_original_response(self, **kwargs):
+        await self.discord.request('edit_original', global_limit=False)
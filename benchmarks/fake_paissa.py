@@ -0,0 +1,268 @@
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+
+from aiohttp import web
+
+# IDs dos distritos usados pelo PaissaDB
+DISTRICT_IDS = [339, 340, 341, 641, 979]
+
+
+# Gera um payload sintético no mesmo formato de /worlds/{id}
+def make_world_payload(world_id, plots_per_district=30, seed=None):
+    rng = random.Random(seed if seed is not None else world_id)
+    now = time.time()
+    districts = []
+    for district_id in DISTRICT_IDS:
+        open_plots = []
+        for _ in range(plots_per_district):
+            open_plots.append({
+                'world_id': world_id,
+                'district_id': district_id,
+                'ward_number': rng.randrange(30),
+                'plot_number': rng.randrange(60),
+                'size': rng.randrange(3),
+                'price': rng.choice([3000000, 16000000, 40000000]),
+                'last_updated_time': now,
+                'first_seen_time': now - 3600,
+                'est_time_open_min': now - 7200,
+                'est_time_open_max': now - 3600,
+                'purchase_system': 7,
+                'lotto_entries': rng.randrange(200),
+                'lotto_phase': rng.choice([1, 1, 1, 2]),
+                'lotto_phase_until': int(now) + rng.randrange(86400 * 5),
+            })
+        districts.append({
+            'id': district_id,
+            'name': str(district_id),
+            'num_open_plots': len(open_plots),
+            'oldest_plot_time': now - 7200,
+            'open_plots': open_plots,
+        })
+    return {'id': world_id, 'name': str(world_id), 'districts': districts}
+
+
+# Campos de um evento plot_update do PaissaDB: só a casa e os dados da loteria
+# (tamanho, preço e horários de abertura ficam de fora)
+PLOT_UPDATE_FIELDS = ('world_id', 'district_id', 'ward_number', 'plot_number', 'last_updated_time',
+                      'purchase_system', 'lotto_entries', 'lotto_phase', 'lotto_phase_until')
+
+
+# Gera eventos sintéticos no formato do websocket do PaissaDB a partir dos
+# plots de um payload: mudanças de inscrições/fase, vendas e novas aberturas
+def make_plot_events(payload, count, seed=0):
+    rng = random.Random(seed)
+    plots = [plot for district in payload['districts'] for plot in district['open_plots']]
+    events = []
+    for _ in range(count):
+        roll = rng.random()
+        plot = dict(rng.choice(plots))
+        plot['last_updated_time'] = time.time()
+        if roll < 0.1:
+            events.append({'type': 'plot_sold', 'data': plot})
+        elif roll < 0.2:
+            plot['ward_number'] = rng.randrange(30)
+            plot['plot_number'] = rng.randrange(60)
+            events.append({'type': 'plot_open', 'data': plot})
+        else:
+            previous_phase = plot.get('lotto_phase')
+            plot['lotto_entries'] = (plot.get('lotto_entries') or 0) + rng.randrange(1, 5)
+            plot['lotto_phase'] = rng.choice([1, 1, 2])
+            update = {field: plot[field] for field in PLOT_UPDATE_FIELDS if field in plot}
+            update['previous_lotto_phase'] = previous_phase
+            events.append({'type': 'plot_update', 'data': update})
+    return events
+
+
+# Lê eventos gravados (um JSON por linha) para serem reproduzidos pelo servidor falso
+def load_events(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# Lê respostas de /worlds/{id} gravadas (um JSON por linha) como {id: payload}
+def load_payloads(path):
+    return {payload['id']: payload for payload in load_events(path)}
+
+
+# Servidor local que imita o PaissaDB com latência configurável. Além de
+# /worlds/{id}, expõe /ws, que publica os eventos passados para `publish` (ou
+# reproduzidos por `replay`) para os clientes conectados no momento, como o
+# websocket real: quem estiver desconectado perde o evento. Cada evento também
+# é aplicado ao payload do mundo, para que uma nova busca reflita o estado atual.
+class FakePaissaServer:
+    def __init__(self, latency=0.0, plots_per_district=30, host='127.0.0.1', port=0, etag=False,
+                 world_latency=None, payloads=None):
+        self.latency = latency
+        # Latência por mundo: {id: segundos ou função que devolve segundos}
+        self.world_latency = world_latency or {}
+        self.etag = etag
+        self.plots_per_district = plots_per_district
+        self.host = host
+        self.port = port
+        self.request_count = 0
+        self.not_modified = 0
+        # Payloads gravados ({id: payload}); os mundos que faltarem são sintéticos
+        self.payloads = dict(payloads or {})
+        self.published = 0
+        self.published_at = {}
+        self._sockets = set()
+        self._runner = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def _handle_world(self, request):
+        self.request_count += 1
+        world_id = int(request.match_info['world_id'])
+        latency = self.world_latency.get(world_id, self.latency)
+        if callable(latency):
+            latency = latency()
+        if latency:
+            await asyncio.sleep(latency)
+        body = json.dumps(self._payload(world_id))
+        if not self.etag:
+            return web.Response(text=body, content_type='application/json')
+        # Com etag=True, responde 304 quando o cliente já tem a versão atual
+        etag = '"' + hashlib.md5(body.encode()).hexdigest() + '"'
+        if request.headers.get('If-None-Match') == etag:
+            self.not_modified += 1
+            return web.Response(status=304, headers={'ETag': etag})
+        return web.Response(text=body, content_type='application/json', headers={'ETag': etag})
+
+    def _payload(self, world_id):
+        payload = self.payloads.get(world_id)
+        if payload is None:
+            payload = self.payloads[world_id] = make_world_payload(world_id, self.plots_per_district)
+        return payload
+
+    def _apply(self, event):
+        data = event['data']
+        payload = self._payload(data['world_id'])
+        for district in payload['districts']:
+            if district['id'] != data['district_id']:
+                continue
+            position = (data['ward_number'], data['plot_number'])
+            if event['type'] == 'plot_update':
+                # Só os campos do evento mudam; o resto da casa continua igual
+                for plot in district['open_plots']:
+                    if (plot['ward_number'], plot['plot_number']) == position:
+                        plot.update(data)
+                continue
+            district['open_plots'] = [
+                plot for plot in district['open_plots'] if (plot['ward_number'], plot['plot_number']) != position
+            ]
+            if event['type'] != 'plot_sold':
+                district['open_plots'].append(dict(data))
+            district['num_open_plots'] = len(district['open_plots'])
+
+    async def _handle_ws(self, request):
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        self._sockets.add(ws)
+        try:
+            async for _ in ws:
+                pass
+        finally:
+            self._sockets.discard(ws)
+        return ws
+
+    async def publish(self, event):
+        self._apply(event)
+        data = event['data']
+        self.published += 1
+        self.published_at[(data['world_id'], data['district_id'], data['ward_number'], data['plot_number'])] = time.perf_counter()
+        message = json.dumps(event)
+        for ws in list(self._sockets):
+            try:
+                await ws.send_str(message)
+            except ConnectionError:
+                self._sockets.discard(ws)
+
+    # Publica eventos gravados com um intervalo fixo entre eles
+    async def replay(self, events, interval=0.0):
+        for event in events:
+            await self.publish(event)
+            if interval:
+                await asyncio.sleep(interval)
+
+    # Derruba todas as conexões do websocket (simula queda do stream)
+    async def drop_connections(self):
+        for ws in list(self._sockets):
+            await ws.close()
+
+    @property
+    def connected_clients(self):
+        return len(self._sockets)
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/worlds/{world_id}', self._handle_world)
+        app.router.add_get('/ws', self._handle_ws)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    @property
+    def ws_url(self):
+        return f"ws://{self.host}:{self.port}/ws"
+
+    async def stop(self):
+        await self.drop_connections()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+
+# Roda o servidor falso em uma thread separada, com seu próprio event loop.
+# Necessário para medir clientes bloqueantes sem travar o próprio servidor.
+class ThreadedFakePaissaServer:
+    def __init__(self, **kwargs):
+        self.server = FakePaissaServer(**kwargs)
+        self._loop = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return self.server.base_url
+
+    def start(self):
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.server.start())
+            ready.set()
+            self._loop.run_forever()
+            self._loop.run_until_complete(self.server.stop())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,261 @@
+# Teste de carga do bot inteiro, sem rede: importa o bot.py de verdade e liga o
+# cliente do PaissaDB ao servidor falso (payloads sintéticos ou gravados, com
+# latência ajustável) e o bot à camada falsa do Discord (registra as chamadas e
+# simula os buckets de 429). Cada cenário mostra o tempo, as chamadas ao
+# PaissaDB e ao Discord, os 429, o atraso do event loop e o pico de RSS.
+#
+# Cenários:
+#   worlds         busca e compara todos os mundos (completa e sem mudança)
+#   channels       um canal por servidor: ciclo inicial, detecção e ciclo incremental
+#   subscribers    usuários inscritos em casas: mudanças viram resumos por DM
+#   housing_check  /housing_check por data center, com o cache vazio e quente
+#   feeds          um canal por mundo do data center x um único canal com o data center inteiro
+#
+# Uso: python -m benchmarks.load_test [--scenario all] [--guilds 1000] [--subscribers 10000]
+#          [--queries 200] [--plots 30] [--changes 0.05] [--paissa-latency 0.05]
+#          [--discord-latency 0.02] [--payloads mundos.jsonl] [--feed-guilds 20]
+import argparse
+import asyncio
+import importlib
+import logging
+import os
+import random
+import resource
+import tempfile
+import time
+from collections import Counter
+
+from benchmarks.fake_discord import FakeDiscord, FakeInteraction
+from benchmarks.fake_paissa import FakePaissaServer, load_payloads, make_plot_events
+from benchmarks.loop_lag import LoopLagMonitor
+
+
+def peak_rss_mib():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+# Importa o bot apontando para o servidor falso, com o estado num diretório temporário
+def load_bot(base_url, discord):
+    os.chdir(tempfile.mkdtemp(prefix='housing-load-'))
+    os.environ['PAISSA_BASE_URL'] = base_url
+    os.environ['PAISSA_WS_URL'] = ''
+    os.environ['PAISSA_RECORD_PATH'] = ''
+    os.environ['METRICS_PORT'] = ''
+    os.environ['HOUSING_DB_PATH'] = 'housing.db'
+    bot = importlib.import_module('bot')
+    bot.paissa_client.base_url = base_url
+    # O paissa.py pode ter sido importado antes das variáveis acima
+    bot.paissa_stream = None
+    discord.install(bot.bot)
+    return bot
+
+
+class LoadTest:
+    def __init__(self, bot, server, discord, rng):
+        self.bot = bot
+        self.server = server
+        self.discord = discord
+        self.rng = rng
+        self.worlds = list(bot.WORLD_IDS)
+
+    async def measure(self, name, run):
+        monitor = await LoopLagMonitor().start()
+        calls = Counter(self.discord.calls)
+        limited = self.discord.rate_limited
+        requests = self.server.request_count
+        start = time.perf_counter()
+        details = await run()
+        elapsed = time.perf_counter() - start
+        await monitor.stop()
+        lag = monitor.summary()
+        ops = Counter(self.discord.calls)
+        ops.subtract(calls)
+        print(f"{name:<30} {elapsed:>8.2f}s {self.server.request_count - requests:>8} "
+              f"{sum(ops.values()):>8} {self.discord.rate_limited - limited:>5} "
+              f"{lag['p99_ms']:>8.1f} {lag['max_ms']:>8.1f} {peak_rss_mib():>8.1f}")
+        ops_text = " ".join(f"{op}={count}" for op, count in sorted(ops.items()) if count)
+        if ops_text or details:
+            print(f"{'':<30} {ops_text} {details or ''}".rstrip())
+
+    async def poll_all(self):
+        await asyncio.gather(*(self.bot.poll_world(world) for world in self.worlds))
+
+    # Aplica mudanças aleatórias (inscrições, fases, vendas e aberturas) em
+    # uma fração das casas de cada mundo do servidor falso
+    async def mutate(self, fraction):
+        for world in self.worlds:
+            payload = self.server._payload(self.bot.WORLD_IDS[world])
+            plots = sum(len(district['open_plots']) for district in payload['districts'])
+            events = make_plot_events(payload, max(1, int(plots * fraction)), seed=self.rng.random())
+            await self.server.replay(events)
+
+    async def worlds_scenario(self, args):
+        await self.measure(f"worlds: {len(self.worlds)} mundos", self.poll_all)
+        await self.measure("worlds: sem mudança", self.poll_all)
+        await self.mutate(args.changes)
+        await self.measure(f"worlds: {args.changes:.0%} alteradas", self.poll_all)
+
+    async def channels_scenario(self, args):
+        for index in range(args.guilds):
+            guild = self.discord.add_guild()
+            channel = guild.add_channel()
+            self.bot.housing_channels[str(guild.id)] = {
+                'guild_name': guild.name,
+                'channels': {str(channel.id): {
+                    'channel_name': channel.name,
+                    'world': self.worlds[index % len(self.worlds)],
+                    'district': None,
+                    'messages': [],
+                }},
+            }
+
+        async def cycle():
+            await self.bot.update_housing_channels()
+            last = self.bot.channel_scheduler.last_cycle
+            return f"(ciclo {last['duration']:.1f}s, falhas {last['failures']})"
+
+        # O world_poller já teria comparado cada mundo uma vez antes do primeiro ciclo
+        await self.poll_all()
+        await self.measure(f"channels: {args.guilds} servidores", cycle)
+        await self.mutate(args.changes)
+        await self.measure("channels: detecção", self.poll_all)
+        await self.measure("channels: ciclo incremental", cycle)
+
+    async def subscribers_scenario(self, args):
+        await self.poll_all()
+        house_keys = [
+            key
+            for world in self.worlds
+            for key in self.bot.change_detector._snapshots.get(world, {})
+        ]
+        for _ in range(args.subscribers):
+            user = self.discord.add_user()
+            user_id = str(user.id)
+            keys = self.rng.sample(house_keys, 3)
+            self.bot.user_notifications[user_id] = {'notifications': keys, 'username': str(user)}
+            for key in keys:
+                self.bot.subscription_index.add(user_id, key)
+        await self.mutate(args.changes)
+
+        async def notify():
+            await self.poll_all()
+            await self.bot.notification_dispatcher.flush()
+            await self.bot.notification_dispatcher.join()
+            stats = self.bot.notification_dispatcher.stats()
+            return f"(resumos {stats['delivered']}, novas tentativas {stats['retries']}, falhas {stats['failed']})"
+
+        await self.measure(f"subscribers: {args.subscribers} usuários", notify)
+
+    async def housing_check_scenario(self, args):
+        guild = self.discord.add_guild()
+        channel = guild.add_channel()
+        data_centers = list(self.bot.DATA_CENTERS)
+
+        async def queries():
+            latencies = []
+
+            async def query(data_center):
+                start = time.perf_counter()
+                await self.bot.casas_para_comprar.callback(FakeInteraction(self.discord, channel), data_center)
+                latencies.append(time.perf_counter() - start)
+
+            await asyncio.gather(*(query(data_centers[i % len(data_centers)]) for i in range(args.queries)))
+            return f"(p50 {percentile(latencies, 0.5) * 1000:.0f}ms, p95 {percentile(latencies, 0.95) * 1000:.0f}ms)"
+
+        self.bot.world_cache.invalidate()
+        await self.measure(f"housing_check: {args.queries} (frio)", queries)
+        await self.measure(f"housing_check: {args.queries} (quente)", queries)
+
+
+    # Mesmos servidores configurados de dois jeitos: um canal para cada mundo do
+    # data center ou um único canal com o data center inteiro. As seções de cada
+    # mundo são filtradas e montadas uma vez e reaproveitadas pelos canais.
+    async def feeds_scenario(self, args):
+        data_centers = list(self.bot.DATA_CENTERS)
+        layouts = {'por mundo': {}, 'por data center': {}}
+        for index in range(args.feed_guilds):
+            data_center = data_centers[index % len(data_centers)]
+            worlds = self.bot.DATA_CENTERS[data_center]
+            guild = self.discord.add_guild()
+            channels = {}
+            for world in worlds:
+                channel = guild.add_channel()
+                channels[str(channel.id)] = {'channel_name': channel.name, 'world': world, 'district': None, 'messages': []}
+            layouts['por mundo'][str(guild.id)] = {'guild_name': guild.name, 'channels': channels}
+
+            guild = self.discord.add_guild()
+            channel = guild.add_channel()
+            layouts['por data center'][str(guild.id)] = {'guild_name': guild.name, 'channels': {str(channel.id): {
+                'channel_name': channel.name, 'world': None, 'worlds': list(worlds), 'data_center': data_center,
+                'district': None, 'messages': [],
+            }}}
+
+        feed_worlds = sorted({world for data_center in data_centers for world in self.bot.DATA_CENTERS[data_center]})
+        await asyncio.gather(*(self.bot.poll_world(world) for world in feed_worlds))
+        for name, layout in layouts.items():
+            self.bot.housing_channels.clear()
+            self.bot.housing_channels.update(layout)
+            channels = sum(len(guild_data['channels']) for guild_data in layout.values())
+
+            async def cycle():
+                feeds = self.bot.channel_feeds.stats()
+                await self.bot.update_housing_channels()
+                last = self.bot.channel_scheduler.last_cycle
+                stats = self.bot.channel_feeds.stats()
+                return (f"(ciclo {last['duration']:.1f}s, seções montadas {stats['misses'] - feeds['misses']}, "
+                        f"reaproveitadas {stats['hits'] - feeds['hits']})")
+
+            await self.measure(f"feeds: {name} ({channels})", cycle)
+            for data_center in data_centers:
+                for world in self.bot.DATA_CENTERS[data_center]:
+                    payload = self.server._payload(self.bot.WORLD_IDS[world])
+                    plots = sum(len(district['open_plots']) for district in payload['districts'])
+                    await self.server.replay(make_plot_events(payload, max(1, int(plots * args.changes)),
+                                                              seed=self.rng.random()))
+            await asyncio.gather(*(self.bot.poll_world(world) for world in feed_worlds))
+            await self.measure(f"feeds: {name}, incr.", cycle)
+
+
+SCENARIOS = ['worlds', 'channels', 'subscribers', 'housing_check', 'feeds']
+
+
+async def main(args):
+    logging.basicConfig(level=logging.ERROR)
+    payloads = load_payloads(args.payloads) if args.payloads else None
+    server = FakePaissaServer(latency=args.paissa_latency, plots_per_district=args.plots, etag=True, payloads=payloads)
+    await server.start()
+    discord = FakeDiscord(latency=args.discord_latency)
+    bot = load_bot(server.base_url, discord)
+    await bot.bot.setup_hook()
+
+    test = LoadTest(bot, server, discord, random.Random(21))
+    print(f"{'cenário':<30} {'tempo':>9} {'PaissaDB':>8} {'Discord':>8} {'429':>5} "
+          f"{'lag p99':>8} {'lag máx':>8} {'RSS MiB':>8}")
+    try:
+        for name in SCENARIOS if args.scenario == 'all' else [args.scenario]:
+            await getattr(test, f"{name}_scenario")(args)
+    finally:
+        await bot.bot.close()
+        await server.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scenario', choices=['all'] + SCENARIOS, default='all')
+    parser.add_argument('--guilds', type=int, default=1000)
+    parser.add_argument('--subscribers', type=int, default=10000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--plots', type=int, default=30, help="casas por distrito nos mundos sintéticos")
+    parser.add_argument('--changes', type=float, default=0.05, help="fração das casas alteradas entre as rodadas")
+    parser.add_argument('--paissa-latency', type=float, default=0.05)
+    parser.add_argument('--discord-latency', type=float, default=0.02)
+    parser.add_argument('--payloads', help="respostas de /worlds/{id} gravadas, um JSON por linha")
+    parser.add_argument('--feed-guilds', type=int, default=20, help="servidores de cada configuração no cenário feeds")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,43 @@
+import asyncio
+import time
+
+
+# Mede o atraso do event loop: agenda um tick a cada `interval` segundos e
+# registra quanto cada um acordou atrasado em relação ao esperado
+class LoopLagMonitor:
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.samples = []
+        self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - start - self.interval))
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+        # Deixa o monitor começar a dormir antes da carga ser disparada
+        await asyncio.sleep(0)
+        return self
+
+    async def stop(self):
+        # Deixa um tick atrasado que já esteja pronto ser registrado
+        await asyncio.sleep(0)
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    def summary(self):
+        if not self.samples:
+            return {'max_ms': 0.0, 'p99_ms': 0.0, 'mean_ms': 0.0}
+        ordered = sorted(self.samples)
+        p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+        return {
+            'max_ms': ordered[-1] * 1000,
+            'p99_ms': p99 * 1000,
+            'mean_ms': sum(ordered) / len(ordered) * 1000,
+        }
@@ -0,0 +1,177 @@
+# Reproduz um log de respostas do PaissaDB (gravado com PAISSA_RECORD_PATH) no
+# bot inteiro, sem rede: as respostas dos mundos entram no lugar do cliente HTTP
+# (ReplayPaissaClient), os eventos do websocket passam por apply_stream_event e
+# o Discord é a camada falsa do teste de carga. O relógio virtual anda de
+# registro em registro, em tempo real (--speed 1), acelerado (--speed 60) ou o
+# mais rápido possível (--speed 0). A cada 30 minutos virtuais roda o ciclo de
+# canais e a cada minuto virtual envia os resumos por DM, como o bot.
+#
+# No fim mostra o tempo de cada etapa (conversão, comparação, montagem dos
+# embeds), as chamadas ao Discord, o atraso do event loop e o pico de RSS.
+#
+# Uso: python -m benchmarks.replay respostas.jsonl.gz [--speed 0] [--guilds 200] [--subscribers 2000]
+#      python -m benchmarks.replay --make-sample amostra.jsonl.gz [--worlds 24] [--hours 6]
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+
+from benchmarks.fake_discord import FakeDiscord
+from benchmarks.fake_paissa import FakePaissaServer, make_plot_events
+from benchmarks.load_test import load_bot, peak_rss_mib
+from benchmarks.loop_lag import LoopLagMonitor
+from metrics import registry
+from paissa import STREAM_PATH, PaissaClient, ReplayPaissaClient, ResponseRecorder, read_response_log
+
+CHANNEL_INTERVAL = 30 * 60
+DIGEST_INTERVAL = 60
+
+# Mundos de Primal, Aether e Crystal usados na sessão sintética
+SAMPLE_WORLD_IDS = [78, 93, 55, 64, 77, 53, 35, 95, 73, 79, 54, 63, 40, 65, 99, 57, 91, 34, 74, 62, 81, 75, 37, 41]
+
+
+# Grava uma sessão sintética com o cliente e o gravador de verdade contra o
+# servidor falso: a cada 2 minutos virtuais alguns eventos e uma busca de cada mundo
+async def make_sample(path, worlds, hours):
+    server = FakePaissaServer(etag=True)
+    await server.start()
+    now = [time.time() - hours * 3600]
+    recorder = ResponseRecorder(path, clock=lambda: now[0])
+    client = PaissaClient(base_url=server.base_url, recorder=recorder)
+    rng = random.Random(22)
+    world_ids = SAMPLE_WORLD_IDS[:worlds]
+    try:
+        for step in range(int(hours * 30)):
+            for world_id in world_ids:
+                payload = server._payload(world_id)
+                for event in make_plot_events(payload, rng.randrange(4), seed=rng.random()):
+                    now[0] += rng.random()
+                    await server.publish(event)
+                    recorder.record(STREAM_PATH, json.dumps(event))
+                await client.get_world(world_id, if_changed=True)
+            now[0] += 120
+            await recorder.flush()
+    finally:
+        await client.close()
+        await recorder.close()
+        await server.stop()
+    print(f"{recorder.records} registros, {os.path.getsize(path) / 1024:.0f} KiB comprimidos "
+          f"({recorder.bytes_written / 1024:.0f} KiB sem compressão) em {path}")
+
+
+def format_histogram(name):
+    histogram = registry.get(name)
+    if not histogram.count:
+        return "sem amostras"
+    return (f"n={histogram.count} total {histogram.sum:.2f}s p50 {histogram.quantile(0.5) * 1000:.2f}ms "
+            f"p95 {histogram.quantile(0.95) * 1000:.2f}ms")
+
+
+async def replay(path, speed, guilds, subscribers):
+    logging.basicConfig(level=logging.ERROR)
+    entries = read_response_log(path)
+    if not entries:
+        print("log vazio")
+        return
+    entries.sort(key=lambda entry: entry[0])
+    now = [entries[0][0]]
+    discord = FakeDiscord()
+    bot = load_bot('http://127.0.0.1:9', discord)
+    bot.paissa_client = ReplayPaissaClient(entries, clock=lambda: now[0])
+    await bot.bot.setup_hook()
+
+    worlds = sorted({
+        bot.WORLD_NAMES[int(entry_path.rsplit('/', 1)[1])]
+        for _, entry_path, _ in entries
+        if entry_path.startswith('/worlds/') and int(entry_path.rsplit('/', 1)[1]) in bot.WORLD_NAMES
+    })
+    rng = random.Random(22)
+
+    # Canais espalhados pelos mundos gravados e inscritos nas casas do início do log
+    for index in range(guilds if worlds else 0):
+        guild = discord.add_guild()
+        channel = guild.add_channel()
+        bot.housing_channels[str(guild.id)] = {
+            'guild_name': guild.name,
+            'channels': {str(channel.id): {
+                'channel_name': channel.name, 'world': worlds[index % len(worlds)], 'district': None, 'messages': [],
+            }},
+        }
+    await asyncio.gather(*(bot.poll_world(world) for world in worlds))
+    house_keys = [key for world in worlds for key in bot.change_detector._snapshots.get(world, {})]
+    for _ in range(subscribers if house_keys else 0):
+        user = discord.add_user()
+        keys = rng.sample(house_keys, min(3, len(house_keys)))
+        bot.user_notifications[str(user.id)] = {'notifications': keys, 'username': str(user)}
+        for key in keys:
+            bot.subscription_index.add(str(user.id), key)
+    await bot.update_housing_channels()
+    before = dict(discord.calls)
+
+    monitor = await LoopLagMonitor().start()
+    start = time.perf_counter()
+    next_digest = entries[0][0] + DIGEST_INTERVAL
+    next_cycle = entries[0][0] + CHANNEL_INTERVAL
+    responses = events = 0
+    for at, entry_path, body in entries:
+        if speed and at > now[0]:
+            await asyncio.sleep((at - now[0]) / speed)
+        now[0] = max(now[0], at)
+
+        if now[0] >= next_digest:
+            await bot.notification_dispatcher.flush()
+            next_digest = now[0] + DIGEST_INTERVAL
+        if now[0] >= next_cycle:
+            await bot.update_housing_channels()
+            next_cycle = now[0] + CHANNEL_INTERVAL
+
+        if entry_path == STREAM_PATH:
+            message = json.loads(body)
+            await bot.apply_stream_event(message['type'], message.get('data') or {})
+            events += 1
+        elif entry_path.startswith('/worlds/'):
+            world = bot.WORLD_NAMES.get(int(entry_path.rsplit('/', 1)[1]))
+            if world is not None:
+                await bot.poll_world(world)
+                responses += 1
+
+    await bot.notification_dispatcher.flush()
+    await bot.update_housing_channels()
+    await bot.notification_dispatcher.join()
+    elapsed = time.perf_counter() - start
+    await monitor.stop()
+    lag = monitor.summary()
+
+    span = entries[-1][0] - entries[0][0]
+    calls = {op: count - before.get(op, 0) for op, count in discord.calls.items() if count - before.get(op, 0)}
+    print(f"{len(entries)} registros ({responses} respostas de mundos, {events} eventos) cobrindo "
+          f"{span / 3600:.1f}h reproduzidos em {elapsed:.1f}s ({span / elapsed if elapsed else 0:.0f}x)")
+    print(f"{len(worlds)} mundos, {guilds} canais, {subscribers} inscritos")
+    print(f"conversão:   {format_histogram('housing_parse_seconds')}")
+    print(f"comparação:  {format_histogram('housing_diff_seconds')}")
+    print(f"embeds:      {format_histogram('housing_render_seconds')}")
+    print(f"mudanças:    {registry.get('housing_change_events_total').total()}")
+    print(f"Discord:     {' '.join(f'{op}={count}' for op, count in sorted(calls.items()))} 429={discord.rate_limited}")
+    print(f"event loop:  lag p99 {lag['p99_ms']:.1f}ms máx {lag['max_ms']:.1f}ms • RSS pico {peak_rss_mib():.1f} MiB")
+    await bot.bot.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('log', nargs='?')
+    parser.add_argument('--make-sample', metavar='ARQUIVO')
+    parser.add_argument('--worlds', type=int, default=len(SAMPLE_WORLD_IDS))
+    parser.add_argument('--hours', type=float, default=6)
+    parser.add_argument('--speed', type=float, default=0, help="0 = o mais rápido possível")
+    parser.add_argument('--guilds', type=int, default=200)
+    parser.add_argument('--subscribers', type=int, default=2000)
+    args = parser.parse_args()
+    if args.make_sample:
+        asyncio.run(make_sample(args.make_sample, args.worlds, args.hours))
+    elif args.log:
+        asyncio.run(replay(os.path.abspath(args.log), args.speed, args.guilds, args.subscribers))
+    else:
+        parser.error("informe o log a reproduzir ou --make-sample")
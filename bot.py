@@ -2,95 +2,148 @@ import os
 import discord
 from discord import app_commands
 from discord.ext import commands, tasks
-import requests
 from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 import asyncio
 from datetime import datetime, timedelta
+import hashlib
 import json
+import logging
+import time
+import unicodedata
+
+from paissa import (PAISSA_RECORD_PATH, PAISSA_WS_URL, PLOT_OPEN, PLOT_SOLD, PaissaClient, PaissaError, PaissaStream,
+                    ResponseRecorder, WorldSnapshotCache, gather_within)
+from analytics import HousingStats
+from changes import PLOT_CLOSED, ChangeDetector
+from cleanup import MessageDeleter
+from feeds import FeedCache, channel_worlds
+from history import HistoryStore
+from metrics import MetricsServer, registry
+from layout import EMBED_MAX_FIELDS, MESSAGE_MAX_SELECTS, SELECT_MAX_OPTIONS, chunked, pack_sections
+from notifications import DigestDispatcher, LRUCache, SubscriptionIndex, exponential_backoff
+from scheduler import AdaptivePollScheduler, ChannelUpdateScheduler, ExpiryScheduler, KeyedRateLimiter, phase_aware_delay
+from snapshot import DISTRICT_IDS, RANKINGS, SIZE_CODES, SIZE_NAMES, Plot, WorldSnapshot, match_districts, rank_plots, size_counts
+from storage import SqliteStateStore, world_of
 
 # Carrega as variáveis de ambiente
 load_dotenv()
 
+log = logging.getLogger('bot')
+
+# Nível dos logs (DEBUG, INFO, WARNING...) e porta local do endpoint de métricas
+# no formato do Prometheus (vazio desativa)
+LOG_LEVEL = getattr(logging, os.getenv('LOG_LEVEL', 'INFO').upper(), logging.INFO)
+METRICS_PORT = os.getenv('METRICS_PORT', '9108')
+HOUSING_HISTORY_PATH = os.getenv('HOUSING_HISTORY_PATH', 'history')
+
+PARSE_SECONDS = registry.histogram('housing_parse_seconds', 'Tempo para converter a resposta de um mundo em snapshot')
+RENDER_SECONDS = registry.histogram('housing_render_seconds', 'Tempo para montar os embeds de um canal')
+CYCLE_SECONDS = registry.histogram('housing_cycle_seconds', 'Duração dos ciclos de atualização de canais',
+                                   buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600))
+DISCORD_REQUESTS = registry.counter('discord_requests_total', 'Chamadas à API do Discord por operação', labels=('op',))
+DISCORD_RATE_LIMITED = registry.counter('discord_rate_limited_total', 'Respostas 429 recebidas do Discord')
+DISCORD_GLOBAL_RATE_LIMITED = registry.counter('discord_global_rate_limited_total',
+                                               'Respostas 429 do limite global do Discord (já contadas no total)')
+
+
+# Conta os 429 pelo log do discord.py, que trata as novas tentativas sozinho.
+# Todo 429 gera a linha "We are being rate limited"; um 429 global gera também
+# a linha "Global rate limit has been hit", que só entra no contador global.
+# O logger discord.http fica sempre em WARNING (ou abaixo) para a contagem não
+# depender do LOG_LEVEL, e os registros seguem para o logger "discord" só se
+# passarem no nível configurado.
+class RateLimitCounter(logging.Handler):
+    def emit(self, record):
+        message = str(record.msg)
+        if message.startswith('We are being rate limited'):
+            DISCORD_RATE_LIMITED.inc()
+        elif message.startswith('Global rate limit has been hit'):
+            DISCORD_GLOBAL_RATE_LIMITED.inc()
+        parent = logging.getLogger('discord')
+        if record.levelno >= parent.getEffectiveLevel():
+            parent.handle(record)
+
+discord_http_log = logging.getLogger('discord.http')
+discord_http_log.setLevel(min(LOG_LEVEL, logging.WARNING))
+discord_http_log.propagate = False
+discord_http_log.addHandler(RateLimitCounter())
+
 # Configuração do bot
 intents = discord.Intents.default()
 intents.message_content = True
-bot = commands.Bot(command_prefix='/', intents=intents)
+
+# Com PAISSA_RECORD_PATH, todas as respostas do PaissaDB (HTTP e websocket) são
+# gravadas para reproduzir a carga depois (python -m benchmarks.replay)
+paissa_recorder = ResponseRecorder(PAISSA_RECORD_PATH) if PAISSA_RECORD_PATH else None
+
+# Cliente compartilhado do PaissaDB (uma única sessão HTTP para todo o bot)
+paissa_client = PaissaClient(recorder=paissa_recorder)
+
+metrics_server = MetricsServer(registry, port=int(METRICS_PORT)) if METRICS_PORT else None
+
+class HousingBot(commands.Bot):
+    async def setup_hook(self):
+        state_store.start()
+        notification_dispatcher.start()
+        message_expiry.start()
+        if paissa_stream is not None:
+            paissa_stream.start()
+        if metrics_server is not None:
+            await metrics_server.start()
+        if paissa_recorder is not None:
+            paissa_recorder.start()
+        if history_store is not None:
+            history_store.start()
+        # Uma única view persistente atende os menus de inscrição de todas as mensagens
+        self.add_view(PlotSubscriptionView())
+
+    async def close(self):
+        if metrics_server is not None:
+            await metrics_server.close()
+        if paissa_stream is not None:
+            await paissa_stream.close()
+        await world_poller.close()
+        await message_expiry.close()
+        await notification_dispatcher.close()
+        await state_store.close()
+        if history_store is not None:
+            await history_store.close()
+        await paissa_client.close()
+        if paissa_recorder is not None:
+            await paissa_recorder.close()
+        await super().close()
+
+bot = HousingBot(command_prefix='/', intents=intents)
+
+# Estado persistido em SQLite; na primeira execução importa os arquivos JSON antigos
+state_store = SqliteStateStore(os.getenv('HOUSING_DB_PATH', 'housing.db'), interval=10)
+state_store.migrate_from_json('housing_channels.json', 'user_notifications.json', 'last_known_status.json')
+state_store.evict_unsubscribed_statuses()
 
 # Dicionário para armazenar as configurações dos canais de housing
-housing_channels = {}
+housing_channels = state_store.load_housing_channels()
 
 # Dicionário para armazenar as notificações dos usuários
-user_notifications = {}
+user_notifications = state_store.load_user_notifications()
 
 # Dicionário para armazenar o último status conhecido de cada casa
-last_known_status = {}
+last_known_status = state_store.load_last_known_status()
 
-# Função para salvar as configurações dos canais
-def save_housing_channels():
-    with open('housing_channels.json', 'w') as f:
-        json.dump(housing_channels, f, indent=4)
+# Função para salvar a configuração de um canal
+def save_housing_channel(guild_id, channel_id):
+    guild_data = housing_channels[guild_id]
+    state_store.save_channel(guild_id, guild_data["guild_name"], channel_id, guild_data["channels"][channel_id])
 
-# Função para carregar as configurações dos canais
-def load_housing_channels():
-    try:
-        with open('housing_channels.json', 'r') as f:
-            content = f.read()
-            if not content:  # Se o arquivo estiver vazio
-                return {}
-            return json.loads(content)
-    except (FileNotFoundError, json.JSONDecodeError):
-        # Se o arquivo não existir ou estiver mal formatado, cria um novo
-        with open('housing_channels.json', 'w') as f:
-            json.dump({}, f, indent=4)
-        return {}
-
-# Função para salvar as notificações dos usuários
-def save_user_notifications():
-    with open('user_notifications.json', 'w') as f:
-        json.dump(user_notifications, f, indent=4)
-
-# Função para salvar o último status conhecido
-def save_last_known_status():
-    with open('last_known_status.json', 'w') as f:
-        json.dump(last_known_status, f, indent=4)
-
-# Função para carregar as notificações dos usuários
-def load_user_notifications():
-    try:
-        with open('user_notifications.json', 'r') as f:
-            content = f.read()
-            if not content:  # Se o arquivo estiver vazio
-                return {}
-            return json.loads(content)
-    except (FileNotFoundError, json.JSONDecodeError):
-        # Se o arquivo não existir ou estiver mal formatado, cria um novo
-        with open('user_notifications.json', 'w') as f:
-            json.dump({}, f, indent=4)
-        return {}
-
-# Função para carregar o último status conhecido
-def load_last_known_status():
-    try:
-        with open('last_known_status.json', 'r') as f:
-            content = f.read()
-            if not content:  # Se o arquivo estiver vazio
-                return {}
-            return json.loads(content)
-    except (FileNotFoundError, json.JSONDecodeError):
-        # Se o arquivo não existir ou estiver mal formatado, cria um novo
-        with open('last_known_status.json', 'w') as f:
-            json.dump({}, f, indent=4)
-        return {}
-
-# Carrega as configurações salvas
-housing_channels = load_housing_channels()
-
-# Carrega as notificações salvas
-user_notifications = load_user_notifications()
-
-# Carrega o último status conhecido
-last_known_status = load_last_known_status()
+# Função para salvar o último status conhecido de uma casa
+def save_last_known_status(house_key):
+    if house_key in last_known_status:
+        state_store.save_status(house_key, last_known_status[house_key])
+    else:
+        state_store.delete_status(house_key)
+
+# Índice reverso: chave da casa -> usuários inscritos
+subscription_index = SubscriptionIndex.from_user_notifications(user_notifications)
 
 # Dicionário de data centers e mundos
 DATA_CENTERS = {
@@ -218,24 +271,15 @@ WORLD_IDS = {
 # Tamanhos de casa disponíveis
 HOUSE_SIZES = ['small', 'medium', 'large']
 
-# Distritos disponíveis
-DISTRICTS = ['shirogane', 'lavender beds', 'mist', 'goblet', 'empyreum']
+# Tempo máximo de espera pelos mundos na consulta de um data center inteiro
+DC_QUERY_BUDGET = 5
 
-# Mapeamento de IDs dos distritos para nomes
-DISTRICT_IDS = {
-    339: "Mist",
-    340: "The Lavender Beds",
-    341: "The Goblet",
-    641: "Shirogane",
-    979: "Empyreum"
-}
+# Tempo de vida da resposta do /housing_check e casas por página
+HOUSING_CHECK_TTL = 300
+HOUSING_CHECK_PAGE_SIZE = 10
 
-# Mapeamento de tamanhos
-SIZE_NAMES = {
-    0: "Small",
-    1: "Medium",
-    2: "Large"
-}
+# Distritos disponíveis
+DISTRICTS = ['shirogane', 'lavender beds', 'mist', 'goblet', 'empyreum']
 
 # Mapeamento de fases da loteria
 LOTTO_PHASES = {
@@ -270,275 +314,343 @@ SIZE_EMOJIS = {
 
 @bot.event
 async def on_ready():
-    print(f'Bot está online como {bot.user}')
+    log.info("bot online como %s", bot.user)
     try:
         synced = await bot.tree.sync()
-        print(f'Sincronizado {len(synced)} comando(s)')
+        log.info("%d comando(s) sincronizado(s)", len(synced))
         
         # Inicia a task de atualização se não estiver rodando
         if not update_housing_channels.is_running():
             update_housing_channels.start()
-            print("Task de atualização de canais iniciada!")
+            log.info("task de atualização de canais iniciada")
+        world_poller.start()
+        if not flush_notifications.is_running():
+            flush_notifications.start()
         
-    except Exception as e:
-        print(f'Erro ao sincronizar comandos: {e}')
+    except Exception:
+        log.exception("erro ao sincronizar comandos")
+
+# Converte a resposta de /worlds/{id} no snapshot com todas as casas abertas do mundo
+def parse_world_data(data):
+    with PARSE_SECONDS.time():
+        return WorldSnapshot.from_paissa(data)
+
+# Baixa e processa um mundo (usado pelo cache de snapshots). Se já há um
+# snapshot e o PaissaDB responde que nada mudou, devolve a mesma lista sem
+# decodificar nem converter nada (e o detector pula a comparação)
+async def fetch_world_snapshot(world_id):
+    previous = world_cache.peek(world_id)
+    data = await paissa_client.get_world(world_id, if_changed=previous is not None)
+    if data is None:
+        return previous
+    return parse_world_data(data)
+
+# Cache compartilhado de snapshots: cada mundo é baixado uma vez a cada 5 minutos
+world_cache = WorldSnapshotCache(fetch_world_snapshot, ttl=300)
+
+# Aplica os filtros opcionais com os índices do snapshot do mundo. Retorna
+# grupos (distrito, casas), com as casas já ordenadas por tamanho e preço
+def filter_houses(snapshot, size=None, district=None, lottery=False):
+    size_code = SIZE_CODES.get(size.lower()) if size else None
+    if size and size_code is None:
+        return []
+    district_ids = match_districts(district) if district else None
+    return snapshot.by_district(district_ids, size_code, lottery)
 
-def get_house_data(data_center, world, size=None, district=None):
-    base_url = "https://paissadb.zhu.codes"
+# Retorna todas as casas de um mundo a partir do cache (levanta exceção em caso de erro)
+async def get_world_houses(world):
     world_id = WORLD_IDS.get(world.lower())
     if not world_id:
         raise ValueError(f"ID do mundo {world} não encontrado")
-    
-    url = f"{base_url}/worlds/{world_id}"
-    print(f"Buscando URL: {url}")
+    # Com o websocket conectado, o snapshot em memória já está em dia
+    if paissa_stream is not None and paissa_stream.connected:
+        houses = world_cache.peek(world_id, include_invalidated=False)
+        if houses is not None:
+            return houses
+    return await world_cache.get(world_id)
+
+async def get_house_data(data_center, world, size=None, district=None, lottery=False):
+    if not WORLD_IDS.get(world.lower()):
+        raise ValueError(f"ID do mundo {world} não encontrado")
     
     try:
-        response = requests.get(url)
-        print(f"Status code: {response.status_code}")
-        
-        response.raise_for_status()
-        data = response.json()
-        
-        # Processa os dados da API
-        houses = []
-        
-        # Itera sobre os distritos
-        for district_data in data.get('districts', []):
-            district_name = DISTRICT_IDS.get(district_data.get('id'), "Unknown")
-            
-            # Itera sobre os plots abertos no distrito
-            for plot in district_data.get('open_plots', []):
-                house_data = {
-                    'district': district_name,
-                    'ward': plot.get('ward_number', 0) + 1,  # Adiciona 1 ao ward
-                    'plot': plot.get('plot_number', 0) + 1,  # Adiciona 1 ao plot
-                    'size': SIZE_NAMES.get(plot.get('size', 0), 'Unknown'),
-                    'price': plot.get('price', 0),
-                    'lotto_entries': plot.get('lotto_entries', None),
-                    'purchase_system': plot.get('purchase_system', 0),
-                    'lotto_phase': plot.get('lotto_phase', None),
-                    'lotto_phase_until': plot.get('lotto_phase_until', None),
-                }
-                
-                # Aplica os filtros opcionais
-                if size:
-                    size_map = {"small": "Small", "medium": "Medium", "large": "Large"}
-                    if house_data['size'] != size_map.get(size.lower()):
-                        continue
-                
-                if district and district.lower() not in district_name.lower():
-                    continue
-                
-                houses.append(house_data)
-        
-        return houses
-    except requests.exceptions.RequestException as e:
-        print(f"Erro na requisição: {e}")
+        houses = await get_world_houses(world)
+    except PaissaError as e:
+        log.warning("erro na requisição mundo=%s: %s", world, e)
         return []
-    except Exception as e:
-        print(f"Erro ao processar dados: {e}")
-        import traceback
-        print(traceback.format_exc())
+    except Exception:
+        log.exception("erro ao processar dados mundo=%s", world)
         return []
+    
+    return filter_houses(houses, size, district, lottery)
+
+# Busca todos os mundos de um data center ao mesmo tempo (pelo cache, limitado
+# pelas conexões do cliente do PaissaDB) e junta as casas em loteria que
+# chegaram dentro do orçamento de tempo
+async def get_data_center_houses(data_center, size=None, district=None, budget=DC_QUERY_BUDGET):
+    calls = {world: get_world_houses(world) for world in DATA_CENTERS[data_center]}
+    snapshots, late, failed = await gather_within(calls, budget)
+    entries = [
+        (world, house)
+        for world, snapshot in snapshots.items()
+        for _, district_houses in filter_houses(snapshot, size, district, lottery=True)
+        for house in district_houses
+    ]
+    return entries, late, failed
+
+# Apaga as mensagens temporárias vencidas (ex.: respostas do /housing_check),
+# agrupadas por canal em lotes de até 100 com delete_messages. Sem permissão
+# de gerenciar mensagens o lote falha e cada uma é apagada individualmente
+# (o bot sempre pode apagar as próprias mensagens).
+async def delete_expired_messages(entries):
+    by_channel = {}
+    for channel_id, message_id in entries:
+        by_channel.setdefault(channel_id, []).append(message_id)
+
+    for channel_id, message_ids in by_channel.items():
+        # Canal fora do cache (ex.: servidor ainda indisponível): apaga pelo id,
+        # uma a uma, sem depender do cache
+        channel = bot.get_channel(channel_id) or bot.get_partial_messageable(channel_id)
+        await message_deleter.delete(channel, message_ids)
+
+# Uma única task apaga todas as mensagens temporárias no prazo; as pendências
+# ficam no SQLite para não deixar mensagens órfãs depois de reiniciar. Ela só
+# começa com o bot pronto: no setup_hook os canais ainda não estão em cache.
+message_expiry = ExpiryScheduler(delete_expired_messages, store=state_store, wait_ready=lambda: bot.wait_until_ready())
+message_expiry.restore(state_store.load_pending_deletions())
+
+# Envia uma mensagem de resposta que some depois de `ttl` segundos
+async def send_temporary(interaction, content, ttl=15):
+    message = await interaction.followup.send(content, wait=True)
+    message_expiry.schedule(message.channel.id, message.id, time.time() + ttl)
+
+# Resposta paginada do /housing_check: uma única mensagem com botões para
+# trocar de página, filtrar por tamanho e mudar a ordenação. O prazo aparece
+# como timestamp relativo do Discord e a mensagem é apagada pelo message_expiry.
+class HousingCheckView(discord.ui.View):
+    SIZE_FILTERS = [None] + list(SIZE_NAMES)
+
+    def __init__(self, owner_id, title, entries, show_world, size_code=None, order=None, notes=()):
+        super().__init__(timeout=HOUSING_CHECK_TTL)
+        self.owner_id = owner_id
+        self.title = title
+        self.entries = entries
+        self.show_world = show_world
+        self.notes = list(notes)
+        self.size_index = self.SIZE_FILTERS.index(size_code)
+        # Sem mundo não há ordem por distrito: a lista já vem ranqueada
+        self.orders = list(RANKINGS) if show_world else [None] + list(RANKINGS)
+        self.order_index = self.orders.index(order)
+        self.page = 0
+        self.expires_at = discord.utils.utcnow() + timedelta(seconds=HOUSING_CHECK_TTL)
+
+    def filtered(self):
+        entries = self.entries
+        size_code = self.SIZE_FILTERS[self.size_index]
+        if size_code is not None:
+            entries = [entry for entry in entries if entry[1].size_code == size_code]
+        order = self.orders[self.order_index]
+        if order:
+            entries = rank_plots(entries, order)
+        return entries
+
+    def render(self):
+        entries = self.filtered()
+        pages = max(1, -(-len(entries) // HOUSING_CHECK_PAGE_SIZE))
+        self.page = min(self.page, pages - 1)
+        start = self.page * HOUSING_CHECK_PAGE_SIZE
+
+        size_code = self.SIZE_FILTERS[self.size_index]
+        size_label = SIZE_NAMES[size_code] if size_code is not None else "Todos"
+        order_label = self.orders[self.order_index] or "distrito"
+        stats_text = " • ".join(
+            f"{SIZE_EMOJIS[size]} {count}" for size, count in size_counts(house for _, house in entries).items() if count > 0
+        )
+
+        embed = discord.Embed(
+            title=self.title,
+            description=(
+                f"Tamanho: **{size_label}** • Ordem: **{order_label}**\n"
+                f"📊 {stats_text or 'Nenhuma casa'}\n"
+                f"⏳ Expira {discord.utils.format_dt(self.expires_at, 'R')}"
+            ),
+            color=discord.Color.gold(),
+            timestamp=discord.utils.utcnow()
+        )
+        for world, house in entries[start:start + HOUSING_CHECK_PAGE_SIZE]:
+            name, value = house_field(house)
+            name = f"{DISTRICT_EMOJIS.get(house['district'], '🏘️')} {house['district']} • {name}"
+            if self.show_world:
+                name = f"{world.capitalize()} • {name}"
+            embed.add_field(name=name, value=value, inline=False)
+
+        for note_name, note_value in self.notes:
+            embed.add_field(name=note_name, value=note_value, inline=False)
+        embed.set_footer(text=f"Página {self.page + 1}/{pages} • {len(entries)} casas")
+
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = self.page >= pages - 1
+        self.size_filter.label = f"Tamanho: {size_label}"
+        self.order_button.label = f"Ordem: {order_label}"
+        return embed
+
+    async def interaction_check(self, interaction):
+        if interaction.user.id != self.owner_id:
+            await interaction.response.send_message("Só quem usou o comando pode navegar nesta lista.", ephemeral=True)
+            return False
+        return True
+
+    async def refresh(self, interaction):
+        await interaction.response.edit_message(embed=self.render(), view=self)
+
+    @discord.ui.button(label="◀️", style=discord.ButtonStyle.secondary, row=0)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page -= 1
+        await self.refresh(interaction)
+
+    @discord.ui.button(label="▶️", style=discord.ButtonStyle.secondary, row=0)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page += 1
+        await self.refresh(interaction)
+
+    @discord.ui.button(label="Tamanho", style=discord.ButtonStyle.primary, row=1)
+    async def size_filter(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.size_index = (self.size_index + 1) % len(self.SIZE_FILTERS)
+        self.page = 0
+        await self.refresh(interaction)
+
+    @discord.ui.button(label="Ordem", style=discord.ButtonStyle.primary, row=1)
+    async def order_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.order_index = (self.order_index + 1) % len(self.orders)
+        self.page = 0
+        await self.refresh(interaction)
+
+# Envia a resposta paginada e agenda a remoção da mensagem
+async def send_housing_check(interaction, view):
+    message = await interaction.followup.send(embed=view.render(), view=view, wait=True)
+    message_expiry.schedule(message.channel.id, message.id, view.expires_at.timestamp())
 
 @bot.tree.command(name="housing_check", description="Busca casas disponíveis com filtros específicos")
 async def casas_para_comprar(
     interaction: discord.Interaction,
     data_center: str,
-    world: str,
+    world: str = None,
     tamanho: str = None,
-    distrito: str = None
+    distrito: str = None,
+    ordenar: str = None
 ):
     await interaction.response.defer()
     
     # Validação dos parâmetros
     data_center = data_center.lower()
-    world = world.lower()
+    world = world.lower() if world else None
+    # Aceita "preço"/"inscrições" com ou sem acento
+    ordenar = unicodedata.normalize('NFKD', ordenar.lower()).encode('ascii', 'ignore').decode() if ordenar else None
     
     if data_center not in DATA_CENTERS:
-        await interaction.followup.send(f"Data center inválido. Data centers disponíveis: {', '.join(DATA_CENTERS.keys())}")
-        asyncio.sleep(15)
-        await interaction.delete_original_response()
+        await send_temporary(interaction, f"Data center inválido. Data centers disponíveis: {', '.join(DATA_CENTERS.keys())}")
         return
     
-    if world not in DATA_CENTERS[data_center]:
-        await interaction.followup.send(f"Mundo inválido para o data center {data_center}. Mundos disponíveis: {', '.join(DATA_CENTERS[data_center])}")
-        asyncio.sleep(15)
-        await interaction.delete_original_response()    
+    if world and world not in DATA_CENTERS[data_center]:
+        await send_temporary(interaction, f"Mundo inválido para o data center {data_center}. Mundos disponíveis: {', '.join(DATA_CENTERS[data_center])}")
         return
     
     if tamanho and tamanho.lower() not in HOUSE_SIZES:
-        await interaction.followup.send(f"Tamanho inválido. Tamanhos disponíveis: {', '.join(HOUSE_SIZES)}")
-        asyncio.sleep(15)  # Espera 5 segundos antes de apagar a mensagem
-        await interaction.delete_original_response()
+        await send_temporary(interaction, f"Tamanho inválido. Tamanhos disponíveis: {', '.join(HOUSE_SIZES)}")
         return
     
     if distrito and distrito.lower() not in DISTRICTS:
-        await interaction.followup.send(f"Distrito inválido. Distritos disponíveis: {', '.join(DISTRICTS)}")
-        asyncio.sleep(15)
-        await interaction.delete_original_response()
+        await send_temporary(interaction, f"Distrito inválido. Distritos disponíveis: {', '.join(DISTRICTS)}")
         return
     
-    # Busca os dados das casas
-    houses = get_house_data(data_center, world, tamanho, distrito)
-    
-    if not houses:
-        await interaction.followup.send("Nenhuma casa encontrada com os filtros especificados.")
+    if ordenar and ordenar not in RANKINGS:
+        await send_temporary(interaction, f"Ordenação inválida. Opções disponíveis: {', '.join(RANKINGS)}")
         return
     
-    # Organiza as casas por distrito
-    houses_by_district = {}
-    for house in houses:
-        # Mostra apenas casas em loteria (purchase_system = 7)
-        if house['purchase_system'] != 7:
-            continue
-            
-        district = house['district']
-        if district not in houses_by_district:
-            houses_by_district[district] = []
-        houses_by_district[district].append(house)
-
-    # Cria embeds por distrito
-    embeds = []
-    for district, district_houses in houses_by_district.items():
-        embed = discord.Embed(
-            title=f"{DISTRICT_EMOJIS.get(district, '🏘️')} {district}",
-            description=f"Mundo: **{world.capitalize()}** ({data_center.capitalize()})",
-            color=DISTRICT_COLORS.get(district, discord.Color.blue()),
-            timestamp=discord.utils.utcnow()
-        )
-        
-        # Ordena as casas por tamanho e depois por preço
-        district_houses.sort(key=lambda x: (["Small", "Medium", "Large"].index(x['size']), x['price']))
-        
-        for house in district_houses:
-            # Formata o sistema de compra (sempre será loteria)
-            entries = house['lotto_entries'] if house['lotto_entries'] is not None else "?"
-            purchase_info = f"🎫 Loteria (Inscrições: {entries})"
-            
-            # Adiciona a fase da loteria
-            lotto_phase = LOTTO_PHASES.get(house['lotto_phase'], "❓ Unknown")
-            purchase_info = f"🎫 Loteria (Inscrições: {entries})\n📌 Status: {lotto_phase}"
-            
-            # Adiciona até quando vai a fase da loteria, se disponível
-            if house.get('lotto_phase_until'):
-                try:
-                    from datetime import timezone, timedelta
-                    until_dt = datetime.utcfromtimestamp(house['lotto_phase_until']) - timedelta(hours=3)
-                    until_str = until_dt.strftime('%d/%m/%Y %H:%M')
-                    purchase_info += f"\n⏰ Até: {until_str} (Brasília)"
-                except Exception:
-                    pass
-            
-            # Formata o preço em milhões se for maior que 1M
-            price = house['price']
-            if price >= 1000000:
-                price_text = f"{price/1000000:.1f}M gil"
-            else:
-                price_text = f"{price:,} gil"
-            
-            size_emoji = SIZE_EMOJIS.get(house['size'], "🏠")
-            
-            value_text = (
-                f"{size_emoji} **{house['size']}**\n"
-                f"💰 {price_text}\n"
-                f"📍 {purchase_info}"
-            )
-            
-            embed.add_field(
-                name=f"Ward {house['ward']} • Plot {house['plot']}",
-                value=value_text,
-                inline=False
-            )
-        
-        total_houses = len(district_houses)
-        embed.set_footer(text=f"Total de casas disponíveis: {total_houses}")
-        
-        if total_houses > 0:
-            # Adiciona um campo com estatísticas
-            stats = {
-                "Small": len([h for h in district_houses if h['size'] == "Small"]),
-                "Medium": len([h for h in district_houses if h['size'] == "Medium"]),
-                "Large": len([h for h in district_houses if h['size'] == "Large"])
-            }
-            
-            stats_text = " • ".join([
-                f"{SIZE_EMOJIS[size]} {count}" for size, count in stats.items() if count > 0
-            ])
-            
-            embed.add_field(
-                name="📊 Distribuição",
-                value=stats_text,
-                inline=False
-            )
-        
-        # Adiciona campo para o contador
-        embed.add_field(
-            name="⏳ Tempo Até Apagar a Mensagem",
-            value="5:00",
-            inline=False
+    size_code = SIZE_CODES[tamanho.lower()] if tamanho else None
+
+    # Sem mundo, consulta o data center inteiro (o filtro de tamanho fica nos botões)
+    if world is None:
+        entries, late, failed = await get_data_center_houses(data_center, None, distrito)
+        notes = []
+        if late:
+            notes.append(("⚠️ Resultados Parciais", f"Sem resposta em {DC_QUERY_BUDGET}s: "
+                          f"{', '.join(w.capitalize() for w in sorted(late))}. Tente de novo em instantes."))
+        if failed:
+            notes.append(("⚠️ Resultados Parciais", f"Erro ao buscar: {', '.join(w.capitalize() for w in sorted(failed))}"))
+        if not entries and not notes:
+            await interaction.followup.send("Nenhuma casa encontrada com os filtros especificados.")
+            return
+        view = HousingCheckView(
+            interaction.user.id, f"🔎 {data_center.capitalize()} — Casas em Loteria", entries,
+            show_world=True, size_code=size_code, order=ordenar or 'tamanho', notes=notes
         )
-        
-        embeds.append(embed)
-    
-    # Envia as embeds e inicia o contador
-    sent_messages = []
-    for embed in embeds:
-        message = await interaction.followup.send(embed=embed)
-        sent_messages.append(message)
+        await send_housing_check(interaction, view)
+        return
     
-    # Função para atualizar o contador
-    end_time = datetime.utcnow() + timedelta(minutes=1)
+    # Busca as casas em loteria, já agrupadas por distrito e ordenadas
+    houses_by_district = await get_house_data(data_center, world, None, distrito, lottery=True)
+    entries = [(world, house) for _, district_houses in houses_by_district for house in district_houses]
     
-    while datetime.utcnow() < end_time:
-        time_left = end_time - datetime.utcnow()
-        minutes = int(time_left.total_seconds() // 60)
-        seconds = int(time_left.total_seconds() % 60)
-        
-        for message, embed in zip(sent_messages, embeds):
-            # Atualiza o campo do contador em cada embed
-            embed.set_field_at(
-                -1,  # Último campo (contador)
-                name="⏳ Tempo Restante",
-                value=f"{minutes:02d}:{seconds:02d}",
-                inline=False
-            )
-            try:
-                await message.edit(embed=embed)
-            except discord.NotFound:
-                continue  # Ignora se a mensagem já foi deletada
-        
-        await asyncio.sleep(10)  # Atualiza a cada 10 segundos
+    if not entries:
+        await interaction.followup.send("Nenhuma casa encontrada com os filtros especificados.")
+        return
     
-    # Remove as mensagens após o tempo
-    for message in sent_messages:
-        try:
-            await message.delete()
-        except discord.NotFound:
-            continue  # Ignora se a mensagem já foi deletada
+    view = HousingCheckView(
+        interaction.user.id, f"🏰 {world.capitalize()} ({data_center.capitalize()})", entries,
+        show_world=False, size_code=size_code, order=ordenar
+    )
+    await send_housing_check(interaction, view)
 
 @bot.tree.command(name="set_housing_channel", description="Configura um canal para monitorar casas disponíveis")
+@app_commands.describe(
+    world="Um único mundo",
+    data_center="Todos os mundos de um data center em um único feed",
+    worlds="Vários mundos separados por vírgula (ex.: behemoth, excalibur)",
+    district="Só um distrito",
+    size="Só um tamanho (small, medium, large)",
+    max_price="Preço máximo em gil",
+    max_entries="Número máximo de inscrições na loteria"
+)
 async def set_housing_channel(
     interaction: discord.Interaction,
     channel: discord.TextChannel,
-    world: str,
-    district: str = None
+    world: str = None,
+    district: str = None,
+    data_center: str = None,
+    worlds: str = None,
+    size: str = None,
+    max_price: int = None,
+    max_entries: int = None
 ):
     # Verifica se o usuário tem permissão para gerenciar canais
     if not interaction.user.guild_permissions.manage_channels:
         await interaction.response.send_message("Você precisa ter permissão para gerenciar canais para usar este comando.", ephemeral=True)
         return
 
-    # Validação do mundo
-    world = world.lower()
-    world_found = False
-    for dc in DATA_CENTERS.values():
-        if world in dc:
-            world_found = True
-            break
-    
-    if not world_found:
-        await interaction.response.send_message(f"Mundo inválido. Por favor, escolha um mundo válido.", ephemeral=True)
+    # Junta os mundos do data center, do mundo único e da lista, sem repetir
+    selected = []
+    if data_center:
+        data_center = data_center.lower()
+        if data_center not in DATA_CENTERS:
+            await interaction.response.send_message(f"Data center inválido. Data centers disponíveis: {', '.join(DATA_CENTERS.keys())}", ephemeral=True)
+            return
+        selected.extend(DATA_CENTERS[data_center])
+    if world:
+        selected.append(world.lower())
+    if worlds:
+        selected.extend(worlds.lower().replace(',', ' ').split())
+    selected = list(dict.fromkeys(selected))
+
+    if not selected:
+        await interaction.response.send_message("Informe `world`, `worlds` ou `data_center`.", ephemeral=True)
+        return
+
+    # Validação dos mundos
+    known_worlds = {name for dc in DATA_CENTERS.values() for name in dc}
+    invalid = [name for name in selected if name not in known_worlds]
+    if invalid:
+        await interaction.response.send_message(f"Mundo inválido: {', '.join(invalid)}. Por favor, escolha um mundo válido.", ephemeral=True)
         return
 
     # Validação do distrito (se fornecido)
@@ -546,6 +658,14 @@ async def set_housing_channel(
         await interaction.response.send_message(f"Distrito inválido. Distritos disponíveis: {', '.join(DISTRICTS)}", ephemeral=True)
         return
 
+    if size and size.lower() not in HOUSE_SIZES:
+        await interaction.response.send_message(f"Tamanho inválido. Tamanhos disponíveis: {', '.join(HOUSE_SIZES)}", ephemeral=True)
+        return
+
+    if (max_price is not None and max_price < 0) or (max_entries is not None and max_entries < 0):
+        await interaction.response.send_message("Preço e inscrições máximos não podem ser negativos.", ephemeral=True)
+        return
+
     # Salva a configuração
     guild_id = str(interaction.guild_id)
     channel_id = str(channel.id)
@@ -557,119 +677,178 @@ async def set_housing_channel(
             "channels": {}
         }
     
-    # Adiciona ou atualiza a configuração do canal
-    housing_channels[guild_id]["channels"][channel_id] = {
+    # Adiciona ou atualiza a configuração do canal. As mensagens da configuração
+    # anterior ficam registradas para serem apagadas no próximo ciclo.
+    previous = housing_channels[guild_id]["channels"].get(channel_id, {})
+    previous_messages = list(previous.get('messages', []))
+    if previous.get('message_map') is not None:
+        previous_messages = [entry['id'] for entry in previous['message_map'].values()]
+    channel_config = {
         "channel_name": channel.name,
-        "world": world,
+        "world": selected[0] if len(selected) == 1 else None,
         "district": district.lower() if district else None,
-        "messages": []
+        "messages": previous_messages
     }
-    save_housing_channels()
-
-    await interaction.response.send_message(f"Canal {channel.mention} configurado para monitorar casas em {world.capitalize()}" + 
-                                          (f" no distrito {district.capitalize()}" if district else ""), ephemeral=True)
-
-class NotificationButton(discord.ui.View):
-    def __init__(self, house_data, world, timeout=1800):  # 30 minutos de timeout
-        super().__init__(timeout=timeout)
-        self.house_data = house_data
-        self.world = world
-
-    @discord.ui.button(label="🔔 Ativar Notificações", style=discord.ButtonStyle.primary)
-    async def notify_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        user_id = str(interaction.user.id)
-        
-        # Cria uma chave única para a casa
-        house_key = f"{self.world}_{self.house_data['district']}_{self.house_data['ward']}_{self.house_data['plot']}"
-        
-        # Inicializa o dicionário do usuário se não existir
-        if user_id not in user_notifications:
-            user_notifications[user_id] = {
-                "notifications": [],
-                "username": str(interaction.user)
-            }
-        
-        # Verifica se o usuário já está notificando esta casa
-        if house_key in user_notifications[user_id]["notifications"]:
-            try:
-                embed = discord.Embed(
-                    title="⚠️ Notificação Já Ativa",
-                    description="Você já está recebendo notificações para esta casa!",
-                    color=discord.Color.yellow()
-                )
-                await interaction.user.send(embed=embed)
-            except discord.Forbidden:
-                await interaction.response.send_message("Não foi possível enviar a mensagem de confirmação. Verifique se você tem DMs abertas!", ephemeral=True)
-            return
-        
+    if len(selected) > 1:
+        channel_config["worlds"] = selected
+        channel_config["data_center"] = data_center
+    if size:
+        channel_config["size"] = size.lower()
+    if max_price is not None:
+        channel_config["max_price"] = max_price
+    if max_entries is not None:
+        channel_config["max_entries"] = max_entries
+    housing_channels[guild_id]["channels"][channel_id] = channel_config
+    save_housing_channel(guild_id, channel_id)
+
+    if data_center and len(selected) == len(DATA_CENTERS[data_center]):
+        target = f"todo o data center {data_center.capitalize()}"
+    else:
+        target = ", ".join(name.capitalize() for name in selected)
+    filters = channel_feeds.compile(channel_config).describe()
+    await interaction.response.send_message(f"Canal {channel.mention} configurado para monitorar casas em {target}" +
+                                          (f" no distrito {district.capitalize()}" if district else "") +
+                                          (f" ({filters})" if filters else ""), ephemeral=True)
+
+# Ativa as notificações de um usuário para uma ou mais casas, a partir das chaves
+# (mundo_distrito_ward_plot). O status atual vem do último snapshot do mundo.
+async def activate_notifications(interaction, house_keys):
+    user_id = str(interaction.user.id)
+    
+    # Inicializa o dicionário do usuário se não existir
+    if user_id not in user_notifications:
+        user_notifications[user_id] = {
+            "notifications": [],
+            "username": str(interaction.user)
+        }
+    
+    # Separa as casas que o usuário já está notificando
+    new_houses = []
+    for house_key in house_keys:
+        if house_key not in user_notifications[user_id]["notifications"]:
+            world = house_key.split('_', 1)[0]
+            new_houses.append((house_key, change_detector.get_house(world, house_key)))
+    
+    if not new_houses:
+        await interaction.response.send_message("⚠️ Você já está recebendo notificações para esta casa!", ephemeral=True)
+        return
+    
+    for house_key, house in new_houses:
         # Adiciona a notificação
         user_notifications[user_id]["notifications"].append(house_key)
-        save_user_notifications()
+        subscription_index.add(user_id, house_key)
+        state_store.add_subscription(user_id, user_notifications[user_id]["username"], house_key)
         
         # Salva o status atual como último status conhecido
-        last_known_status[house_key] = {
-            "lotto_phase": self.house_data['lotto_phase'],
-            "lotto_entries": self.house_data['lotto_entries'],
-            "lotto_phase_until": self.house_data.get('lotto_phase_until')
-        }
-        save_last_known_status()
+        if house is not None:
+            last_known_status[house_key] = {
+                "lotto_phase": house['lotto_phase'],
+                "lotto_entries": house['lotto_entries'],
+                "lotto_phase_until": house.get('lotto_phase_until')
+            }
+            save_last_known_status(house_key)
+    
+    # Envia confirmação via DM
+    try:
+        embed = discord.Embed(
+            title="🔔 Notificação Ativada",
+            description="Você receberá notificações sobre mudanças no status destas casas.",
+            color=discord.Color.green(),
+            timestamp=discord.utils.utcnow()
+        )
         
-        # Envia confirmação via DM
-        try:
-            embed = discord.Embed(
-                title="🔔 Notificação Ativada",
-                description="Você receberá notificações sobre mudanças no status desta casa.",
-                color=discord.Color.green(),
-                timestamp=discord.utils.utcnow()
-            )
-            
-            # Adiciona informações da casa
-            embed.add_field(
-                name="🏰 Localização",
-                value=f"{self.house_data['district']} - Ward {self.house_data['ward']} Plot {self.house_data['plot']}",
-                inline=False
-            )
-            
-            embed.add_field(
-                name="🌍 Mundo",
-                value=self.world.capitalize(),
-                inline=False
-            )
-            
-            # Adiciona informações do status atual
-            lotto_phase = LOTTO_PHASES.get(self.house_data['lotto_phase'], "❓ Unknown")
-            entries = self.house_data['lotto_entries'] if self.house_data['lotto_entries'] is not None else "?"
-            
+        # Adiciona informações de cada casa com o status atual. Um campo fica
+        # para a dica e, se as casas não couberem, outro para avisar quantas faltam
+        shown = new_houses if len(new_houses) < EMBED_MAX_FIELDS else new_houses[:EMBED_MAX_FIELDS - 2]
+        for house_key, house in shown:
+            world, district, ward, plot = house_key.split('_')
+            if house is not None:
+                lotto_phase = LOTTO_PHASES.get(house['lotto_phase'], "❓ Unknown")
+                entries = house['lotto_entries'] if house['lotto_entries'] is not None else "?"
+            else:
+                lotto_phase, entries = "❓ Unknown", "?"
             embed.add_field(
-                name="📊 Status Atual",
+                name=f"🏰 {district} - Ward {ward} Plot {plot} ({world.capitalize()})",
                 value=f"Status: {lotto_phase}\nInscrições: {entries}",
                 inline=False
             )
-            
-            # Adiciona dica sobre gerenciamento
+        if len(shown) < len(new_houses):
             embed.add_field(
-                name="💡 Dica",
-                value="Use o comando `/my_notifications` para gerenciar suas notificações.",
+                name="➕ Outras casas",
+                value=f"Mais {len(new_houses) - len(shown)} casas foram ativadas. Use `/my_notifications` para ver todas.",
                 inline=False
             )
-            
-            await interaction.user.send(embed=embed)
-            await interaction.response.send_message("✅ Notificação ativada! Verifique suas mensagens diretas.", ephemeral=True)
-        except discord.Forbidden:
-            await interaction.response.send_message("Não foi possível enviar a mensagem de confirmação. Verifique se você tem DMs abertas!", ephemeral=True)
+        
+        # Adiciona dica sobre gerenciamento
+        embed.add_field(
+            name="💡 Dica",
+            value="Use o comando `/my_notifications` para gerenciar suas notificações.",
+            inline=False
+        )
+        
+        await interaction.user.send(embed=embed)
+        await interaction.response.send_message("✅ Notificação ativada! Verifique suas mensagens diretas.", ephemeral=True)
+    except discord.Forbidden:
+        await interaction.response.send_message("Não foi possível enviar a mensagem de confirmação. Verifique se você tem DMs abertas!", ephemeral=True)
+
+# Menu de seleção com as casas de uma página do canal. O custom_id é fixo por
+# posição e cada opção carrega a chave da casa, então nenhum estado por mensagem
+# precisa ficar em memória: uma única view registrada atende todas as mensagens.
+class PlotSelect(discord.ui.Select):
+    def __init__(self, index, entries=(), show_world=False):
+        options = [
+            discord.SelectOption(
+                label=(f"{world.capitalize()} • " if show_world else "") +
+                      f"{house['district']} • Ward {house['ward']} • Plot {house['plot']}",
+                description=f"{house['size']} • {format_price(house['price'])}",
+                emoji=SIZE_EMOJIS.get(house['size'], "🏠"),
+                value=f"{world}_{house['district']}_{house['ward']}_{house['plot']}"
+            )
+            for world, house in entries
+        ]
+        super().__init__(
+            custom_id=f"housing:subscribe:{index}",
+            placeholder="🔔 Ativar notificações para...",
+            min_values=1,
+            max_values=max(1, len(options)),
+            options=options
+        )
 
-# Modifique a função que cria os embeds para incluir os botões
-def create_house_embed(house, world):
-    embed = discord.Embed(
-        title=f"{DISTRICT_EMOJIS.get(house['district'], '🏘️')} {house['district']}",
-        description=f"Mundo: **{world.capitalize()}**",
-        color=DISTRICT_COLORS.get(house['district'], discord.Color.blue()),
-        timestamp=discord.utils.utcnow()
-    )
+    async def callback(self, interaction: discord.Interaction):
+        # Lê as opções direto da interação: a mesma instância atende todas as mensagens
+        await activate_notifications(interaction, interaction.data.get('values', []))
+
+# View persistente de inscrição. Sem casas, é a instância registrada uma vez com
+# bot.add_view; com casas (pares (mundo, casa)), só serve para desenhar os menus
+# de uma página. Páginas com mais de um mundo mostram o mundo em cada opção.
+class PlotSubscriptionView(discord.ui.View):
+    def __init__(self, entries=None):
+        super().__init__(timeout=None)
+        if entries is None:
+            for index in range(MESSAGE_MAX_SELECTS):
+                self.add_item(PlotSelect(index))
+        else:
+            show_world = len({world for world, _ in entries}) > 1
+            for index, chunk in enumerate(chunked(entries, SELECT_MAX_OPTIONS)[:MESSAGE_MAX_SELECTS]):
+                self.add_item(PlotSelect(index, chunk, show_world))
+
+# Cria os menus de uma página sem guardar a view: parada antes do envio, ela não
+# é registrada para a mensagem e as interações caem na view persistente
+def render_plot_view(entries):
+    view = PlotSubscriptionView(entries)
+    view.stop()
+    return view
+
+# Formata o preço em milhões se for maior que 1M
+def format_price(price):
+    if price >= 1000000:
+        return f"{price/1000000:.1f}M gil"
+    return f"{price:,} gil"
 
+# Cria o campo (nome, valor) de uma casa para os embeds do canal
+def house_field(house):
     # Formata o sistema de compra (sempre será loteria)
     entries = house['lotto_entries'] if house['lotto_entries'] is not None else "?"
-    purchase_info = f"🎫 Loteria (Inscrições: {entries})"
     
     # Adiciona a fase da loteria
     lotto_phase = LOTTO_PHASES.get(house['lotto_phase'], "❓ Unknown")
@@ -678,224 +857,504 @@ def create_house_embed(house, world):
     # Adiciona até quando vai a fase da loteria, se disponível
     if house.get('lotto_phase_until'):
         try:
-            from datetime import timezone, timedelta
             until_dt = datetime.utcfromtimestamp(house['lotto_phase_until']) - timedelta(hours=3)
             until_str = until_dt.strftime('%d/%m/%Y %H:%M')
             purchase_info += f"\n⏰ Até: {until_str} (Brasília)"
         except Exception:
             pass
 
-    # Formata o preço em milhões se for maior que 1M
-    price = house['price']
-    if price >= 1000000:
-        price_text = f"{price/1000000:.1f}M gil"
-    else:
-        price_text = f"{price:,} gil"
-
     size_emoji = SIZE_EMOJIS.get(house['size'], "🏠")
 
     value_text = (
         f"{size_emoji} **{house['size']}**\n"
-        f"💰 {price_text}\n"
+        f"💰 {format_price(house['price'])}\n"
         f"📍 {purchase_info}"
     )
 
-    embed.add_field(
-        name=f"Ward {house['ward']} • Plot {house['plot']}",
-        value=value_text,
-        inline=False
+    return f"Ward {house['ward']} • Plot {house['plot']}", value_text
+
+# Limites do Discord: 5 mensagens a cada 5 segundos por canal e 50 requisições por segundo no total
+channel_rate_limiter = KeyedRateLimiter(rate=5, per=5.0)
+global_rate_limiter = KeyedRateLimiter(rate=50, per=1.0)
+
+async def discord_rate_limit(channel_id):
+    await global_rate_limiter.acquire()
+    await channel_rate_limiter.acquire(channel_id)
+
+# Apaga mensagens antigas pelo id: bulk delete para as recentes, uma a uma só
+# para as com mais de 14 dias
+message_deleter = MessageDeleter(discord_rate_limit)
+
+# Agendador que atualiza os canais em paralelo (8 workers por ciclo de 30 minutos)
+channel_scheduler = ChannelUpdateScheduler(interval=30 * 60, workers=8)
+
+# Campo do resumo por DM com o novo estado de uma casa monitorada
+def digest_field(event):
+    house = event.house
+    name = f"🏰 {house['district']} - Ward {house['ward']} Plot {house['plot']} ({event.world.capitalize()})"
+    if event.kind == PLOT_CLOSED:
+        return name, "🔕 Não aparece mais como disponível"
+
+    lotto_phase = LOTTO_PHASES.get(house['lotto_phase'], "❓ Unknown")
+    entries = house['lotto_entries'] if house['lotto_entries'] is not None else "?"
+    value = f"Status: {lotto_phase}\nInscrições: {entries}"
+
+    # Adiciona até quando vai a fase da loteria, se disponível
+    if house.get('lotto_phase_until'):
+        try:
+            until_dt = datetime.utcfromtimestamp(house['lotto_phase_until']) - timedelta(hours=3)
+            value += f"\n⏰ Próxima Mudança: {until_dt.strftime('%d/%m/%Y %H:%M')} (Brasília)"
+        except Exception:
+            pass
+    return name, value
+
+# Cria o embed único enviado por DM com todas as casas de um usuário que mudaram no ciclo
+def create_digest_embed(events):
+    closed_only = all(event.kind == PLOT_CLOSED for event in events)
+    embed = discord.Embed(
+        title="🔔 Atualização de Status" if len(events) == 1 else f"🔔 {len(events)} Atualizações de Status",
+        description="Casas que você está monitorando mudaram!",
+        color=discord.Color.red() if closed_only else discord.Color.blue(),
+        timestamp=discord.utils.utcnow()
     )
 
+    shown = events if len(events) <= EMBED_MAX_FIELDS else events[:EMBED_MAX_FIELDS - 1]
+    for event in shown:
+        name, value = digest_field(event)
+        embed.add_field(name=name, value=value, inline=False)
+    if len(shown) < len(events):
+        embed.add_field(
+            name="➕ Outras casas",
+            value=f"Mais {len(events) - len(shown)} casas mudaram. Use `/my_notifications` para ver todas.",
+            inline=False
+        )
+
     return embed
 
-# Modifique a função update_housing_channels para usar o novo sistema de embeds e botões
+# Usuários buscados via REST ficam em um LRU; o cache do próprio cliente vem primeiro
+user_cache = LRUCache(maxsize=2048)
+
+async def resolve_user(user_id):
+    user_id = int(user_id)
+    user = bot.get_user(user_id) or user_cache.get(user_id)
+    if user is None:
+        user = await bot.fetch_user(user_id)
+        user_cache.put(user_id, user)
+    return user
+
+# Tenta de novo em 429 (respeitando o Retry-After), erros 5xx e falhas de rede;
+# DMs fechadas (403) e usuários inexistentes (404) não adiantam repetir
+def dm_retry_delay(exc, attempt):
+    if isinstance(exc, discord.HTTPException):
+        if exc.status == 429:
+            try:
+                return float(exc.response.headers.get('Retry-After'))
+            except (AttributeError, TypeError, ValueError):
+                return exponential_backoff(exc, attempt)
+        if exc.status >= 500:
+            return exponential_backoff(exc, attempt)
+        return None
+    return exponential_backoff(exc, attempt)
+
+async def deliver_digest(user_id, events):
+    user = await resolve_user(user_id)
+    DISCORD_REQUESTS.inc(op='dm')
+    await user.send(embed=create_digest_embed(events))
+
+notification_dispatcher = DigestDispatcher(deliver_digest, workers=4, retry_delay=dm_retry_delay)
+
+# Contadores de chamadas ao Discord feitas pela atualização de canais no ciclo atual.
+# "full_refresh" estima quantas chamadas o modo antigo (apagar e reenviar tudo) faria.
+refresh_stats = {'sent': 0, 'edited': 0, 'deleted': 0, 'skipped': 0, 'full_refresh': 0}
+last_refresh_stats = {}
+
+# Impressão digital do conteúdo renderizado de uma mensagem (ignora os timestamps)
+def message_fingerprint(embeds, entries):
+    data = []
+    for embed in embeds:
+        embed_data = embed.to_dict()
+        embed_data.pop('timestamp', None)
+        data.append(embed_data)
+    data.append([f"{h['district']}_{h['ward']}_{h['plot']}" for _, h in entries])
+    return hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+# Sincroniza as mensagens do canal com a lista desejada: edita as que mudaram,
+# envia as novas, apaga as que sumiram e não toca nas que continuam iguais.
+# Uma página que falha fica com a entrada antiga (ou de fora, se nunca foi
+# enviada) para ser refeita no próximo ciclo. Devolve quantas páginas falharam.
+async def reconcile_channel_messages(channel, channel_config, desired):
+    message_map = channel_config.get('message_map')
+    stale = []
+    if message_map is None:
+        # Canal ainda no formato antigo: apaga todas as mensagens registradas
+        stale.extend(channel_config.get('messages', []))
+        message_map = {}
+
+    desired_keys = {key for key, _, _ in desired}
+    stale.extend(entry['id'] for key, entry in message_map.items() if key not in desired_keys)
+    if stale:
+        result = await message_deleter.delete(channel, stale)
+        refresh_stats['deleted'] += result['deleted']
+
+    new_map = {}
+    failed = 0
+    try:
+        for key, embeds, entries in desired:
+            fingerprint = message_fingerprint(embeds, entries)
+            entry = message_map.get(key)
+
+            if entry and entry['hash'] == fingerprint:
+                refresh_stats['skipped'] += 1
+                new_map[key] = entry
+                continue
+
+            view = render_plot_view(entries) if entries else None
+            try:
+                message_id = None
+                if entry:
+                    try:
+                        await discord_rate_limit(channel.id)
+                        DISCORD_REQUESTS.inc(op='edit')
+                        await channel.get_partial_message(entry['id']).edit(embeds=embeds, view=view)
+                        message_id = entry['id']
+                        refresh_stats['edited'] += 1
+                    except discord.NotFound:
+                        pass
+
+                if message_id is None:
+                    await discord_rate_limit(channel.id)
+                    DISCORD_REQUESTS.inc(op='send')
+                    if view is not None:
+                        message = await channel.send(embeds=embeds, view=view)
+                    else:
+                        message = await channel.send(embeds=embeds)
+                    message_id = message.id
+                    refresh_stats['sent'] += 1
+            except discord.HTTPException as e:
+                failed += 1
+                log.warning("erro ao atualizar página %s do canal=%s: %s", key, channel.id, e)
+                continue
+
+            new_map[key] = {'id': message_id, 'hash': fingerprint}
+    finally:
+        # Grava o que já foi feito mesmo se o ciclo for interrompido no meio; as
+        # páginas que ficaram sem resposta mantêm a mensagem antiga
+        for key, entry in message_map.items():
+            if key in desired_keys:
+                new_map.setdefault(key, entry)
+        channel_config['message_map'] = new_map
+        channel_config['messages'] = [entry['id'] for entry in new_map.values()]
+    return failed
+
+# Detector de mudanças: compara o snapshot de cada mundo uma vez por ciclo
+change_detector = ChangeDetector()
+
+# Mundos com alguma mudança no ciclo atual (os canais dos demais não são renderizados)
+dirty_worlds = set()
+
+# Mundos já comparados desde que o bot iniciou. A primeira comparação de um mundo
+# só olha os status salvos e não gera aberturas nem vendas, então o primeiro
+# snapshot sempre marca o mundo (casas que mudaram com o bot fora do ar)
+compared_worlds = set()
+
+# Mundos com algum canal que não pôde ser redesenhado no ciclo atual (snapshot
+# indisponível ou erro); continuam marcados para o próximo ciclo
+unrendered_worlds = set()
+
+async def mark_world_dirty(world, events):
+    if events or world not in compared_worlds:
+        dirty_worlds.add(world)
+    compared_worlds.add(world)
+
+# Registra as mudanças das casas monitoradas para o resumo por DM dos inscritos
+async def notify_subscribers(world, events):
+    changed = {}
+    for event in events:
+        if event.house_key in subscription_index:
+            changed[event.house_key] = event
+
+    for house_key, event in changed.items():
+        house = event.house
+        if event.kind == PLOT_CLOSED:
+            last_known_status.pop(house_key, None)
+        else:
+            # Atualiza o último status conhecido
+            last_known_status[house_key] = {
+                "lotto_phase": house['lotto_phase'],
+                "lotto_entries": house['lotto_entries'],
+                "lotto_phase_until": house.get('lotto_phase_until')
+            }
+        save_last_known_status(house_key)
+
+        # Acumula por usuário; o resumo sai uma vez no fim do ciclo
+        for user_id in subscription_index.subscribers(house_key):
+            notification_dispatcher.add(user_id, house_key, event)
+
+# Histórico colunar das mudanças de cada mundo (vazio em HOUSING_HISTORY_PATH desliga)
+history_store = HistoryStore(HOUSING_HISTORY_PATH) if HOUSING_HISTORY_PATH else None
+
+# Estatísticas de todos os mundos (/housing_stats), recalculadas por mundo a cada mudança
+housing_stats = HousingStats(DATA_CENTERS, history=history_store)
+
+async def update_world_stats(world, events):
+    if events or world not in housing_stats:
+        housing_stats.update_world(world, change_detector.snapshot(world))
+
+change_detector.add_listener(notify_subscribers)
+change_detector.add_listener(mark_world_dirty)
+change_detector.add_listener(update_world_stats)
+if history_store is not None:
+    change_detector.add_listener(history_store.record_events)
+
+# Busca e compara uma vez cada mundo monitorado
+async def detect_world_changes(world):
+    try:
+        houses = await get_world_houses(world)
+    except Exception as e:
+        log.warning("erro ao buscar mundo=%s para detectar mudanças: %s", world, e)
+        return
+    await change_detector.process(world, houses, seed=last_known_status)
+
+# Nome do mundo a partir do id usado pelo PaissaDB
+WORLD_NAMES = {world_id: name for name, world_id in WORLD_IDS.items()}
+
+# Aplica um evento do websocket ao snapshot em memória do mundo e passa o
+# resultado pelo detector, como se fosse um novo snapshot baixado
+async def apply_stream_event(kind, data):
+    world = WORLD_NAMES.get(data.get('world_id'))
+    if world is None:
+        return
+    houses = world_cache.peek(WORLD_IDS[world])
+    if houses is None:
+        # Mundo que ninguém consultou ainda: será baixado inteiro quando precisar
+        return
+
+    district_id = data.get('district_id')
+    ward = data.get('ward_number', 0) + 1
+    plot = data.get('plot_number', 0) + 1
+    updated = []
+    previous = None
+    for house in houses:
+        if (house.district_id, house.ward, house.plot) == (district_id, ward, plot):
+            previous = house
+        else:
+            updated.append(house)
+    if kind == PLOT_OPEN:
+        updated.append(Plot.from_paissa(district_id, data))
+    elif kind != PLOT_SOLD:
+        # plot_update não traz tamanho nem preço: atualiza a casa do snapshot.
+        # Uma casa que não está no snapshot entra quando o mundo for baixado de novo.
+        if previous is None:
+            return
+        updated.append(previous.with_update(data))
+    updated = WorldSnapshot(updated)
+
+    world_cache.put(WORLD_IDS[world], updated)
+    if change_detector.has_snapshot(world):
+        await change_detector.process(world, updated)
+
+# A cada (re)conexão do websocket, baixa de novo os mundos em memória para
+# recuperar o que foi publicado enquanto a conexão estava caída
+async def resync_worlds():
+    for world_id in world_cache.world_ids():
+        world_cache.invalidate(world_id)
+    await asyncio.gather(*(detect_world_changes(world) for world in change_detector.worlds()))
+
+paissa_stream = PaissaStream(PAISSA_WS_URL, apply_stream_event, on_connect=resync_worlds,
+                             recorder=paissa_recorder) if PAISSA_WS_URL else None
+
+# Mundos que alguém acompanha: os dos canais configurados e os das casas com inscritos
+def watched_worlds():
+    worlds = {
+        world
+        for guild_data in housing_channels.values()
+        for channel_config in guild_data["channels"].values()
+        for world in channel_worlds(channel_config)
+    }
+    worlds.update(world_of(house_key) for house_key in subscription_index.house_keys())
+    return worlds
+
+# Busca e compara um mundo e devolve quando buscá-lo de novo, de acordo com as
+# próximas viradas de fase da loteria. Com o websocket conectado, o snapshot em
+# memória já está em dia e não há requisição ao PaissaDB.
+async def poll_world(world):
+    world_id = WORLD_IDS.get(world.lower())
+    if paissa_stream is None or not paissa_stream.connected:
+        world_cache.invalidate(world_id)
+    houses = await get_world_houses(world)
+    await change_detector.process(world, houses, seed=last_known_status)
+    return phase_aware_delay(houses, time.time())
+
+# Os resumos saem uma vez por lote de mundos, e não por mundo: numa virada de
+# fase, quem acompanha casas em vários mundos recebe uma única DM
+world_poller = AdaptivePollScheduler(poll_world, watched_worlds, after_batch=notification_dispatcher.flush)
+
+# Seções (embed do distrito, campos) de um mundo já filtrado. Os itens dos campos
+# são pares (mundo, casa) para os menus de inscrição saberem o mundo de cada casa.
+def render_world_sections(world, houses_by_district):
+    sections = []
+    for district, district_houses in houses_by_district:
+        # Cria o embed do distrito
+        district_embed = discord.Embed(
+            title=f"{DISTRICT_EMOJIS.get(district, '🏘️')} {district}",
+            description=f"Mundo: **{world.capitalize()}**",
+            color=DISTRICT_COLORS.get(district, discord.Color.blue()),
+            timestamp=discord.utils.utcnow()
+        )
+
+        # Adiciona estatísticas do distrito
+        stats = size_counts(district_houses)
+
+        stats_text = " • ".join([
+            f"{SIZE_EMOJIS[size]} {count}" for size, count in stats.items() if count > 0
+        ])
+
+        fields = [("📊 Distribuição", stats_text, None)]
+
+        # Cria um campo para cada casa no distrito
+        for house in district_houses:
+            name, value = house_field(house)
+            fields.append((name, value, (world, house)))
+
+        sections.append((district_embed, fields))
+    return sections
+
+# Seções filtradas de cada (mundo, filtro), reaproveitadas por todos os canais
+# enquanto o snapshot do mundo não muda
+channel_feeds = FeedCache(render_world_sections)
+
+# Cabeçalho do canal: o mundo, o data center ou a lista de mundos e os filtros
+def channel_header(channel_config, worlds, plot_filter):
+    if len(worlds) == 1:
+        title = f"🏰 {worlds[0].capitalize()}"
+        description = f"Casas disponíveis no {worlds[0].capitalize()}:"
+    else:
+        data_center = channel_config.get('data_center')
+        title = f"🏰 {data_center.capitalize()}" if data_center else f"🏰 {len(worlds)} mundos"
+        description = f"Casas disponíveis em {', '.join(world.capitalize() for world in worlds)}:"
+    filters = plot_filter.describe()
+    if filters:
+        description += f"\nFiltros: {filters}"
+    return discord.Embed(
+        title=title,
+        description=description,
+        color=discord.Color.gold(),
+        timestamp=discord.utils.utcnow()
+    )
+
+# Snapshots dos mundos de um canal pelo cache compartilhado. Se algum falhar,
+# devolve None e o canal fica como está até o próximo ciclo (em vez de perder
+# as casas daquele mundo por uma falha passageira)
+async def get_channel_snapshots(worlds):
+    results = await asyncio.gather(*(get_world_houses(world) for world in worlds), return_exceptions=True)
+    for world, result in zip(worlds, results):
+        if isinstance(result, Exception):
+            log.warning("erro ao buscar mundo=%s para o canal: %s", world, result)
+            return None
+    return dict(zip(worlds, results))
+
+# Atualiza um único canal de housing
+async def update_channel(guild_id, channel_id, channel_config):
+    try:
+        guild = bot.get_guild(int(guild_id))
+        if not guild:
+            return
+
+        channel = guild.get_channel(int(channel_id))
+        if not channel:
+            return
+
+        # Nada mudou em nenhum dos mundos do canal desde o último ciclo. Mundos
+        # ainda não comparados depois de reiniciar são sempre redesenhados (as
+        # páginas iguais são puladas pela impressão digital, sem chamar o Discord)
+        worlds = channel_worlds(channel_config)
+        message_map = channel_config.get('message_map')
+        if message_map is not None and dirty_worlds.isdisjoint(worlds) and compared_worlds.issuperset(worlds):
+            refresh_stats['skipped'] += len(message_map)
+            refresh_stats['full_refresh'] += 3 * channel_config.get('legacy_messages', 0)
+            return
+
+        snapshots = await get_channel_snapshots(worlds)
+        if snapshots is None:
+            unrendered_worlds.update(worlds)
+            return
+
+        render_start = time.perf_counter()
+
+        # Um único feed com os mundos na ordem configurada; cada mundo só é
+        # filtrado e montado uma vez por snapshot, para todos os canais
+        plot_filter = channel_feeds.compile(channel_config)
+        world_sections = [
+            section
+            for world in worlds
+            for section in channel_feeds.sections(world, snapshots[world], plot_filter)
+        ]
+        # Sem nenhuma casa no filtro, o canal fica só com o cabeçalho (as páginas
+        # antigas são apagadas pela reconciliação)
+        header = channel_header(channel_config, worlds, plot_filter)
+        if not world_sections:
+            header.description += "\nNenhuma casa disponível no momento."
+
+        # Seções do canal, na ordem: (embed modelo, campos (nome, valor, (mundo, casa)))
+        sections = [(header, [])] + world_sections
+
+        # Empacota tudo em poucas mensagens (até 10 embeds e 6000 caracteres cada)
+        desired = [
+            (f"page:{index}", embeds, page_entries)
+            for index, (embeds, page_entries) in enumerate(pack_sections(sections))
+        ]
+        RENDER_SECONDS.observe(time.perf_counter() - render_start)
+
+        # Custo do layout antigo (cabeçalho, um embed por distrito e uma mensagem por casa),
+        # que apagava e reenviava tudo: buscar + apagar + enviar cada mensagem
+        channel_config['legacy_messages'] = 1 + sum(len(fields) for _, fields in world_sections)
+        refresh_stats['full_refresh'] += 3 * channel_config['legacy_messages']
+
+        # Edita, envia ou apaga apenas as mensagens que mudaram
+        if await reconcile_channel_messages(channel, channel_config, desired):
+            unrendered_worlds.update(worlds)
+
+        # Atualiza o dicionário original com as novas mensagens
+        housing_channels[guild_id]["channels"][channel_id] = channel_config
+        save_housing_channel(guild_id, channel_id)
+
+    except Exception:
+        unrendered_worlds.update(channel_worlds(channel_config))
+        log.exception("erro ao atualizar canal=%s servidor=%s", channel_id, guild_id)
+        raise
+
 @tasks.loop(minutes=30)
 async def update_housing_channels():
     # Proteção para evitar execução duplicada
     if getattr(update_housing_channels, '_running', False):
-        print('Task já está rodando, abortando execução duplicada.')
+        log.warning("task já está rodando, abortando execução duplicada")
         return
     update_housing_channels._running = True
     try:
-        # Cria uma cópia do dicionário para iteração segura
-        guilds_data = dict(housing_channels)
+        # Monta a lista de canais a partir de uma cópia para iteração segura
+        jobs = [
+            (guild_id, channel_id, channel_config)
+            for guild_id, guild_data in list(housing_channels.items())
+            for channel_id, channel_config in list(guild_data["channels"].items())
+        ]
         
-        for guild_id, guild_data in guilds_data.items():
-            # Cria uma cópia do dicionário de canais para iteração segura
-            channels_data = dict(guild_data["channels"])
-            
-            for channel_id, channel_config in channels_data.items():
-                try:
-                    guild = bot.get_guild(int(guild_id))
-                    if not guild:
-                        continue
-
-                    channel = guild.get_channel(int(channel_id))
-                    if not channel:
-                        continue
-
-                    # Busca as casas disponíveis
-                    houses = get_house_data(None, channel_config['world'], None, channel_config['district'])
-                    
-                    if not houses:
-                        continue
-
-                    # Deleta as mensagens antigas
-                    for message_id in channel_config['messages']:
-                        try:
-                            message = await channel.fetch_message(message_id)
-                            await message.delete()
-                        except:
-                            pass
-
-                    # Limpa a lista de mensagens
-                    channel_config['messages'] = []
-
-                    # Cria e envia o embed do cabeçalho
-                    header_embed = discord.Embed(
-                        title=f"🏰 {channel_config['world'].capitalize()}",
-                        description=f"Casas disponíveis no {channel_config['world'].capitalize()}:",
-                        color=discord.Color.gold(),
-                        timestamp=discord.utils.utcnow()
-                    )
-                    header_message = await channel.send(embed=header_embed)
-                    channel_config['messages'].append(header_message.id)
-
-                    # Organiza as casas por distrito
-                    houses_by_district = {}
-                    for house in houses:
-                        # Mostra apenas casas em loteria (purchase_system = 7)
-                        if house['purchase_system'] != 7:
-                            continue
-                            
-                        district = house['district']
-                        if district not in houses_by_district:
-                            houses_by_district[district] = []
-                        houses_by_district[district].append(house)
-
-                    # Cria embeds por distrito
-                    for district, district_houses in houses_by_district.items():
-                        # Ordena as casas por tamanho e depois por preço
-                        district_houses.sort(key=lambda x: (["Small", "Medium", "Large"].index(x['size']), x['price']))
-                        
-                        # Cria o embed do distrito
-                        district_embed = discord.Embed(
-                            title=f"{DISTRICT_EMOJIS.get(district, '🏘️')} {district}",
-                            description=f"Mundo: **{channel_config['world'].capitalize()}**",
-                            color=DISTRICT_COLORS.get(district, discord.Color.blue()),
-                            timestamp=discord.utils.utcnow()
-                        )
-                        
-                        # Adiciona estatísticas do distrito
-                        stats = {
-                            "Small": len([h for h in district_houses if h['size'] == "Small"]),
-                            "Medium": len([h for h in district_houses if h['size'] == "Medium"]),
-                            "Large": len([h for h in district_houses if h['size'] == "Large"])
-                        }
-                        
-                        stats_text = " • ".join([
-                            f"{SIZE_EMOJIS[size]} {count}" for size, count in stats.items() if count > 0
-                        ])
-                        
-                        district_embed.add_field(
-                            name="📊 Distribuição",
-                            value=stats_text,
-                            inline=False
-                        )
-                        
-                        # Envia o embed do distrito
-                        district_message = await channel.send(embed=district_embed)
-                        channel_config['messages'].append(district_message.id)
-                        
-                        # Cria um embed para cada casa no distrito
-                        for house in district_houses:
-                            embed = create_house_embed(house, channel_config['world'])
-                            view = NotificationButton(house, channel_config['world'])
-                            message = await channel.send(embed=embed, view=view)
-                            channel_config['messages'].append(message.id)
-                            
-                            # Verifica se há usuários para notificar sobre mudanças
-                            for user_id, user_data in user_notifications.items():
-                                house_key = f"{channel_config['world']}_{district}_{house['ward']}_{house['plot']}"
-                                if house_key in user_data["notifications"]:
-                                    # Verifica se houve mudança no status
-                                    current_status = {
-                                        "lotto_phase": house['lotto_phase'],
-                                        "lotto_entries": house['lotto_entries'],
-                                        "lotto_phase_until": house.get('lotto_phase_until')
-                                    }
-                                    
-                                    last_status = last_known_status.get(house_key, {})
-                                    
-                                    # Só envia notificação se houver mudança real
-                                    if (current_status["lotto_phase"] != last_status.get("lotto_phase") or
-                                        current_status["lotto_entries"] != last_status.get("lotto_entries") or
-                                        current_status["lotto_phase_until"] != last_status.get("lotto_phase_until")):
-                                        
-                                        # Atualiza o último status conhecido
-                                        last_known_status[house_key] = current_status
-                                        save_last_known_status()
-                                        
-                                        user = await bot.fetch_user(int(user_id))
-                                        if user:
-                                            try:
-                                                embed = discord.Embed(
-                                                    title="🔔 Atualização de Status",
-                                                    description="O status de uma casa que você está monitorando mudou!",
-                                                    color=discord.Color.blue(),
-                                                    timestamp=discord.utils.utcnow()
-                                                )
-                                                
-                                                # Adiciona informações da casa
-                                                embed.add_field(
-                                                    name="🏰 Localização",
-                                                    value=f"{district} - Ward {house['ward']} Plot {house['plot']}",
-                                                    inline=False
-                                                )
-                                                
-                                                embed.add_field(
-                                                    name="🌍 Mundo",
-                                                    value=channel_config['world'].capitalize(),
-                                                    inline=False
-                                                )
-                                                
-                                                # Adiciona informações do novo status
-                                                lotto_phase = LOTTO_PHASES.get(house['lotto_phase'], "❓ Unknown")
-                                                entries = house['lotto_entries'] if house['lotto_entries'] is not None else "?"
-                                                
-                                                embed.add_field(
-                                                    name="📊 Novo Status",
-                                                    value=f"Status: {lotto_phase}\nInscrições: {entries}",
-                                                    inline=False
-                                                )
-                                                
-                                                # Adiciona até quando vai a fase da loteria, se disponível
-                                                if house.get('lotto_phase_until'):
-                                                    try:
-                                                        from datetime import timezone, timedelta
-                                                        until_dt = datetime.utcfromtimestamp(house['lotto_phase_until']) - timedelta(hours=3)
-                                                        until_str = until_dt.strftime('%d/%m/%Y %H:%M')
-                                                        embed.add_field(
-                                                            name="⏰ Próxima Mudança",
-                                                            value=f"{until_str} (Brasília)",
-                                                            inline=False
-                                                        )
-                                                    except Exception:
-                                                        pass
-                                                
-                                                await user.send(embed=embed)
-                                            except Exception as e:
-                                                print(f"Erro ao enviar notificação para {user_id}: {e}")
-
-                    # Atualiza o dicionário original com as novas mensagens
-                    housing_channels[guild_id]["channels"][channel_id] = channel_config
-                    save_housing_channels()
-
-                except Exception as e:
-                    print(f"Erro ao atualizar canal {channel_id} no servidor {guild_id}: {e}")
-                
-                # Adiciona um delay de 30 segundos entre cada canal
-                await asyncio.sleep(30)
+        # As mudanças são detectadas pelo world_poller e pelo websocket; aqui só
+        # são redesenhados os canais dos mundos marcados desde o último ciclo
+        refresh_stats.update(dict.fromkeys(refresh_stats, 0))
+        rendered = set(dirty_worlds)
+        unrendered_worlds.clear()
+        cycle = await channel_scheduler.run_cycle(jobs, update_channel)
+        dirty_worlds.difference_update(rendered - unrendered_worlds)
+        channel_feeds.end_cycle()
+        last_refresh_stats.update(refresh_stats)
+        await housing_stats.refresh()
+        CYCLE_SECONDS.observe(cycle['duration'])
+        calls = refresh_stats['sent'] + refresh_stats['edited'] + refresh_stats['deleted']
+        log.info("ciclo de atualização canais=%d duracao=%.1fs atraso=%.1fs falhas=%d",
+                 cycle['jobs'], cycle['duration'], cycle['lag'], cycle['failures'])
+        log.info("chamadas ao Discord total=%d enviadas=%d editadas=%d apagadas=%d sem_mudanca=%d completa=%d",
+                 calls, refresh_stats['sent'], refresh_stats['edited'], refresh_stats['deleted'],
+                 refresh_stats['skipped'], refresh_stats['full_refresh'])
     finally:
         update_housing_channels._running = False
 
@@ -903,6 +1362,16 @@ async def update_housing_channels():
 async def before_update_housing_channels():
     await bot.wait_until_ready()
 
+# Envia os resumos acumulados pelos eventos do websocket (cada lote de buscas
+# do world_poller já envia os seus ao terminar)
+@tasks.loop(minutes=1)
+async def flush_notifications():
+    await notification_dispatcher.flush()
+
+@flush_notifications.before_loop
+async def before_flush_notifications():
+    await bot.wait_until_ready()
+
 @bot.tree.command(name="housing_help", description="Explica como usar o comando de verificação de casas")
 async def housing_help(interaction: discord.Interaction):
     # Verifica se o usuário tem permissão de administrador
@@ -925,8 +1394,7 @@ async def housing_help(interaction: discord.Interaction):
     embed.add_field(
         name="🔍 Parâmetros Obrigatórios",
         value=(
-            "• `data_center`: O data center do mundo (ex: primal, aether, crystal)\n"
-            "• `world`: O mundo específico (ex: behemoth, excalibur, lamia)"
+            "• `data_center`: O data center do mundo (ex: primal, aether, crystal)"
         ),
         inline=False
     )
@@ -934,8 +1402,10 @@ async def housing_help(interaction: discord.Interaction):
     embed.add_field(
         name="🔧 Parâmetros Opcionais",
         value=(
+            "• `world`: O mundo específico (ex: behemoth, excalibur, lamia). Sem ele, busca o data center inteiro\n"
             "• `tamanho`: Filtra por tamanho da casa (small, medium, large)\n"
-            "• `distrito`: Filtra por distrito específico (shirogane, lavender beds, mist, goblet, empyreum)"
+            "• `distrito`: Filtra por distrito específico (shirogane, lavender beds, mist, goblet, empyreum)\n"
+            "• `ordenar`: Ordena por tamanho, preco ou inscricoes"
         ),
         inline=False
     )
@@ -957,7 +1427,10 @@ async def housing_help(interaction: discord.Interaction):
 
     embed.add_field(
         name="⏱️ Duração",
-        value="As mensagens são exibidas por 1 minuto e depois são automaticamente removidas.",
+        value=(
+            "O resultado vem em uma única mensagem, com botões para trocar de página, "
+            "filtrar por tamanho e mudar a ordenação. Ela é removida automaticamente após 5 minutos."
+        ),
         inline=False
     )
 
@@ -990,6 +1463,90 @@ async def housing_status(interaction: discord.Interaction):
     total_channels = sum(len(guild_data["channels"]) for guild_data in housing_channels.values())
     embed.add_field(name="Canais Configurados", value=str(total_channels), inline=False)
 
+    # Duração e atraso do último ciclo de atualização
+    last_cycle = channel_scheduler.last_cycle
+    if last_cycle:
+        embed.add_field(
+            name="Último Ciclo",
+            value=(
+                f"Duração: {last_cycle['duration']:.1f}s • Atraso: {last_cycle['lag']:.1f}s\n"
+                f"Canais: {last_cycle['jobs']} • Falhas: {last_cycle['failures']} • "
+                f"Ciclos estourados: {channel_scheduler.overruns}"
+            ),
+            inline=False
+        )
+
+    # Chamadas ao Discord no último ciclo, comparadas com a atualização completa
+    if last_refresh_stats:
+        calls = last_refresh_stats['sent'] + last_refresh_stats['edited'] + last_refresh_stats['deleted']
+        embed.add_field(
+            name="Chamadas ao Discord (Último Ciclo)",
+            value=(
+                f"Total: {calls} (antes: ~{last_refresh_stats['full_refresh']})\n"
+                f"Enviadas: {last_refresh_stats['sent']} • Editadas: {last_refresh_stats['edited']} • "
+                f"Apagadas: {last_refresh_stats['deleted']} • Sem mudança: {last_refresh_stats['skipped']}"
+            ),
+            inline=False
+        )
+
+    # Estatísticas do cache de mundos (misses = chamadas reais ao PaissaDB)
+    cache_stats = world_cache.stats()
+    embed.add_field(
+        name="Cache de Mundos",
+        value=(
+            f"Hits: {cache_stats['hits']} • Misses: {cache_stats['misses']} • "
+            f"Compartilhadas: {cache_stats['coalesced']} • Erros: {cache_stats['errors']}\n"
+            f"Mundos em cache: {cache_stats['cached_worlds']}"
+        ),
+        inline=False
+    )
+
+    # Buscas do polling adaptativo e o próximo mundo na fila
+    poller_stats = world_poller.stats()
+    next_poll = min(world_poller.schedule().items(), key=lambda item: item[1], default=None)
+    embed.add_field(
+        name="Polling Adaptativo",
+        value=(
+            f"Mundos monitorados: {poller_stats['worlds']} • Buscas: {poller_stats['polls']} • "
+            f"Falhas: {poller_stats['failures']}"
+            + (f"\nPróxima: {next_poll[0].capitalize()} <t:{int(next_poll[1])}:R>" if next_poll else "")
+        ),
+        inline=False
+    )
+
+    # Buscas condicionais: ciclos pulados por resposta idêntica x processados
+    fetch_stats = paissa_client.stats()
+    cycle_stats = change_detector.cycle_stats
+    skipped = sum(stats['skipped'] for stats in cycle_stats.values())
+    processed = sum(stats['processed'] for stats in cycle_stats.values())
+    per_world = " • ".join(
+        f"{world.capitalize()}: {stats['skipped']}/{stats['skipped'] + stats['processed']}"
+        for world, stats in sorted(cycle_stats.items(), key=lambda item: -item[1]['skipped'])[:5]
+    )
+    embed.add_field(
+        name="Respostas Sem Mudança",
+        value=(
+            f"Ciclos pulados: {skipped} • Processados: {processed}\n"
+            f"304: {fetch_stats['not_modified']} • Mesmo hash: {fetch_stats['unchanged']} • "
+            f"Novas: {fetch_stats['changed']}"
+            + (f"\nPulados por mundo: {per_world}" if per_world else "")
+        ),
+        inline=False
+    )
+
+    # Estado do websocket do PaissaDB (sem ele, só o polling)
+    if paissa_stream is not None:
+        stream_stats = paissa_stream.stats()
+        embed.add_field(
+            name="Websocket do PaissaDB",
+            value=(
+                f"{'✅ Conectado' if stream_stats['connected'] else '❌ Desconectado (polling)'}\n"
+                f"Eventos: {stream_stats['events']} • Conexões: {stream_stats['connections']} • "
+                f"Quedas: {stream_stats['disconnects']} • Erros: {stream_stats['errors']}"
+            ),
+            inline=False
+        )
+
     # Adiciona botão para forçar atualização
     if not is_running:
         embed.add_field(
@@ -1016,6 +1573,213 @@ async def housing_status(interaction: discord.Interaction):
 
         await interaction.followup.send("Clique no botão abaixo para reiniciar a atualização:", view=RestartButton())
 
+# Profundidade das filas e outros valores lidos na hora da coleta
+registry.gauge('housing_dm_queue', 'Resumos por DM na fila de envio', lambda: notification_dispatcher.stats()['queued'])
+registry.gauge('housing_dm_pending_users', 'Usuários com mudanças acumuladas ainda não enfileiradas',
+               lambda: notification_dispatcher.stats()['pending_users'])
+registry.gauge('housing_expiry_pending', 'Mensagens temporárias esperando para serem apagadas', lambda: len(message_expiry))
+registry.gauge('housing_store_pending', 'Operações esperando gravação no SQLite', lambda: state_store.stats()['pending'])
+registry.gauge('housing_history_pending', 'Registros do histórico esperando gravação',
+               lambda: history_store.stats()['pending'] if history_store is not None else 0)
+registry.gauge('housing_dirty_worlds', 'Mundos com mudanças esperando o próximo ciclo de canais', lambda: len(dirty_worlds))
+registry.gauge('housing_watched_worlds', 'Mundos acompanhados pelo polling adaptativo', lambda: world_poller.stats()['worlds'])
+registry.gauge('housing_stream_connected', 'Websocket do PaissaDB conectado (1) ou não (0)',
+               lambda: bool(paissa_stream is not None and paissa_stream.connected))
+registry.gauge('discord_limiter_waits', 'Esperas no rate limiter local antes de chamar o Discord',
+               lambda: global_rate_limiter.waits + channel_rate_limiter.waits)
+
+# p50/p95 e quantidade de amostras de um histograma de latência
+def format_latency(name):
+    histogram = registry.get(name)
+    if histogram is None or not histogram.count:
+        return "sem amostras"
+    return (f"p50 {histogram.quantile(0.5) * 1000:.1f}ms • p95 {histogram.quantile(0.95) * 1000:.1f}ms • "
+            f"n={histogram.count}")
+
+# Valores de um contador com label, ex.: "send: 10 • edit: 4"
+def format_counter(name):
+    counter = registry.get(name)
+    if counter is None or not counter.values:
+        return "0"
+    return " • ".join(f"{key[0] or '-'}: {value}" for key, value in sorted(counter.values.items()))
+
+@bot.tree.command(name="housing_metrics", description="Mostra as métricas internas do bot (admin)")
+async def housing_metrics(interaction: discord.Interaction):
+    if not (interaction.user.guild_permissions.administrator or interaction.user.guild_permissions.manage_channels):
+        await interaction.response.send_message("Você precisa ter permissão de administrador ou gerenciar canais para usar este comando.", ephemeral=True)
+        return
+
+    embed = discord.Embed(
+        title="📈 Métricas do Bot",
+        color=discord.Color.blue(),
+        timestamp=discord.utils.utcnow()
+    )
+    embed.add_field(
+        name="Latência por Etapa",
+        value=(
+            f"Busca no PaissaDB: {format_latency('paissa_fetch_seconds')}\n"
+            f"Conversão: {format_latency('housing_parse_seconds')}\n"
+            f"Comparação: {format_latency('housing_diff_seconds')}\n"
+            f"Montagem dos embeds: {format_latency('housing_render_seconds')}"
+        ),
+        inline=False
+    )
+    cycle = registry.get('housing_cycle_seconds')
+    embed.add_field(
+        name="Ciclos de Canais",
+        value=(
+            f"p50 {cycle.quantile(0.5):.1f}s • p95 {cycle.quantile(0.95):.1f}s • n={cycle.count}"
+            if cycle.count else "sem amostras"
+        ),
+        inline=False
+    )
+    embed.add_field(
+        name="Discord",
+        value=(
+            f"Chamadas: {format_counter('discord_requests_total')}\n"
+            f"429: {DISCORD_RATE_LIMITED.total()} (globais: {DISCORD_GLOBAL_RATE_LIMITED.total()}) • "
+            f"Esperas no limitador: {registry.get('discord_limiter_waits').value():.0f}"
+        ),
+        inline=False
+    )
+    embed.add_field(
+        name="PaissaDB",
+        value=(
+            f"Respostas: {format_counter('paissa_fetch_total')}\n"
+            f"Eventos do websocket: {format_counter('paissa_stream_events_total')}\n"
+            f"Mudanças detectadas: {format_counter('housing_change_events_total')}"
+        ),
+        inline=False
+    )
+    embed.add_field(
+        name="Filas",
+        value=(
+            f"DMs na fila: {notification_dispatcher.stats()['queued']} • "
+            f"Usuários pendentes: {notification_dispatcher.stats()['pending_users']}\n"
+            f"Mensagens a expirar: {len(message_expiry)} • Gravações pendentes: {state_store.stats()['pending']}\n"
+            f"Mundos para redesenhar: {len(dirty_worlds)} • Mundos monitorados: {world_poller.stats()['worlds']}"
+        ),
+        inline=False
+    )
+    if metrics_server is not None:
+        embed.set_footer(text=f"Prometheus: http://{metrics_server.host}:{metrics_server.port}/metrics")
+
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+# Mediana/média de inscrições formatada ("-" sem casas em loteria)
+def format_entries(value):
+    return "-" if value is None else f"{value:.0f}" if value >= 10 else f"{value:.1f}"
+
+# Casas abertas de cada tamanho, ex.: "🏠 12 • 🏡 3 • 🏰 1"
+def format_sizes(counts):
+    return " • ".join(f"{SIZE_EMOJIS[SIZE_NAMES[code]]} {int(count)}" for code, count in enumerate(counts))
+
+def data_center_stats_embed(data_center, summary):
+    counts = summary['counts']
+    total = int(counts.sum())
+    embed = discord.Embed(
+        title=f"📊 Estatísticas — {data_center.capitalize()}",
+        description=(
+            f"Mundos com dados: **{len(summary['worlds'])}/{len(DATA_CENTERS[data_center])}** • "
+            f"Casas abertas: **{total}** • Em loteria: **{summary['lottery_plots']}**"
+        ),
+        color=discord.Color.gold(),
+        timestamp=discord.utils.utcnow()
+    )
+    embed.add_field(name="🏘️ Por Tamanho", value=format_sizes(counts.sum(axis=0)), inline=False)
+    embed.add_field(
+        name="🗺️ Por Distrito",
+        value="\n".join(
+            f"{DISTRICT_EMOJIS.get(name, '🏘️')} {name}: {format_sizes(counts[index])}"
+            for index, name in enumerate(DISTRICT_IDS[district_id] for district_id in sorted(DISTRICT_IDS))
+        ),
+        inline=False
+    )
+    if summary['by_world']:
+        embed.add_field(
+            name="🌍 Por Mundo",
+            value=" • ".join(f"{world.capitalize()}: {count}" for world, count in summary['by_world'].items()),
+            inline=False
+        )
+    embed.add_field(
+        name="🎫 Mediana de Inscrições",
+        value=f"Geral: {format_entries(summary['median_entries'])} • " + " • ".join(
+            f"{SIZE_EMOJIS[SIZE_NAMES[code]]} {format_entries(median)}" for code, median in enumerate(summary['median_by_size'])
+        ),
+        inline=False
+    )
+    if summary['ranking']:
+        lines = []
+        for position, (world, mean, plots, growth) in enumerate(summary['ranking'][:10], start=1):
+            line = f"{position}. **{world.capitalize()}** — média {format_entries(mean)} inscrições em {plots} casas"
+            if growth is not None:
+                line += f" • +{growth:.1f}/h"
+            lines.append(line)
+        embed.add_field(name="🔥 Mais Concorridos", value="\n".join(lines), inline=False)
+    if summary['growth']:
+        embed.add_field(
+            name=f"📈 Inscrições por Hora (últimas {housing_stats.growth_window // 3600}h)",
+            value=" • ".join(f"{world.capitalize()}: {rate:.1f}" for world, rate in
+                             sorted(summary['growth'].items(), key=lambda item: -item[1])),
+            inline=False
+        )
+    if summary['missing']:
+        embed.add_field(
+            name="⚠️ Sem Dados",
+            value=", ".join(world.capitalize() for world in summary['missing']),
+            inline=False
+        )
+    return embed
+
+def overview_stats_embed():
+    embed = discord.Embed(
+        title="📊 Estatísticas — Todos os Data Centers",
+        color=discord.Color.gold(),
+        timestamp=discord.utils.utcnow()
+    )
+    rows = housing_stats.overview()
+    lines = [
+        f"**{data_center.capitalize()}** — {len(summary['worlds'])}/{len(DATA_CENTERS[data_center])} mundos • "
+        f"{int(summary['counts'].sum())} casas • mediana {format_entries(summary['median_entries'])} inscrições"
+        for data_center, summary, _ in rows
+    ]
+    embed.add_field(name="🌐 Data Centers", value="\n".join(lines), inline=False)
+    ranked = sorted((row for row in rows if row[2] is not None), key=lambda row: -row[2])
+    if ranked:
+        embed.add_field(
+            name="🔥 Mais Concorridos",
+            value="\n".join(
+                f"{position}. **{data_center.capitalize()}** — média {format_entries(mean)} inscrições por casa"
+                for position, (data_center, _, mean) in enumerate(ranked, start=1)
+            ),
+            inline=False
+        )
+    embed.set_footer(text="Só mundos já consultados • use data_center para completar um data center")
+    return embed
+
+@bot.tree.command(name="housing_stats", description="Estatísticas das casas abertas e das inscrições por data center")
+async def housing_stats_command(interaction: discord.Interaction, data_center: str = None):
+    data_center = data_center.lower() if data_center else None
+    if data_center and data_center not in DATA_CENTERS:
+        await interaction.response.send_message(
+            f"Data center inválido. Data centers disponíveis: {', '.join(DATA_CENTERS.keys())}", ephemeral=True)
+        return
+
+    await interaction.response.defer()
+    if data_center is None:
+        embed = overview_stats_embed()
+    else:
+        # Mundos do data center que o detector ainda não viu entram pelo cache
+        missing = [world for world in DATA_CENTERS[data_center] if world not in housing_stats]
+        if missing:
+            snapshots, _, _ = await gather_within({world: get_world_houses(world) for world in missing}, DC_QUERY_BUDGET)
+            for world, snapshot in snapshots.items():
+                housing_stats.update_world(world, snapshot)
+        embed = data_center_stats_embed(data_center, housing_stats.data_center(data_center))
+
+    message = await interaction.followup.send(embed=embed, wait=True)
+    message_expiry.schedule(message.channel.id, message.id, time.time() + HOUSING_CHECK_TTL)
+
 @bot.tree.command(name="clear_houses", description="Limpa todas as mensagens de um canal (admin)")
 @app_commands.describe(channel="Canal a ser limpo")
 async def clear_houses(interaction: discord.Interaction, channel: discord.TextChannel):
@@ -1026,29 +1790,37 @@ async def clear_houses(interaction: discord.Interaction, channel: discord.TextCh
 
     await interaction.response.send_message(f"Limpando todas as mensagens do canal {channel.mention}...", ephemeral=True)
 
-    deleted = 0
+    last_report = time.monotonic()
+
+    # Atualiza a mensagem de progresso no máximo a cada 3 segundos
+    async def report(result):
+        nonlocal last_report
+        if time.monotonic() - last_report < 3:
+            return
+        last_report = time.monotonic()
+        done = result['deleted'] + result['missing'] + result['failed']
+        try:
+            await interaction.edit_original_response(
+                content=f"Limpando {channel.mention}: {done}/{result['total']} mensagens "
+                        f"({result['rate']:.1f} msg/s)..."
+            )
+        except discord.HTTPException:
+            pass
+
     try:
-        def check(msg):
-            return True  # Deleta tudo
-        # Deleta em lotes de 100 (bulk delete só funciona para mensagens com até 14 dias)
-        while True:
-            msgs = [m async for m in channel.history(limit=100)]
-            if not msgs:
-                break
-            await channel.delete_messages(msgs)
-            deleted += len(msgs)
-        # Para mensagens mais antigas, deleta uma a uma
-        async for msg in channel.history(limit=None, oldest_first=True):
-            try:
-                await msg.delete()
-                deleted += 1
-            except Exception:
-                pass
-    except Exception as e:
+        # Uma única passada pelo histórico só para pegar os ids
+        message_ids = [message.id async for message in channel.history(limit=None)]
+        result = await message_deleter.delete(channel, message_ids, progress=report)
+    except discord.HTTPException as e:
         await interaction.followup.send(f"Erro ao deletar mensagens: {e}", ephemeral=True)
         return
 
-    await interaction.followup.send(f"Foram deletadas {deleted} mensagens do canal {channel.mention}.", ephemeral=True)
+    summary = (f"Foram deletadas {result['deleted']} mensagens do canal {channel.mention} "
+               f"em {result['elapsed']:.1f}s ({result['rate']:.1f} msg/s; "
+               f"{result['bulk_calls']} lotes, {result['single_calls']} exclusões individuais).")
+    if result['failed']:
+        summary += f"\n⚠️ {result['failed']} mensagens não puderam ser apagadas."
+    await interaction.followup.send(summary, ephemeral=True)
 
 @bot.tree.command(name="my_notifications", description="Gerencia suas notificações de casas")
 async def my_notifications(interaction: discord.Interaction):
@@ -1082,12 +1854,22 @@ async def my_notifications(interaction: discord.Interaction):
                 await interaction.response.send_message("Este botão não é para você!", ephemeral=True)
                 return
             
+            removed = user_notifications[user_id]["notifications"]
+            subscription_index.remove_user(user_id, removed)
             user_notifications[user_id]["notifications"] = []
-            save_user_notifications()
+            state_store.remove_user_subscriptions(user_id)
+
+            # Descarta o status das casas que ninguém mais monitora
+            for house_key in removed:
+                if house_key not in subscription_index:
+                    last_known_status.pop(house_key, None)
+                    save_last_known_status(house_key)
             await interaction.response.send_message("Todas as suas notificações foram removidas.", ephemeral=True)
             await interaction.message.delete()
     
     await interaction.response.send_message(embed=embed, view=NotificationManager(), ephemeral=True)
 
-# Inicia o bot
-bot.run(os.getenv('DISCORD_TOKEN')) 
\ No newline at end of file
+# Inicia o bot (importar o módulo, como faz o teste de carga, não conecta ao Discord).
+# O discord.py configura o logger raiz, então os logs do bot saem no mesmo formato
+if __name__ == '__main__':
+    bot.run(os.getenv('DISCORD_TOKEN'), log_level=LOG_LEVEL, root_logger=True)
\ No newline at end of file
@@ -0,0 +1,122 @@
+import logging
+import time
+from collections import namedtuple
+
+from metrics import registry
+
+log = logging.getLogger(__name__)
+
+# Tipos de evento gerados pela comparação de snapshots
+PLOT_OPENED = "plot_opened"
+PLOT_CLOSED = "plot_closed"
+ENTRIES_CHANGED = "entries_changed"
+PHASE_CHANGED = "phase_changed"
+
+DIFF_SECONDS = registry.histogram('housing_diff_seconds', 'Tempo para comparar o snapshot de um mundo com o anterior')
+EVENTS = registry.counter('housing_change_events_total', 'Eventos de mudança gerados pelo detector', labels=('kind',))
+
+# Evento de mudança de uma casa. "house" é o estado atual (ou o último conhecido,
+# se a casa fechou) e "previous" o estado anterior, quando existir.
+PlotEvent = namedtuple('PlotEvent', ['kind', 'world', 'house_key', 'house', 'previous'])
+
+
+# Chave única de uma casa, no mesmo formato usado pelas notificações dos usuários
+def make_house_key(world, house):
+    return f"{world}_{house['district']}_{house['ward']}_{house['plot']}"
+
+
+# Compara apenas os campos de status de uma casa que existe nos dois lados
+def _status_events(world, house_key, previous, house):
+    events = []
+    if (previous.get('lotto_phase') != house['lotto_phase'] or
+            previous.get('lotto_phase_until') != house.get('lotto_phase_until')):
+        events.append(PlotEvent(PHASE_CHANGED, world, house_key, house, previous))
+    if previous.get('lotto_entries') != house['lotto_entries']:
+        events.append(PlotEvent(ENTRIES_CHANGED, world, house_key, house, previous))
+    return events
+
+
+# Compara dois snapshots completos de um mundo ({chave: casa}) e gera os eventos
+def diff_snapshots(world, previous, current):
+    events = []
+    for house_key, house in current.items():
+        old = previous.get(house_key)
+        if old is None:
+            events.append(PlotEvent(PLOT_OPENED, world, house_key, house, None))
+        else:
+            events.extend(_status_events(world, house_key, old, house))
+
+    for house_key, old in previous.items():
+        if house_key not in current:
+            events.append(PlotEvent(PLOT_CLOSED, world, house_key, old, old))
+
+    return events
+
+
+# Sem snapshot anterior (ex.: depois de reiniciar), compara só com os status
+# salvos das casas conhecidas; não gera eventos de abertura/fechamento
+def diff_statuses(world, statuses, current):
+    events = []
+    for house_key, house in current.items():
+        status = statuses.get(house_key)
+        if status is not None:
+            events.extend(_status_events(world, house_key, status, house))
+    return events
+
+
+# Guarda o último snapshot de cada mundo e publica os eventos de cada comparação
+# para os consumidores registrados (notificações, canais, histórico...)
+class ChangeDetector:
+    def __init__(self):
+        self._snapshots = {}
+        self._sources = {}
+        self._listeners = []
+        # Ciclos por mundo: processados (com comparação) x pulados (snapshot idêntico)
+        self.cycle_stats = {}
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def has_snapshot(self, world):
+        return world in self._snapshots
+
+    def worlds(self):
+        return list(self._snapshots)
+
+    # Último snapshot recebido de um mundo, como foi passado para process
+    def snapshot(self, world):
+        return self._sources.get(world)
+
+    # Estado de uma casa no último snapshot do mundo (None se não estiver aberta)
+    def get_house(self, world, house_key):
+        return self._snapshots.get(world, {}).get(house_key)
+
+    async def process(self, world, houses, seed=None):
+        stats = self.cycle_stats.setdefault(world, {'processed': 0, 'skipped': 0})
+        # A busca condicional devolve a mesma lista quando o PaissaDB não mudou:
+        # não há o que comparar nem avisar
+        if self._sources.get(world) is houses:
+            stats['skipped'] += 1
+            return []
+        stats['processed'] += 1
+
+        start = time.perf_counter()
+        current = {make_house_key(world, house): house for house in houses}
+        previous = self._snapshots.get(world)
+        if previous is None:
+            events = diff_statuses(world, seed or {}, current)
+        else:
+            events = diff_snapshots(world, previous, current)
+        DIFF_SECONDS.observe(time.perf_counter() - start)
+        self._snapshots[world] = current
+        self._sources[world] = houses
+        for event in events:
+            EVENTS.inc(kind=event.kind)
+
+        for listener in self._listeners:
+            try:
+                await listener(world, events)
+            except Exception:
+                log.exception("erro ao processar eventos mundo=%s listener=%s", world, listener.__name__)
+
+        return events
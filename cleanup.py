@@ -0,0 +1,128 @@
+import asyncio
+import time
+
+import discord
+
+from layout import chunked
+from metrics import registry
+
+# O bulk delete do Discord aceita de 2 a 100 mensagens com menos de 14 dias
+BULK_DELETE_MAX = 100
+BULK_DELETE_MAX_AGE = 14 * 24 * 3600 - 600  # 10 minutos de margem
+
+DISCORD_EPOCH = 1420070400000
+
+DISCORD_REQUESTS = registry.counter('discord_requests_total', 'Chamadas à API do Discord por operação', labels=('op',))
+
+
+# Idade de uma mensagem (em segundos) calculada pelo próprio id, sem buscar nada
+def snowflake_age(message_id, now=None):
+    created = ((message_id >> 22) + DISCORD_EPOCH) / 1000
+    return (time.time() if now is None else now) - created
+
+
+# Separa os ids que podem ir no bulk delete dos que precisam ser apagados um a um
+def split_by_age(message_ids, now=None):
+    now = time.time() if now is None else now
+    recent, old = [], []
+    for message_id in message_ids:
+        if snowflake_age(message_id, now) < BULK_DELETE_MAX_AGE:
+            recent.append(message_id)
+        else:
+            old.append(message_id)
+    return recent, old
+
+
+# Apaga mensagens pelo id com mensagens parciais (sem fetch): as recentes em
+# lotes de 100 pelo bulk delete e só as antigas (ou um lote recusado, ex.: sem
+# permissão de Gerenciar Mensagens) uma a uma, com alguns workers respeitando o
+# rate limit. `progress(resultado)` é chamado a cada lote e a cada mensagem.
+class MessageDeleter:
+    def __init__(self, rate_limit, workers=4, clock=time.monotonic):
+        self._rate_limit = rate_limit
+        self.workers = workers
+        self._clock = clock
+        self.deleted = 0
+        self.missing = 0
+        self.failed = 0
+        self.bulk_calls = 0
+        self.single_calls = 0
+
+    async def _bulk(self, channel, chunk, result):
+        await self._rate_limit(channel.id)
+        self.bulk_calls += 1
+        result['bulk_calls'] += 1
+        DISCORD_REQUESTS.inc(op='bulk_delete')
+        await channel.delete_messages([discord.Object(id=message_id) for message_id in chunk])
+        result['deleted'] += len(chunk)
+
+    async def _single(self, channel, message_id, result):
+        await self._rate_limit(channel.id)
+        self.single_calls += 1
+        result['single_calls'] += 1
+        DISCORD_REQUESTS.inc(op='delete')
+        try:
+            await channel.get_partial_message(message_id).delete()
+            result['deleted'] += 1
+        except discord.NotFound:
+            # Já tinha sido apagada
+            result['missing'] += 1
+        except discord.HTTPException:
+            result['failed'] += 1
+
+    async def delete(self, channel, message_ids, progress=None):
+        start = self._clock()
+        message_ids = list(dict.fromkeys(message_ids))
+        result = {
+            'total': len(message_ids), 'deleted': 0, 'missing': 0, 'failed': 0,
+            'bulk_calls': 0, 'single_calls': 0, 'elapsed': 0.0, 'rate': 0.0,
+        }
+
+        def update():
+            result['elapsed'] = self._clock() - start
+            done = result['deleted'] + result['missing'] + result['failed']
+            result['rate'] = done / result['elapsed'] if result['elapsed'] > 0 else 0.0
+
+        async def report():
+            update()
+            if progress is not None:
+                await progress(dict(result))
+
+        # Canal parcial (sem cache) não tem bulk delete: tudo vai uma a uma
+        if hasattr(channel, 'delete_messages'):
+            recent, singles = split_by_age(message_ids)
+        else:
+            recent, singles = [], list(message_ids)
+        for chunk in chunked(recent, BULK_DELETE_MAX):
+            if len(chunk) < 2:
+                singles.extend(chunk)
+                continue
+            try:
+                await self._bulk(channel, chunk, result)
+            except discord.HTTPException:
+                singles.extend(chunk)
+            await report()
+
+        pending = iter(singles)
+
+        async def worker():
+            for message_id in pending:
+                await self._single(channel, message_id, result)
+                await report()
+
+        await asyncio.gather(*(worker() for _ in range(min(self.workers, len(singles)))))
+
+        update()
+        self.deleted += result['deleted']
+        self.missing += result['missing']
+        self.failed += result['failed']
+        return result
+
+    def stats(self):
+        return {
+            'deleted': self.deleted,
+            'missing': self.missing,
+            'failed': self.failed,
+            'bulk_calls': self.bulk_calls,
+            'single_calls': self.single_calls,
+        }
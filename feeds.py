@@ -0,0 +1,107 @@
+from metrics import registry
+from snapshot import SIZE_CODES, match_districts
+
+FEED_SECTIONS = registry.counter('housing_feed_sections_total',
+                                 'Seções de mundo dos canais: reaproveitadas (hit) x filtradas e montadas (miss)',
+                                 labels=('result',))
+
+
+# Mundos de um canal: a lista "worlds" (data center ou vários mundos) ou o
+# "world" único das configurações antigas
+def channel_worlds(config):
+    return config.get('worlds') or ([config['world']] if config.get('world') else [])
+
+
+# Filtro de canal compilado uma vez a partir da configuração: distrito e tamanho
+# viram uma consulta aos índices do WorldSnapshot e só os predicados de preço e
+# inscrições configurados entram na função aplicada a cada casa
+class PlotFilter:
+    __slots__ = ('key', 'district_ids', 'size_code', '_predicate')
+
+    def __init__(self, district=None, size=None, max_price=None, max_entries=None):
+        self.key = (district, size, max_price, max_entries)
+        self.district_ids = match_districts(district) if district else None
+        self.size_code = SIZE_CODES.get(size) if size else None
+
+        checks = []
+        if max_price is not None:
+            checks.append(lambda plot: plot.price <= max_price)
+        if max_entries is not None:
+            # Inscrições ainda desconhecidas não excluem a casa
+            checks.append(lambda plot: plot.lotto_entries is None or plot.lotto_entries <= max_entries)
+        if not checks:
+            self._predicate = None
+        elif len(checks) == 1:
+            self._predicate = checks[0]
+        else:
+            self._predicate = lambda plot: all(check(plot) for check in checks)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.get('district'), config.get('size'), config.get('max_price'), config.get('max_entries'))
+
+    # Grupos (distrito, casas em loteria) do snapshot que passam no filtro
+    def select(self, snapshot):
+        groups = snapshot.by_district(self.district_ids, self.size_code, lottery=True)
+        if self._predicate is None:
+            return groups
+        groups = [(district, tuple(filter(self._predicate, plots))) for district, plots in groups]
+        return [(district, plots) for district, plots in groups if plots]
+
+    # Predicados de tamanho, preço e inscrições em texto (o distrito já aparece nas seções)
+    def describe(self):
+        parts = []
+        _, size, max_price, max_entries = self.key
+        if size:
+            parts.append(f"tamanho {size}")
+        if max_price is not None:
+            parts.append(f"até {max_price:,} gil")
+        if max_entries is not None:
+            parts.append(f"até {max_entries} inscrições")
+        return ", ".join(parts)
+
+
+# Seções já filtradas e montadas de cada (mundo, filtro), compartilhadas por
+# todos os canais que mostram o mesmo mundo com o mesmo filtro. Os snapshots são
+# imutáveis, então a seção vale enquanto o snapshot do mundo for o mesmo objeto:
+# por ciclo, o custo cresce com os mundos distintos que mudaram e não com os
+# pares canal x mundo. `render(mundo, grupos)` devolve a lista de seções no
+# formato de pack_sections.
+class FeedCache:
+    def __init__(self, render):
+        self._render = render
+        self._filters = {}
+        self._entries = {}
+        self._used = set()
+        self.hits = 0
+        self.misses = 0
+
+    def compile(self, config):
+        plot_filter = PlotFilter.from_config(config)
+        return self._filters.setdefault(plot_filter.key, plot_filter)
+
+    def sections(self, world, snapshot, plot_filter):
+        key = (world, plot_filter.key)
+        self._used.add(key)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] is snapshot:
+            self.hits += 1
+            FEED_SECTIONS.inc(result='hit')
+            return entry[1]
+        self.misses += 1
+        FEED_SECTIONS.inc(result='miss')
+        sections = self._render(world, plot_filter.select(snapshot))
+        self._entries[key] = (snapshot, sections)
+        return sections
+
+    # No fim de cada ciclo, esquece as seções e filtros que nenhum canal usou
+    def end_cycle(self):
+        for key in set(self._entries) - self._used:
+            del self._entries[key]
+        used_filters = {filter_key for _, filter_key in self._used}
+        for filter_key in set(self._filters) - used_filters:
+            del self._filters[filter_key]
+        self._used = set()
+
+    def stats(self):
+        return {'sections': len(self._entries), 'filters': len(self._filters), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,296 @@
+import asyncio
+import bisect
+import logging
+import mmap
+import os
+import shutil
+import time
+from array import array
+from datetime import datetime, timezone
+
+from changes import ENTRIES_CHANGED, PHASE_CHANGED, PLOT_CLOSED, PLOT_OPENED
+
+log = logging.getLogger(__name__)
+
+# Colunas de cada partição (um arquivo por coluna, tipos do módulo array).
+# Entradas e fase desconhecidas são gravadas como -1.
+COLUMNS = (
+    ('t', 'q'),         # horário (epoch em segundos)
+    ('kind', 'B'),      # máscara com os tipos de mudança (KIND_FLAGS)
+    ('district', 'H'),
+    ('ward', 'B'),
+    ('plot', 'B'),
+    ('size', 'B'),
+    ('price', 'I'),
+    ('entries', 'i'),
+    ('phase', 'b'),
+)
+
+# Bits da coluna "kind": um único registro por casa e comparação, mesmo
+# quando a fase e as inscrições mudam juntas
+KIND_FLAGS = {
+    PLOT_OPENED: 1,
+    PLOT_CLOSED: 2,
+    ENTRIES_CHANGED: 4,
+    PHASE_CHANGED: 8,
+}
+
+# Partições já reduzidas a um registro por casa e intervalo
+DOWNSAMPLED_MARKER = 'downsampled'
+
+# Sufixos dos diretórios usados durante a troca de uma partição reduzida
+SWAP_SUFFIXES = ('.tmp', '.old')
+
+
+def day_of(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime('%Y-%m-%d')
+
+
+def _map_column(path, typecode):
+    try:
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return memoryview(b'').cast('B').cast(typecode)
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except FileNotFoundError:
+        return memoryview(b'').cast('B').cast(typecode)
+    view = memoryview(mapped)
+    itemsize = array(typecode).itemsize
+    return view[:size - size % itemsize].cast(typecode)
+
+
+# Histórico das casas em formato colunar, particionado por mundo e dia:
+# <raiz>/<mundo>/<AAAA-MM-DD>/<coluna>.bin. Cada comparação do ChangeDetector
+# acrescenta uma linha por casa alterada com o estado atual dela. A leitura é
+# por mmap, então varrer semanas de dados não carrega os arquivos na memória.
+# Partições mais antigas que `downsample_after_days` ficam com um registro por
+# casa a cada `downsample_interval` segundos, e as mais antigas que
+# `retention_days` são apagadas.
+class HistoryStore:
+    def __init__(self, root, interval=30, retention_days=90, downsample_after_days=7,
+                 downsample_interval=3600, clock=time.time):
+        self.root = root
+        self.interval = interval
+        self.retention_days = retention_days
+        self.downsample_after_days = downsample_after_days
+        self.downsample_interval = downsample_interval
+        self._clock = clock
+        self._pending = {}
+        self._lock = asyncio.Lock()
+        self._task = None
+        self._last_compaction = None
+        self.rows = 0
+        self.flushes = 0
+
+    def append(self, world, at, kind, house):
+        rows = self._pending.setdefault((world, day_of(at)), [])
+        rows.append((
+            int(at),
+            kind,
+            house.district_id,
+            house.ward,
+            house.plot,
+            house.size_code,
+            house.price,
+            house.lotto_entries if house.lotto_entries is not None else -1,
+            house.lotto_phase if house.lotto_phase is not None else -1,
+        ))
+
+    # Listener do ChangeDetector: um registro por casa com todos os tipos de mudança
+    async def record_events(self, world, events):
+        if not events:
+            return
+        at = self._clock()
+        kinds = {}
+        houses = {}
+        for event in events:
+            kinds[event.house_key] = kinds.get(event.house_key, 0) | KIND_FLAGS.get(event.kind, 0)
+            houses[event.house_key] = event.house
+        for house_key, kind in kinds.items():
+            self.append(world, at, kind, houses[house_key])
+
+    def _partition_path(self, world, day):
+        return os.path.join(self.root, world, day)
+
+    # Acrescenta as linhas de uma partição em todas as colunas. Se uma gravação
+    # falha no meio, as colunas voltam ao tamanho anterior para não ficarem
+    # desalinhadas quando as linhas forem gravadas de novo.
+    def _write_partition(self, world, day, rows):
+        directory = self._partition_path(world, day)
+        os.makedirs(directory, exist_ok=True)
+        paths = [os.path.join(directory, f'{name}.bin') for name, _ in COLUMNS]
+        sizes = [os.path.getsize(path) if os.path.exists(path) else 0 for path in paths]
+        try:
+            for index, ((_, typecode), path) in enumerate(zip(COLUMNS, paths)):
+                with open(path, 'ab') as f:
+                    array(typecode, (row[index] for row in rows)).tofile(f)
+        except OSError:
+            for path, size in zip(paths, sizes):
+                try:
+                    os.truncate(path, size)
+                except FileNotFoundError:
+                    pass
+            raise
+
+    # Grava as partições uma a uma, tirando de `batches` as que já foram gravadas
+    # (linhas de uma partição cortada por um crash são descartadas na leitura,
+    # que usa o menor tamanho entre as colunas)
+    def _write(self, batches):
+        for world, day in list(batches):
+            self._write_partition(world, day, batches[world, day])
+            del batches[world, day]
+
+    async def flush(self):
+        async with self._lock:
+            if not self._pending:
+                return
+            batches, self._pending = self._pending, {}
+            rows = sum(len(rows) for rows in batches.values())
+            try:
+                await asyncio.to_thread(self._write, batches)
+            except OSError as e:
+                log.error("erro ao gravar histórico em %s: %s", self.root, e)
+                # Só as partições que não foram gravadas voltam para a fila
+                self.rows += rows - sum(len(rows) for rows in batches.values())
+                for key, rows in batches.items():
+                    self._pending[key] = rows + self._pending.get(key, [])
+                return
+            self.rows += rows
+            self.flushes += 1
+
+    def worlds(self):
+        try:
+            return sorted(os.listdir(self.root))
+        except FileNotFoundError:
+            return []
+
+    def days(self, world):
+        try:
+            return sorted(day for day in os.listdir(os.path.join(self.root, world)) if not day.endswith(SWAP_SUFFIXES))
+        except FileNotFoundError:
+            return []
+
+    # Colunas de uma partição como memoryviews sobre os arquivos mapeados
+    def read_partition(self, world, day):
+        directory = self._partition_path(world, day)
+        columns = {name: _map_column(os.path.join(directory, f'{name}.bin'), typecode) for name, typecode in COLUMNS}
+        rows = min(len(column) for column in columns.values())
+        return {name: column[:rows] for name, column in columns.items()}
+
+    # Percorre as partições de um mundo entre `start` e `end` (epoch) e devolve
+    # (dia, colunas) já cortadas ao intervalo pela busca binária no horário
+    def scan(self, world, start=None, end=None):
+        first = day_of(start) if start is not None else None
+        last = day_of(end) if end is not None else None
+        for day in self.days(world):
+            if (first is not None and day < first) or (last is not None and day > last):
+                continue
+            columns = self.read_partition(world, day)
+            times = columns['t']
+            lo = bisect.bisect_left(times, start) if start is not None else 0
+            hi = bisect.bisect_right(times, end) if end is not None else len(times)
+            if hi > lo:
+                yield day, {name: column[lo:hi] for name, column in columns.items()}
+
+    def _downsample(self, world, day):
+        columns = self.read_partition(world, day)
+        rows = len(columns['t'])
+        # Último estado de cada casa por intervalo, acumulando os tipos de mudança
+        buckets = {}
+        for index in range(rows):
+            key = (columns['district'][index], columns['ward'][index], columns['plot'][index],
+                   columns['t'][index] // self.downsample_interval)
+            previous = buckets.get(key)
+            buckets[key] = (index, columns['kind'][index] | (previous[1] if previous else 0))
+        kept = sorted(buckets.values())
+
+        directory = self._partition_path(world, day)
+        tmp_directory = directory + '.tmp'
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+        os.makedirs(tmp_directory)
+        for name, typecode in COLUMNS:
+            if name == 'kind':
+                values = array(typecode, (kind for _, kind in kept))
+            else:
+                column = columns[name]
+                values = array(typecode, (column[index] for index, _ in kept))
+            with open(os.path.join(tmp_directory, f'{name}.bin'), 'wb') as f:
+                values.tofile(f)
+        open(os.path.join(tmp_directory, DOWNSAMPLED_MARKER), 'w').close()
+        del columns
+        # Troca a partição inteira para nunca misturar colunas antigas e novas
+        old_directory = directory + '.old'
+        shutil.rmtree(old_directory, ignore_errors=True)
+        os.replace(directory, old_directory)
+        os.replace(tmp_directory, directory)
+        shutil.rmtree(old_directory, ignore_errors=True)
+        return rows, len(kept)
+
+    # Termina ou desfaz as trocas interrompidas por um crash: sem a partição, a
+    # versão reduzida completa (com o marcador) entra no lugar, senão volta a
+    # original; as sobras .tmp e .old são apagadas
+    def _recover(self, world):
+        directory_names = os.listdir(os.path.join(self.root, world))
+        leftovers = {name[:-len(suffix)] for name in directory_names for suffix in SWAP_SUFFIXES if name.endswith(suffix)}
+        for day in leftovers:
+            directory = self._partition_path(world, day)
+            tmp_directory, old_directory = directory + '.tmp', directory + '.old'
+            if not os.path.exists(directory):
+                if os.path.exists(os.path.join(tmp_directory, DOWNSAMPLED_MARKER)):
+                    os.replace(tmp_directory, directory)
+                elif os.path.exists(old_directory):
+                    os.replace(old_directory, directory)
+                log.warning("histórico mundo=%s dia=%s recuperado de uma compactação interrompida", world, day)
+            shutil.rmtree(tmp_directory, ignore_errors=True)
+            shutil.rmtree(old_directory, ignore_errors=True)
+
+    # Apaga as partições fora da retenção e reduz as antigas. Roda fora do event loop.
+    def compact(self, now=None):
+        now = self._clock() if now is None else now
+        expire_before = day_of(now - self.retention_days * 86400)
+        downsample_before = day_of(now - self.downsample_after_days * 86400)
+        removed = downsampled = 0
+        for world in self.worlds():
+            self._recover(world)
+            for day in self.days(world):
+                directory = self._partition_path(world, day)
+                if day < expire_before:
+                    shutil.rmtree(directory, ignore_errors=True)
+                    removed += 1
+                elif day < downsample_before and not os.path.exists(os.path.join(directory, DOWNSAMPLED_MARKER)):
+                    before, after = self._downsample(world, day)
+                    downsampled += 1
+                    log.info("histórico mundo=%s dia=%s reduzido de %d para %d registros", world, day, before, after)
+        return removed, downsampled
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+            # Uma compactação por dia
+            today = day_of(self._clock())
+            if self._last_compaction != today:
+                self._last_compaction = today
+                try:
+                    await asyncio.to_thread(self.compact)
+                except OSError as e:
+                    log.error("erro ao compactar o histórico: %s", e)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def stats(self):
+        return {
+            'rows': self.rows,
+            'flushes': self.flushes,
+            'pending': sum(len(rows) for rows in self._pending.values()),
+        }
@@ -0,0 +1,64 @@
+# Limites do Discord usados para empacotar as casas em poucas mensagens
+EMBED_MAX_FIELDS = 25
+EMBED_MAX_CHARS = 6000
+MESSAGE_MAX_EMBEDS = 10
+MESSAGE_MAX_CHARS = 6000
+SELECT_MAX_OPTIONS = 25
+MESSAGE_MAX_SELECTS = 5
+
+
+# Empacota seções em páginas (mensagens). Cada seção é (embed_modelo, campos),
+# com campos no formato (nome, valor, item). O embed modelo dá título, cor e
+# descrição; quando os campos não cabem, a seção continua em outro embed com
+# "(cont.)" no título. Cada página respeita 25 campos por embed, 10 embeds e
+# 6000 caracteres por mensagem, e no máximo `max_items` itens (um por opção
+# dos menus de seleção). Retorna uma lista de (embeds, itens).
+def pack_sections(sections, max_items=SELECT_MAX_OPTIONS * MESSAGE_MAX_SELECTS):
+    pages = []
+    page_embeds = []
+    page_items = []
+    page_chars = 0
+
+    def close_page():
+        nonlocal page_embeds, page_items, page_chars
+        if page_embeds:
+            pages.append((page_embeds, page_items))
+        page_embeds, page_items, page_chars = [], [], 0
+
+    # Abre um embed na página atual, ou numa nova se ele e o primeiro campo
+    # (`reserve` caracteres) não couberem, para nunca sobrar embed vazio no fim
+    def open_embed(template, continued, reserve=0):
+        nonlocal page_chars
+        embed = template.copy()
+        embed.clear_fields()
+        if continued and embed.title:
+            embed.title = f"{embed.title} (cont.)"
+        if len(page_embeds) >= MESSAGE_MAX_EMBEDS or page_chars + len(embed) + reserve > MESSAGE_MAX_CHARS:
+            close_page()
+        page_embeds.append(embed)
+        page_chars += len(embed)
+        return embed
+
+    for template, fields in sections:
+        first_chars = len(fields[0][0]) + len(fields[0][1]) if fields else 0
+        embed = open_embed(template, continued=False, reserve=first_chars)
+        for name, value, item in fields:
+            field_chars = len(name) + len(value)
+            if item is not None and len(page_items) >= max_items:
+                close_page()
+                embed = open_embed(template, continued=True, reserve=field_chars)
+            elif len(embed.fields) >= EMBED_MAX_FIELDS or page_chars + field_chars > MESSAGE_MAX_CHARS:
+                embed = open_embed(template, continued=True, reserve=field_chars)
+
+            embed.add_field(name=name, value=value, inline=False)
+            page_chars += field_chars
+            if item is not None:
+                page_items.append(item)
+
+    close_page()
+    return pages
+
+
+# Divide uma lista em pedaços de até `size` elementos (ex.: opções por menu de seleção)
+def chunked(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
@@ -0,0 +1,199 @@
+import bisect
+import logging
+import time
+from contextlib import contextmanager
+
+from aiohttp import web
+
+log = logging.getLogger(__name__)
+
+# Limites (em segundos) dos buckets dos histogramas de latência
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+def _label_text(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(
+        f'{name}="' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for name, value in zip(names, values)
+    )
+    return '{' + pairs + '}'
+
+
+# Contador monotônico, opcionalmente com labels (ex.: op="send")
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def total(self):
+        return sum(self.values.values())
+
+    def samples(self):
+        return [(self.name, key, value) for key, value in sorted(self.values.items())]
+
+
+# Valor lido na hora da coleta (ex.: tamanho de uma fila)
+class Gauge:
+    kind = 'gauge'
+
+    def __init__(self, name, help, read):
+        self.name = name
+        self.help = help
+        self.labels = ()
+        self._read = read
+
+    def value(self):
+        try:
+            return float(self._read())
+        except Exception:
+            return float('nan')
+
+    def samples(self):
+        return [(self.name, (), self.value())]
+
+
+# Histograma de buckets fixos: observe() custa uma busca binária e dois incrementos
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = ()
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    # Estimativa do quantil por interpolação dentro do bucket (None sem amostras)
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                if index == len(self.buckets):
+                    return lower
+                return lower + (self.buckets[index] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def samples(self):
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            samples.append((f'{self.name}_bucket', (('le', repr(bound)),), cumulative))
+        samples.append((f'{self.name}_bucket', (('le', '+Inf'),), self.count))
+        samples.append((f'{self.name}_sum', (), self.sum))
+        samples.append((f'{self.name}_count', (), self.count))
+        return samples
+
+
+# Conjunto de métricas do processo. Registrar de novo um nome devolve a métrica
+# já existente, então cada módulo pode declarar as suas na importação.
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name, help, buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help, buckets))
+
+    # Gauges são trocados ao registrar de novo (a função de leitura pode mudar)
+    def gauge(self, name, help, read):
+        metric = self._metrics[name] = Gauge(name, help, read)
+        return metric
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def __iter__(self):
+        return iter(list(self._metrics.values()))
+
+    # Formato de texto do Prometheus (exposition format 0.0.4)
+    def render_prometheus(self):
+        lines = []
+        for metric in self:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, key, value in metric.samples():
+                if metric.kind == 'histogram':
+                    labels = _label_text([k for k, _ in key], [v for _, v in key])
+                else:
+                    labels = _label_text(metric.labels, key)
+                lines.append(f'{name}{labels} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+# Registro padrão usado pelos módulos do bot
+registry = MetricsRegistry()
+
+
+# Servidor HTTP local que expõe /metrics para o Prometheus
+class MetricsServer:
+    def __init__(self, registry, host='127.0.0.1', port=9108):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._runner = None
+
+    async def _handle(self, request):
+        return web.Response(body=self.registry.render_prometheus().encode(),
+                            headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
+
+    async def start(self):
+        if self._runner is not None:
+            return
+        app = web.Application()
+        app.router.add_get('/metrics', self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        try:
+            await site.start()
+        except OSError as e:
+            log.error("não foi possível abrir o endpoint de métricas em %s:%s: %s", self.host, self.port, e)
+            await self._runner.cleanup()
+            self._runner = None
+            return
+        log.info("métricas em http://%s:%s/metrics", self.host, self.port)
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
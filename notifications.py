@@ -0,0 +1,150 @@
+import asyncio
+import logging
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+
+# Índice reverso das notificações: chave da casa -> ids dos usuários inscritos.
+# Evita varrer todos os usuários para cada casa renderizada.
+class SubscriptionIndex:
+    def __init__(self):
+        self._subscribers = {}
+
+    @classmethod
+    def from_user_notifications(cls, user_notifications):
+        index = cls()
+        for user_id, user_data in user_notifications.items():
+            for house_key in user_data.get("notifications", []):
+                index.add(user_id, house_key)
+        return index
+
+    def add(self, user_id, house_key):
+        self._subscribers.setdefault(house_key, set()).add(user_id)
+
+    def remove(self, user_id, house_key):
+        subscribers = self._subscribers.get(house_key)
+        if subscribers is None:
+            return
+        subscribers.discard(user_id)
+        if not subscribers:
+            del self._subscribers[house_key]
+
+    def remove_user(self, user_id, house_keys):
+        for house_key in house_keys:
+            self.remove(user_id, house_key)
+
+    def subscribers(self, house_key):
+        return self._subscribers.get(house_key, frozenset())
+
+    def house_keys(self):
+        return self._subscribers.keys()
+
+    def __contains__(self, house_key):
+        return house_key in self._subscribers
+
+    def __len__(self):
+        return len(self._subscribers)
+
+
+# Cache LRU simples (ex.: usuários buscados via REST)
+class LRUCache:
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def get(self, key):
+        value = self._data.get(key)
+        if value is not None:
+            self._data.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+# Atraso padrão entre tentativas: backoff exponencial (1s, 2s, 4s...)
+def exponential_backoff(exc, attempt, base=1.0):
+    return base * 2 ** attempt
+
+
+# Agrupa as mudanças de um ciclo por usuário e entrega um único resumo para cada
+# um (só a mudança mais recente de cada chave, ex.: casa), por uma fila
+# limitada atendida por poucos workers, com novas tentativas quando
+# `retry_delay(exc, tentativa)` devolver um atraso (None = desistir)
+class DigestDispatcher:
+    def __init__(self, deliver, workers=4, max_queue=10000, max_attempts=5, retry_delay=exponential_backoff):
+        self._deliver = deliver
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self._retry_delay = retry_delay
+        self._pending = {}
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._tasks = []
+        self.delivered = 0
+        self.retries = 0
+        self.failed = 0
+
+    def add(self, user_id, key, item):
+        items = self._pending.setdefault(user_id, {})
+        # A mudança mais nova substitui a anterior e vai para o fim do resumo
+        items.pop(key, None)
+        items[key] = item
+
+    # Coloca na fila um resumo por usuário com tudo o que foi acumulado
+    async def flush(self):
+        pending, self._pending = self._pending, {}
+        for user_id, items in pending.items():
+            await self._queue.put((user_id, list(items.values())))
+
+    async def _send(self, user_id, items):
+        for attempt in range(self.max_attempts):
+            try:
+                await self._deliver(user_id, items)
+                self.delivered += 1
+                return
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None or attempt == self.max_attempts - 1:
+                    self.failed += 1
+                    log.warning("falha ao enviar notificação usuario=%s tentativas=%d: %s", user_id, attempt + 1, e)
+                    return
+                self.retries += 1
+                await asyncio.sleep(delay)
+
+    async def _worker(self):
+        while True:
+            user_id, items = await self._queue.get()
+            try:
+                await self._send(user_id, items)
+            finally:
+                self._queue.task_done()
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    # Espera a fila esvaziar (útil em testes e benchmarks)
+    async def join(self):
+        await self._queue.join()
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self):
+        return {
+            'delivered': self.delivered,
+            'retries': self.retries,
+            'failed': self.failed,
+            'queued': self._queue.qsize(),
+            'pending_users': len(self._pending),
+        }
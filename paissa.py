@@ -0,0 +1,486 @@
+import asyncio
+import bisect
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+
+import aiohttp
+
+from metrics import registry
+
+log = logging.getLogger(__name__)
+
+# URL base da API do PaissaDB (pode ser trocada para apontar para um servidor local de testes)
+PAISSA_BASE_URL = os.getenv('PAISSA_BASE_URL', 'https://paissadb.zhu.codes')
+
+# Websocket de eventos do PaissaDB (vazio desativa e o bot fica só no polling)
+PAISSA_WS_URL = os.getenv('PAISSA_WS_URL', 'wss://paissadb.zhu.codes/ws')
+
+# Arquivo onde gravar todas as respostas do PaissaDB para reproduzir depois (vazio desativa)
+PAISSA_RECORD_PATH = os.getenv('PAISSA_RECORD_PATH', '')
+
+# Caminho usado no log de respostas para as mensagens do websocket
+STREAM_PATH = "/ws"
+
+# Tipos de evento publicados no websocket
+PLOT_OPEN = "plot_open"
+PLOT_UPDATE = "plot_update"
+PLOT_SOLD = "plot_sold"
+
+FETCH_SECONDS = registry.histogram('paissa_fetch_seconds', 'Latência das requisições HTTP ao PaissaDB')
+FETCH_RESULTS = registry.counter('paissa_fetch_total', 'Respostas do PaissaDB por resultado', labels=('result',))
+STREAM_EVENTS = registry.counter('paissa_stream_events_total', 'Eventos recebidos pelo websocket do PaissaDB', labels=('type',))
+
+
+class PaissaError(Exception):
+    pass
+
+
+# Grava as respostas do PaissaDB (com o horário) em um log gzip só de acréscimo:
+# cada flush vira um novo membro gzip no fim do arquivo, então um crash perde no
+# máximo o último lote. A gravação acontece fora do event loop.
+class ResponseRecorder:
+    def __init__(self, path, interval=5.0, clock=time.time):
+        self.path = path
+        self.interval = interval
+        self._clock = clock
+        self._buffer = []
+        self._task = None
+        self.records = 0
+        self.bytes_written = 0
+
+    # body em bytes/str; None marca um 304 (nada mudou)
+    def record(self, path, body):
+        if isinstance(body, bytes):
+            body = body.decode('utf-8', errors='replace')
+        self._buffer.append({'t': self._clock(), 'path': path, 'body': body})
+
+    def _append(self, payload):
+        with gzip.open(self.path, 'ab') as f:
+            f.write(payload)
+
+    async def flush(self):
+        if not self._buffer:
+            return
+        batch, self._buffer = self._buffer, []
+        payload = ''.join(json.dumps(entry, separators=(',', ':')) + '\n' for entry in batch).encode('utf-8')
+        await asyncio.to_thread(self._append, payload)
+        self.records += len(batch)
+        self.bytes_written += len(payload)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except OSError as e:
+                log.error("erro ao gravar respostas em %s: %s", self.path, e)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def stats(self):
+        return {'records': self.records, 'buffered': len(self._buffer), 'bytes_written': self.bytes_written}
+
+
+# Lê um log gravado pelo ResponseRecorder como (horário, caminho, corpo), na
+# ordem de gravação. Um último lote cortado no meio (crash) é ignorado.
+def read_response_log(path):
+    entries = []
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    entries.append((entry['t'], entry['path'], entry['body']))
+    except (EOFError, gzip.BadGzipFile, ValueError) as e:
+        log.warning("log de respostas %s truncado depois de %d registros: %s", path, len(entries), e)
+    return entries
+
+
+# Cliente assíncrono do PaissaDB com uma sessão HTTP compartilhada (keep-alive),
+# timeouts de conexão/leitura e limite de requisições simultâneas
+class PaissaClient:
+    def __init__(self, base_url=PAISSA_BASE_URL, max_concurrency=4,
+                 connect_timeout=5, read_timeout=20, recorder=None):
+        self.base_url = base_url.rstrip('/')
+        self.recorder = recorder
+        self.max_concurrency = max_concurrency
+        self.timeout = aiohttp.ClientTimeout(
+            total=connect_timeout + read_timeout,
+            sock_connect=connect_timeout,
+            sock_read=read_timeout
+        )
+        self._session = None
+        self._semaphore = None
+        # Validadores da última resposta de cada caminho (ETag, Last-Modified e hash do corpo)
+        self._validators = {}
+        self.not_modified = 0
+        self.unchanged = 0
+        self.changed = 0
+
+    # A sessão é criada sob demanda para ficar presa ao event loop que está rodando
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_concurrency,
+                keepalive_timeout=60,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self.timeout,
+                headers={'User-Agent': 'FFXIV-Housing-Bot'}
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    # JSON de um caminho da API, ou None se a resposta não mudou desde a última
+    # chamada: usa ETag/If-Modified-Since quando o servidor suporta e, se não,
+    # compara o hash do corpo bruto antes de decodificar o JSON
+    async def get_json_if_changed(self, path):
+        session = self._get_session()
+        url = f"{self.base_url}{path}"
+        validators = self._validators.get(path, {})
+        headers = {}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+
+        async with self._semaphore:
+            start = time.perf_counter()
+            try:
+                async with session.get(url, headers=headers) as response:
+                    if response.status == 304:
+                        self.not_modified += 1
+                        FETCH_RESULTS.inc(result='not_modified')
+                        if self.recorder is not None:
+                            self.recorder.record(path, None)
+                        return None
+                    response.raise_for_status()
+                    body = await response.read()
+                    etag = response.headers.get('ETag')
+                    last_modified = response.headers.get('Last-Modified')
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                FETCH_RESULTS.inc(result='error')
+                raise PaissaError(f"Erro na requisição para {url}: {e!r}") from e
+            finally:
+                FETCH_SECONDS.observe(time.perf_counter() - start)
+
+        if self.recorder is not None:
+            self.recorder.record(path, body)
+        digest = hashlib.blake2b(body, digest_size=16).digest()
+        self._validators[path] = {'etag': etag, 'last_modified': last_modified, 'hash': digest}
+        if validators.get('hash') == digest:
+            self.unchanged += 1
+            FETCH_RESULTS.inc(result='unchanged')
+            return None
+        self.changed += 1
+        FETCH_RESULTS.inc(result='changed')
+        try:
+            return json.loads(body)
+        except ValueError as e:
+            del self._validators[path]
+            raise PaissaError(f"Resposta inválida de {url}: {e}") from e
+
+    # Busca os dados brutos de um mundo. Com if_changed=True, devolve None
+    # quando nada mudou desde a última busca
+    async def get_world(self, world_id, if_changed=False):
+        path = f"/worlds/{world_id}"
+        if not if_changed:
+            # Busca completa, mas já guarda os validadores para a próxima
+            self._validators.pop(path, None)
+        return await self.get_json_if_changed(path)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def stats(self):
+        return {
+            'not_modified': self.not_modified,
+            'unchanged': self.unchanged,
+            'changed': self.changed,
+        }
+
+
+# Substitui o PaissaClient lendo um log gravado em vez da rede: cada caminho
+# responde com a última resposta gravada até o horário virtual `clock()`. Por
+# padrão o horário começa no primeiro registro e anda `speed` vezes mais rápido
+# que o relógio real; quem dirige a reprodução pode passar o próprio relógio.
+class ReplayPaissaClient:
+    def __init__(self, entries, speed=1.0, clock=None):
+        self._times = {}
+        self._bodies = {}
+        for at, path, body in sorted(entries, key=lambda entry: entry[0]):
+            if path == STREAM_PATH:
+                continue
+            if body is None:
+                # 304 gravado: a resposta continua igual à anterior
+                if path not in self._bodies:
+                    continue
+                body = self._bodies[path][-1]
+            self._times.setdefault(path, []).append(at)
+            self._bodies.setdefault(path, []).append(body)
+        self.origin = min((times[0] for times in self._times.values()), default=0.0)
+        self.end = max((times[-1] for times in self._times.values()), default=0.0)
+        self.speed = speed
+        self._clock = clock
+        self._started = None
+        self._served = {}
+        self.not_modified = 0
+        self.unchanged = 0
+        self.changed = 0
+
+    def now(self):
+        if self._clock is not None:
+            return self._clock()
+        if self._started is None:
+            self._started = time.monotonic()
+        return self.origin + (time.monotonic() - self._started) * self.speed
+
+    def _body(self, path):
+        times = self._times.get(path)
+        if not times:
+            FETCH_RESULTS.inc(result='error')
+            raise PaissaError(f"Nenhuma resposta gravada para {path}")
+        index = max(0, bisect.bisect_right(times, self.now()) - 1)
+        return self._bodies[path][index]
+
+    async def get_json_if_changed(self, path):
+        body = self._body(path)
+        if self._served.get(path) == body:
+            self.unchanged += 1
+            FETCH_RESULTS.inc(result='unchanged')
+            return None
+        self._served[path] = body
+        self.changed += 1
+        FETCH_RESULTS.inc(result='changed')
+        return json.loads(body)
+
+    async def get_world(self, world_id, if_changed=False):
+        path = f"/worlds/{world_id}"
+        if not if_changed:
+            self._served.pop(path, None)
+        return await self.get_json_if_changed(path)
+
+    async def close(self):
+        pass
+
+    def stats(self):
+        return {
+            'not_modified': self.not_modified,
+            'unchanged': self.unchanged,
+            'changed': self.changed,
+        }
+
+
+# Cache de snapshots por mundo com TTL. Chamadas simultâneas para o mesmo
+# mundo compartilham a mesma busca em andamento, então cada mundo é baixado
+# no máximo uma vez por TTL, não importa quantos canais o monitoram.
+class WorldSnapshotCache:
+    def __init__(self, loader, ttl=300, clock=time.monotonic):
+        self._loader = loader
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = {}
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    async def get(self, world_id):
+        entry = self._entries.get(world_id)
+        if entry is not None and entry[0] is not None and entry[0] > self._clock():
+            self.hits += 1
+            return entry[1]
+
+        task = self._inflight.get(world_id)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(self._load(world_id))
+            self._inflight[world_id] = task
+        # shield: se quem chamou for cancelado, a busca compartilhada continua
+        return await asyncio.shield(task)
+
+    # Snapshot guardado de um mundo, mesmo expirado (None se nunca foi carregado).
+    # Com include_invalidated=False, ignora os que foram invalidados.
+    def peek(self, world_id, include_invalidated=True):
+        entry = self._entries.get(world_id)
+        if entry is None or (entry[0] is None and not include_invalidated):
+            return None
+        return entry[1]
+
+    # Substitui o snapshot de um mundo (ex.: depois de aplicar um evento do websocket)
+    def put(self, world_id, snapshot):
+        self._entries[world_id] = (self._clock() + self.ttl, snapshot)
+
+    def world_ids(self):
+        return list(self._entries)
+
+    async def _load(self, world_id):
+        try:
+            snapshot = await self._loader(world_id)
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self._inflight.pop(world_id, None)
+        self._entries[world_id] = (self._clock() + self.ttl, snapshot)
+        return snapshot
+
+    # Força uma nova busca no próximo get; o snapshot antigo continua disponível
+    # em peek, para a busca condicional reaproveitá-lo se nada tiver mudado
+    def invalidate(self, world_id=None):
+        world_ids = list(self._entries) if world_id is None else [world_id]
+        for key in world_ids:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (None, entry[1])
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'errors': self.errors,
+            'cached_worlds': len(self._entries),
+        }
+
+
+def _consume_exception(task):
+    if not task.cancelled():
+        task.exception()
+
+
+# Espera as chamadas ({chave: awaitable}) por até `budget` segundos e devolve
+# (resultados, atrasadas, falhas). As atrasadas não são canceladas: continuam
+# em segundo plano e, no cache de mundos, ficam prontas para a próxima consulta.
+async def gather_within(calls, budget):
+    tasks = {asyncio.ensure_future(call): key for key, call in calls.items()}
+    if not tasks:
+        return {}, [], []
+    done, pending = await asyncio.wait(tasks, timeout=budget)
+
+    results, failed = {}, []
+    for task in done:
+        if task.exception() is not None:
+            failed.append(tasks[task])
+        else:
+            results[tasks[task]] = task.result()
+    for task in pending:
+        task.add_done_callback(_consume_exception)
+    return results, [tasks[task] for task in pending], failed
+
+
+# Assina o websocket do PaissaDB e repassa cada evento de casa para
+# `on_event(tipo, dados)`. Reconecta sozinho com backoff exponencial. O PaissaDB
+# não reenvia o que foi publicado enquanto a conexão estava caída, então a cada
+# (re)conexão `on_connect()` é chamado para ressincronizar os snapshots antes de
+# voltar a aplicar os eventos. Enquanto `connected` for False, vale o polling.
+class PaissaStream:
+    def __init__(self, url, on_event, on_connect=None, heartbeat=30, max_backoff=60, recorder=None):
+        self.url = url
+        self.recorder = recorder
+        self._on_event = on_event
+        self._on_connect = on_connect
+        self.heartbeat = heartbeat
+        self.max_backoff = max_backoff
+        self.connected = False
+        self.connections = 0
+        self.disconnects = 0
+        self.events = 0
+        self.errors = 0
+        self.last_event_at = None
+        self._session = None
+        self._task = None
+
+    async def _dispatch(self, raw):
+        try:
+            message = json.loads(raw)
+        except ValueError:
+            self.errors += 1
+            return
+        if not isinstance(message, dict) or message.get('type') not in (PLOT_OPEN, PLOT_UPDATE, PLOT_SOLD):
+            return
+
+        self.events += 1
+        self.last_event_at = time.time()
+        STREAM_EVENTS.inc(type=message['type'])
+        if self.recorder is not None:
+            self.recorder.record(STREAM_PATH, raw)
+        try:
+            await self._on_event(message['type'], message.get('data') or {})
+        except Exception:
+            self.errors += 1
+            log.exception("erro ao aplicar evento do PaissaDB tipo=%s", message['type'])
+
+    async def _listen(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(headers={'User-Agent': 'FFXIV-Housing-Bot'})
+        async with self._session.ws_connect(self.url, heartbeat=self.heartbeat) as ws:
+            self.connected = True
+            self.connections += 1
+            if self._on_connect is not None:
+                await self._on_connect()
+            async for message in ws:
+                if message.type == aiohttp.WSMsgType.TEXT:
+                    await self._dispatch(message.data)
+                elif message.type == aiohttp.WSMsgType.ERROR:
+                    break
+
+    async def _run(self):
+        backoff = 1
+        while True:
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning("websocket do PaissaDB caiu: %r (nova tentativa em %ss)", e, backoff)
+            finally:
+                if self.connected:
+                    self.connected = False
+                    self.disconnects += 1
+                    backoff = 1
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def stats(self):
+        return {
+            'connected': self.connected,
+            'connections': self.connections,
+            'disconnects': self.disconnects,
+            'events': self.events,
+            'errors': self.errors,
+            'last_event_at': self.last_event_at,
+        }
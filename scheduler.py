@@ -0,0 +1,297 @@
+import asyncio
+import heapq
+import logging
+import time
+
+log = logging.getLogger(__name__)
+
+
+# Token bucket por chave (ex.: id do canal), usado para respeitar os limites do
+# Discord por rota/bucket em vez de dormir um tempo fixo entre canais
+class KeyedRateLimiter:
+    def __init__(self, rate, per, clock=time.monotonic):
+        self.rate = rate
+        self.per = per
+        self._clock = clock
+        self._buckets = {}
+        self._locks = {}
+        self.waits = 0
+
+    async def acquire(self, key=None):
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+
+        # O lock mantém a ordem de chegada dentro de cada bucket
+        async with lock:
+            while True:
+                now = self._clock()
+                tokens, last = self._buckets.get(key, (self.rate, now))
+                tokens = min(self.rate, tokens + (now - last) * self.rate / self.per)
+                if tokens >= 1:
+                    self._buckets[key] = (tokens - 1, now)
+                    return
+                self._buckets[key] = (tokens, now)
+                self.waits += 1
+                await asyncio.sleep((1 - tokens) * self.per / self.rate)
+
+
+# Executa as atualizações de canal de um ciclo com um número fixo de workers
+# e guarda a duração e o atraso de cada ciclo
+class ChannelUpdateScheduler:
+    def __init__(self, interval, workers=8, clock=time.monotonic):
+        self.interval = interval
+        self.workers = workers
+        self._clock = clock
+        self._next_expected_start = None
+        self.last_cycle = None
+        self.overruns = 0
+
+    async def run_cycle(self, jobs, handler):
+        start = self._clock()
+        lag = 0.0
+        if self._next_expected_start is not None:
+            lag = max(0.0, start - self._next_expected_start)
+        self._next_expected_start = start + self.interval
+
+        queue = asyncio.Queue()
+        for job in jobs:
+            queue.put_nowait(job)
+        failures = 0
+
+        async def worker():
+            nonlocal failures
+            while True:
+                try:
+                    job = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                # O handler registra os próprios erros; aqui só contamos as falhas
+                try:
+                    await handler(*job)
+                except Exception:
+                    failures += 1
+
+        await asyncio.gather(*(worker() for _ in range(min(self.workers, len(jobs)) or 1)))
+
+        duration = self._clock() - start
+        if duration > self.interval:
+            self.overruns += 1
+            log.warning("ciclo de atualização levou %.0fs, mais que o intervalo de %.0fs", duration, self.interval)
+
+        self.last_cycle = {
+            'started_at': time.time() - duration,
+            'duration': duration,
+            'lag': lag,
+            'jobs': len(jobs),
+            'failures': failures,
+        }
+        return self.last_cycle
+
+
+# Quanto esperar até a próxima busca de um mundo, a partir do lotto_phase_until
+# das casas abertas. Logo depois de uma virada de fase (até `settle` segundos,
+# enquanto o PaissaDB ainda recebe os dados novos dos jogadores) busca a cada
+# `fast`; se há uma virada antes de `slow`, acorda exatamente nela; no meio de
+# uma fase, espera `slow`.
+def phase_aware_delay(houses, now, fast=120, slow=1800, settle=1800):
+    upcoming = None
+    for house in houses:
+        until = house.get('lotto_phase_until')
+        if not until:
+            continue
+        if now - settle <= until <= now:
+            return fast
+        if until > now and (upcoming is None or until < upcoming):
+            upcoming = until
+    if upcoming is not None and upcoming - now < slow:
+        return max(upcoming - now, 1)
+    return slow
+
+
+# Fila de prioridade com o próximo horário interessante de cada mundo. Só os
+# mundos devolvidos por `watched()` são buscados; `poll(mundo)` faz a busca e
+# devolve quantos segundos esperar até a próxima. A lista de mundos monitorados
+# é conferida pelo menos a cada `idle` segundos. `after_batch()` roda depois de
+# cada lote de mundos buscados juntos (ex.: todos os que viraram de fase).
+class AdaptivePollScheduler:
+    def __init__(self, poll, watched, idle=60, after_batch=None, clock=time.time, sleep=asyncio.sleep):
+        self._poll = poll
+        self._watched = watched
+        self._after_batch = after_batch
+        self.idle = idle
+        self._clock = clock
+        self._sleep = sleep
+        self._heap = []
+        self._due = {}
+        self._task = None
+        self.polls = 0
+        self.failures = 0
+
+    def _schedule(self, world, at):
+        self._due[world] = at
+        heapq.heappush(self._heap, (at, world))
+
+    def _sync(self, now):
+        watched = set(self._watched())
+        for world in watched - self._due.keys():
+            self._schedule(world, now)
+        # Mundos que deixaram de ser monitorados saem do heap quando forem retirados
+        for world in self._due.keys() - watched:
+            del self._due[world]
+
+    def _pop_due(self, now):
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            at, world = heapq.heappop(self._heap)
+            if self._due.get(world) == at:
+                due.append(world)
+        return due
+
+    async def _poll_world(self, world):
+        try:
+            delay = await self._poll(world)
+        except Exception as e:
+            self.failures += 1
+            log.warning("erro ao buscar mundo=%s: %s", world, e)
+            delay = self.idle
+        self.polls += 1
+        if world in self._due:
+            self._schedule(world, self._clock() + delay)
+
+    async def run_once(self):
+        now = self._clock()
+        self._sync(now)
+        due = self._pop_due(now)
+        if due:
+            await asyncio.gather(*(self._poll_world(world) for world in due))
+            if self._after_batch is not None:
+                await self._after_batch()
+            return
+        wait = self.idle
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        if self._heap:
+            wait = min(wait, self._heap[0][0] - now)
+        await self._sleep(max(wait, 0))
+
+    async def _run(self):
+        while True:
+            await self.run_once()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    # Próxima busca agendada de cada mundo monitorado
+    def schedule(self):
+        return dict(self._due)
+
+    def stats(self):
+        return {
+            'polls': self.polls,
+            'failures': self.failures,
+            'worlds': len(self._due),
+        }
+
+
+# Expiração central de mensagens temporárias: um heap de (prazo, canal,
+# mensagem) atendido por uma única task, que dorme até o próximo prazo e chama
+# `expire(entradas)` com todas as que vencem dentro de `grace` segundos, para
+# apagar em lote. Com `store`, as pendências são gravadas e, depois de reiniciar,
+# `restore` as recoloca no heap (as já vencidas são apagadas em seguida). Com
+# `wait_ready`, a task espera essa corrotina antes do primeiro lote (ex.: o bot
+# conectar e ter os canais em cache). Se `expire` falhar, o lote volta para o
+# heap `retry_delay` segundos depois e só sai do store quando for atendido.
+class ExpiryScheduler:
+    def __init__(self, expire, store=None, grace=1.0, retry_delay=60.0, wait_ready=None, clock=time.time):
+        self._expire = expire
+        self._store = store
+        self.grace = grace
+        self.retry_delay = retry_delay
+        self._wait_ready = wait_ready
+        self._clock = clock
+        self._heap = []
+        self._wake = None
+        self._task = None
+        self.expired = 0
+        self.batches = 0
+        self.retries = 0
+
+    def schedule(self, channel_id, message_id, deadline):
+        heapq.heappush(self._heap, (deadline, channel_id, message_id))
+        if self._store is not None:
+            self._store.add_pending_deletion(channel_id, message_id, deadline)
+        if self._wake is not None:
+            self._wake.set()
+
+    def restore(self, entries):
+        for entry in entries:
+            heapq.heappush(self._heap, tuple(entry))
+        if self._wake is not None:
+            self._wake.set()
+
+    def _pop_due(self, now):
+        due = []
+        while self._heap and self._heap[0][0] <= now + self.grace:
+            _, channel_id, message_id = heapq.heappop(self._heap)
+            due.append((channel_id, message_id))
+        return due
+
+    async def _run(self):
+        if self._wait_ready is not None:
+            await self._wait_ready()
+        while True:
+            now = self._clock()
+            due = self._pop_due(now)
+            if due:
+                try:
+                    await self._expire(due)
+                except Exception:
+                    log.exception("erro ao apagar %d mensagens expiradas, nova tentativa em %.0fs",
+                                  len(due), self.retry_delay)
+                    for channel_id, message_id in due:
+                        heapq.heappush(self._heap, (now + self.retry_delay, channel_id, message_id))
+                    self.retries += 1
+                    continue
+                if self._store is not None:
+                    for channel_id, message_id in due:
+                        self._store.remove_pending_deletion(channel_id, message_id)
+                self.expired += len(due)
+                self.batches += 1
+                continue
+
+            timeout = self._heap[0][0] - now if self._heap else None
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self):
+        return {
+            'pending': len(self._heap),
+            'expired': self.expired,
+            'batches': self.batches,
+            'retries': self.retries,
+        }
+
+    def __len__(self):
+        return len(self._heap)
@@ -0,0 +1,165 @@
+# Mapeamento de IDs dos distritos para nomes
+DISTRICT_IDS = {
+    339: "Mist",
+    340: "The Lavender Beds",
+    341: "The Goblet",
+    641: "Shirogane",
+    979: "Empyreum"
+}
+
+# Mapeamento de tamanhos
+SIZE_NAMES = {
+    0: "Small",
+    1: "Medium",
+    2: "Large"
+}
+
+SIZE_CODES = {name.lower(): code for code, name in SIZE_NAMES.items()}
+
+# purchase_system das casas vendidas por loteria
+LOTTERY = 7
+
+
+# Casa aberta de um mundo. Guarda distrito e tamanho como códigos inteiros e
+# ocupa bem menos memória que um dict; os nomes saem das tabelas acima. Aceita
+# house['campo'] e house.get('campo') como os dicts usados antes.
+class Plot:
+    __slots__ = ('district_id', 'ward', 'plot', 'size_code', 'price', 'lotto_entries',
+                 'purchase_system', 'lotto_phase', 'lotto_phase_until')
+
+    def __init__(self, district_id, ward, plot, size_code, price, lotto_entries,
+                 purchase_system, lotto_phase, lotto_phase_until):
+        self.district_id = district_id
+        self.ward = ward
+        self.plot = plot
+        self.size_code = size_code
+        self.price = price
+        self.lotto_entries = lotto_entries
+        self.purchase_system = purchase_system
+        self.lotto_phase = lotto_phase
+        self.lotto_phase_until = lotto_phase_until
+
+    # Converte um plot do PaissaDB (da lista do mundo ou de um evento do websocket)
+    @classmethod
+    def from_paissa(cls, district_id, data):
+        return cls(
+            district_id,
+            data.get('ward_number', 0) + 1,  # Adiciona 1 ao ward
+            data.get('plot_number', 0) + 1,  # Adiciona 1 ao plot
+            data.get('size', 0),
+            data.get('price', 0),
+            data.get('lotto_entries'),
+            data.get('purchase_system', 0),
+            data.get('lotto_phase'),
+            data.get('lotto_phase_until'),
+        )
+
+    # Cópia da casa com os campos de um evento plot_update do websocket, que só
+    # traz os dados da loteria; o que não vier no evento fica como no snapshot
+    def with_update(self, data):
+        return Plot(
+            self.district_id,
+            self.ward,
+            self.plot,
+            data['size'] if 'size' in data else self.size_code,
+            data['price'] if 'price' in data else self.price,
+            data['lotto_entries'] if 'lotto_entries' in data else self.lotto_entries,
+            data['purchase_system'] if 'purchase_system' in data else self.purchase_system,
+            data['lotto_phase'] if 'lotto_phase' in data else self.lotto_phase,
+            data['lotto_phase_until'] if 'lotto_phase_until' in data else self.lotto_phase_until,
+        )
+
+    @property
+    def district(self):
+        return DISTRICT_IDS.get(self.district_id, "Unknown")
+
+    @property
+    def size(self):
+        return SIZE_NAMES.get(self.size_code, "Unknown")
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def __repr__(self):
+        return f"Plot({self.district} W{self.ward} P{self.plot} {self.size})"
+
+
+# Snapshot de um mundo: as casas já ordenadas por tamanho e preço e índices
+# prontos para cada combinação de distrito, tamanho e "só loteria", de modo que
+# qualquer filtro vira uma consulta a um dict. Imutável: uma mudança gera outro.
+class WorldSnapshot:
+    __slots__ = ('plots', '_index')
+
+    def __init__(self, plots):
+        self.plots = tuple(sorted(plots, key=lambda p: (p.size_code, p.price)))
+        index = {}
+        for plot in self.plots:
+            lottery = plot.purchase_system == LOTTERY
+            for district_id in (None, plot.district_id):
+                for size_code in (None, plot.size_code):
+                    index.setdefault((district_id, size_code, False), []).append(plot)
+                    if lottery:
+                        index.setdefault((district_id, size_code, True), []).append(plot)
+        self._index = {key: tuple(plots) for key, plots in index.items()}
+
+    @classmethod
+    def from_paissa(cls, data):
+        return cls(
+            Plot.from_paissa(district_data.get('id'), plot)
+            for district_data in data.get('districts', [])
+            for plot in district_data.get('open_plots', [])
+        )
+
+    # Casas com os filtros dados (None = qualquer), na ordem de tamanho e preço
+    def query(self, district_id=None, size_code=None, lottery=False):
+        return self._index.get((district_id, size_code, lottery), ())
+
+    # Grupos (distrito, casas) não vazios, na ordem de DISTRICT_IDS
+    def by_district(self, district_ids=None, size_code=None, lottery=False):
+        groups = []
+        for district_id in DISTRICT_IDS if district_ids is None else district_ids:
+            plots = self.query(district_id, size_code, lottery)
+            if plots:
+                groups.append((DISTRICT_IDS[district_id], plots))
+        return groups
+
+    def __iter__(self):
+        return iter(self.plots)
+
+    def __len__(self):
+        return len(self.plots)
+
+
+# Distritos cujo nome contém o texto dado (ex.: "lavender" -> The Lavender Beds)
+def match_districts(text):
+    text = text.lower()
+    return [district_id for district_id, name in DISTRICT_IDS.items() if text in name.lower()]
+
+
+# Quantidade de casas de cada tamanho, na ordem Small, Medium, Large
+def size_counts(plots):
+    counts = dict.fromkeys(SIZE_NAMES, 0)
+    for plot in plots:
+        counts[plot.size_code] = counts.get(plot.size_code, 0) + 1
+    return {SIZE_NAMES.get(code, "Unknown"): count for code, count in counts.items()}
+
+
+# Critérios para ordenar casas de vários mundos juntas (maior primeiro, mais
+# barata primeiro, menos inscrições primeiro)
+RANKINGS = {
+    'tamanho': lambda plot: (-plot.size_code, plot.price),
+    'preco': lambda plot: (plot.price, -plot.size_code),
+    'inscricoes': lambda plot: (plot.lotto_entries if plot.lotto_entries is not None else float('inf'), plot.price),
+}
+
+
+# Ordena pares (mundo, casa) pelo critério escolhido
+def rank_plots(entries, order='tamanho'):
+    key = RANKINGS[order]
+    return sorted(entries, key=lambda entry: key(entry[1]))
@@ -0,0 +1,285 @@
+import asyncio
+import json
+import logging
+import sqlite3
+
+log = logging.getLogger(__name__)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS guilds (
+    guild_id TEXT PRIMARY KEY,
+    guild_name TEXT
+);
+-- "world" só tem o mundo único das configurações antigas (a lista de mundos de
+-- um canal fica em "config"); os canais são sempre carregados inteiros, então a
+-- coluna não é indexada
+CREATE TABLE IF NOT EXISTS channels (
+    channel_id TEXT PRIMARY KEY,
+    guild_id TEXT NOT NULL,
+    world TEXT,
+    config TEXT NOT NULL
+);
+DROP INDEX IF EXISTS idx_channels_world;
+CREATE INDEX IF NOT EXISTS idx_channels_guild ON channels(guild_id);
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    username TEXT
+);
+CREATE TABLE IF NOT EXISTS subscriptions (
+    user_id TEXT NOT NULL,
+    house_key TEXT NOT NULL,
+    world TEXT NOT NULL,
+    PRIMARY KEY (user_id, house_key)
+);
+CREATE INDEX IF NOT EXISTS idx_subscriptions_house ON subscriptions(house_key);
+CREATE INDEX IF NOT EXISTS idx_subscriptions_world ON subscriptions(world);
+CREATE TABLE IF NOT EXISTS plot_status (
+    house_key TEXT PRIMARY KEY,
+    world TEXT NOT NULL,
+    lotto_phase INTEGER,
+    lotto_entries INTEGER,
+    lotto_phase_until INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_plot_status_world ON plot_status(world);
+CREATE TABLE IF NOT EXISTS pending_deletions (
+    channel_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    deadline REAL NOT NULL,
+    PRIMARY KEY (channel_id, message_id)
+);
+"""
+
+
+# O mundo é o primeiro pedaço da chave da casa (mundo_distrito_ward_plot)
+def world_of(house_key):
+    return house_key.split('_', 1)[0]
+
+
+# Lê um dos arquivos JSON antigos (vazio ou inexistente vira {})
+def read_json_file(path):
+    try:
+        with open(path, 'r') as f:
+            content = f.read()
+    except FileNotFoundError:
+        return {}
+    if not content.strip():
+        return {}
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        log.warning("arquivo %s mal formatado, ignorando na migração", path)
+        return {}
+
+
+# Estado do bot em SQLite (modo WAL). Os dados continuam em memória nos
+# dicionários do bot; aqui cada alteração vira um upsert/delete incremental que
+# fica na fila e é gravado em lote, numa única transação, fora do event loop,
+# a cada `interval` segundos e uma última vez no desligamento.
+class SqliteStateStore:
+    def __init__(self, path, interval=10):
+        self.path = path
+        self.interval = interval
+        self._task = None
+        self._lock = asyncio.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        # Operações pendentes por chave; uma nova operação na mesma chave substitui a anterior
+        self._pending = {}
+        self.operations = 0
+        self.flushes = 0
+
+    # Importa os três arquivos JSON antigos uma única vez
+    def migrate_from_json(self, housing_channels_path, user_notifications_path, last_known_status_path):
+        if self._conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+            return False
+
+        housing_channels = read_json_file(housing_channels_path)
+        user_notifications = read_json_file(user_notifications_path)
+        last_known_status = read_json_file(last_known_status_path)
+
+        with self._conn:
+            for guild_id, guild_data in housing_channels.items():
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO guilds (guild_id, guild_name) VALUES (?, ?)",
+                    (guild_id, guild_data.get("guild_name"))
+                )
+                for channel_id, config in guild_data.get("channels", {}).items():
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO channels (channel_id, guild_id, world, config) VALUES (?, ?, ?, ?)",
+                        (channel_id, guild_id, config.get("world"), json.dumps(config))
+                    )
+            for user_id, user_data in user_notifications.items():
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO users (user_id, username) VALUES (?, ?)",
+                    (user_id, user_data.get("username"))
+                )
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO subscriptions (user_id, house_key, world) VALUES (?, ?, ?)",
+                    [(user_id, house_key, world_of(house_key)) for house_key in user_data.get("notifications", [])]
+                )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO plot_status (house_key, world, lotto_phase, lotto_entries, lotto_phase_until) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (house_key, world_of(house_key), status.get("lotto_phase"),
+                     status.get("lotto_entries"), status.get("lotto_phase_until"))
+                    for house_key, status in last_known_status.items()
+                ]
+            )
+            self._conn.execute("INSERT INTO meta (key, value) VALUES ('json_migrated', '1')")
+        return True
+
+    # Remove status de casas que ninguém mais monitora
+    def evict_unsubscribed_statuses(self):
+        with self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM plot_status WHERE house_key NOT IN (SELECT house_key FROM subscriptions)"
+            )
+        return cursor.rowcount
+
+    def load_housing_channels(self):
+        housing_channels = {}
+        for guild_id, guild_name in self._conn.execute("SELECT guild_id, guild_name FROM guilds"):
+            housing_channels[guild_id] = {"guild_name": guild_name, "channels": {}}
+        for channel_id, guild_id, config in self._conn.execute(
+                "SELECT channel_id, guild_id, config FROM channels ORDER BY rowid"):
+            guild = housing_channels.setdefault(guild_id, {"guild_name": None, "channels": {}})
+            guild["channels"][channel_id] = json.loads(config)
+        return housing_channels
+
+    def load_user_notifications(self):
+        user_notifications = {}
+        for user_id, username in self._conn.execute("SELECT user_id, username FROM users"):
+            user_notifications[user_id] = {"notifications": [], "username": username}
+        for user_id, house_key in self._conn.execute(
+                "SELECT user_id, house_key FROM subscriptions ORDER BY rowid"):
+            user = user_notifications.setdefault(user_id, {"notifications": [], "username": None})
+            user["notifications"].append(house_key)
+        return user_notifications
+
+    def load_last_known_status(self):
+        return {
+            house_key: {"lotto_phase": phase, "lotto_entries": entries, "lotto_phase_until": until}
+            for house_key, phase, entries, until in self._conn.execute(
+                "SELECT house_key, lotto_phase, lotto_entries, lotto_phase_until FROM plot_status")
+        }
+
+    # Mensagens temporárias que ainda precisam ser apagadas: (prazo, canal, mensagem)
+    def load_pending_deletions(self):
+        return list(self._conn.execute(
+            "SELECT deadline, channel_id, message_id FROM pending_deletions"))
+
+    def _queue(self, key, statements):
+        self.operations += 1
+        # Reinsere no fim para manter a ordem das operações
+        self._pending.pop(key, None)
+        self._pending[key] = statements
+
+    def save_channel(self, guild_id, guild_name, channel_id, config):
+        self._queue(('channel', channel_id), [
+            ("INSERT INTO guilds (guild_id, guild_name) VALUES (?, ?) "
+             "ON CONFLICT(guild_id) DO UPDATE SET guild_name = excluded.guild_name",
+             (guild_id, guild_name)),
+            ("INSERT INTO channels (channel_id, guild_id, world, config) VALUES (?, ?, ?, ?) "
+             "ON CONFLICT(channel_id) DO UPDATE SET guild_id = excluded.guild_id, "
+             "world = excluded.world, config = excluded.config",
+             (channel_id, guild_id, config.get("world"), json.dumps(config))),
+        ])
+
+    def add_subscription(self, user_id, username, house_key):
+        self._queue(('subscription', user_id, house_key), [
+            ("INSERT INTO users (user_id, username) VALUES (?, ?) "
+             "ON CONFLICT(user_id) DO UPDATE SET username = excluded.username",
+             (user_id, username)),
+            ("INSERT OR IGNORE INTO subscriptions (user_id, house_key, world) VALUES (?, ?, ?)",
+             (user_id, house_key, world_of(house_key))),
+        ])
+
+    def remove_user_subscriptions(self, user_id):
+        self._queue(('unsubscribe', user_id), [
+            ("DELETE FROM subscriptions WHERE user_id = ?", (user_id,)),
+        ])
+
+    def save_status(self, house_key, status):
+        self._queue(('status', house_key), [
+            ("INSERT INTO plot_status (house_key, world, lotto_phase, lotto_entries, lotto_phase_until) "
+             "VALUES (?, ?, ?, ?, ?) ON CONFLICT(house_key) DO UPDATE SET "
+             "lotto_phase = excluded.lotto_phase, lotto_entries = excluded.lotto_entries, "
+             "lotto_phase_until = excluded.lotto_phase_until",
+             (house_key, world_of(house_key), status.get("lotto_phase"),
+              status.get("lotto_entries"), status.get("lotto_phase_until"))),
+        ])
+
+    def delete_status(self, house_key):
+        self._queue(('status', house_key), [
+            ("DELETE FROM plot_status WHERE house_key = ?", (house_key,)),
+        ])
+
+    def add_pending_deletion(self, channel_id, message_id, deadline):
+        self._queue(('deletion', channel_id, message_id), [
+            ("INSERT OR REPLACE INTO pending_deletions (channel_id, message_id, deadline) VALUES (?, ?, ?)",
+             (channel_id, message_id, deadline)),
+        ])
+
+    def remove_pending_deletion(self, channel_id, message_id):
+        self._queue(('deletion', channel_id, message_id), [
+            ("DELETE FROM pending_deletions WHERE channel_id = ? AND message_id = ?",
+             (channel_id, message_id)),
+        ])
+
+    def _apply(self, batch):
+        with self._conn:
+            for statements in batch:
+                for sql, params in statements:
+                    self._conn.execute(sql, params)
+
+    async def flush(self):
+        async with self._lock:
+            if not self._pending:
+                return
+            batch = list(self._pending.values())
+            self._pending = {}
+            try:
+                await asyncio.to_thread(self._apply, batch)
+            except sqlite3.Error as e:
+                log.error("erro ao salvar estado no SQLite (%d operações voltam para a fila): %s", len(batch), e)
+                # Devolve as operações para a fila, antes das que chegaram depois
+                self._pending = {**{i: statements for i, statements in enumerate(batch)}, **self._pending}
+                return
+            self.flushes += 1
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            # shield: um cancelamento no meio da gravação não perde operações pendentes
+            await asyncio.shield(self.flush())
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        self._conn.close()
+
+    def stats(self):
+        return {
+            'operations': self.operations,
+            'flushes': self.flushes,
+            'pending': len(self._pending),
+        }